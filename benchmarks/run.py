@@ -0,0 +1,244 @@
+# benchmarks/run.py
+"""
+Offline benchmarks for the report pipeline. Gemini and DuckDuckGo are replaced by the
+deterministic fakes in tests/fakes.py, so runs cost no API quota and are repeatable.
+
+    python -m benchmarks.run                       # full profile, prints results
+    python -m benchmarks.run --quick --compare     # CI: fail on regressions vs. baseline.json
+    python -m benchmarks.run --quick --update-baseline
+
+Scenarios: process_query end to end (sequential, concurrent, and with sectioned
+generation), detailed prompt building, search-context assembly, and POST /ask under N concurrent clients. Each
+reports p50/p95/p99 latency and throughput.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+os.environ.setdefault("GOOGLE_API_KEY", "BENCHMARK_DUMMY_KEY") # The fakes never call the API
+
+from src.assistant import utils
+from src.assistant.cache import SearchCache
+from src.assistant.context_assembly import ContextAssembler
+from src.assistant.query_engine import QueryEngine
+from src.assistant.report_store import ReportStore
+from src.assistant.search_providers import DuckDuckGoProvider
+from tests.fakes import FakeDDGS, FakeGeminiClient, filler_text
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Iterations and fake latencies per profile; "quick" keeps CI under a few seconds, "smoke" is for tests
+PROFILES = {
+    "smoke": {"iterations": 2, "concurrency": 2, "clients": 2, "requests_per_client": 1, "micro_iterations": 3,
+              "latency_scale": 0.02},
+    "quick": {"iterations": 8, "concurrency": 4, "clients": 4, "requests_per_client": 2, "micro_iterations": 50,
+              "latency_scale": 0.1},
+    "full": {"iterations": 40, "concurrency": 8, "clients": 16, "requests_per_client": 5, "micro_iterations": 500,
+             "latency_scale": 1.0},
+}
+
+# Fake backend medians (seconds, before latency_scale)
+FAKE_ANALYSIS_LATENCY = 0.4
+FAKE_RESPONSE_LATENCY = 1.5
+FAKE_SEARCH_LATENCY = 0.2
+
+# Latency metrics compare as "lower is better", throughput as "higher is better"
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s")
+
+
+def summarize(latencies, wall_time):
+    """p50/p95/p99/mean latency in milliseconds plus throughput for one scenario."""
+    return {
+        "iterations": len(latencies),
+        "p50_ms": round(utils.percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(utils.percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(utils.percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "throughput_per_s": round(len(latencies) / wall_time, 3) if wall_time > 0 else 0.0,
+    }
+
+
+def _timed_calls(fn, args_list, concurrency=1):
+    """Runs fn(*args) for each args tuple with `concurrency` threads; returns (latencies, wall_time)."""
+    def run(args):
+        started = time.perf_counter()
+        fn(*args)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        latencies = [run(args) for args in args_list]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(run, args_list))
+    return latencies, time.perf_counter() - started
+
+
+def make_engine(settings, gemini_failure_rate=0.0, search_failure_rate=0.0, **engine_options):
+    """A QueryEngine wired to the fakes, with memory-only caches and no search throttling."""
+    fake_ddgs = FakeDDGS(latency=FAKE_SEARCH_LATENCY, failure_rate=search_failure_rate,
+                         latency_scale=settings["latency_scale"])
+    engine = QueryEngine(search_rate_limit=0, search_cache=SearchCache(path=""),
+                         search_provider=DuckDuckGoProvider(ddgs_factory=fake_ddgs), **engine_options)
+    engine.gemini_client = FakeGeminiClient(
+        analysis_latency=FAKE_ANALYSIS_LATENCY, response_latency=FAKE_RESPONSE_LATENCY,
+        failure_rate=gemini_failure_rate, latency_scale=settings["latency_scale"])
+    return engine
+
+
+def bench_process_query(settings, concurrency, engine_options=None, **fake_options):
+    engine = make_engine(settings, **fake_options, **(engine_options or {}))
+    queries = [(f"Benchmark question {i}: how do we compare on pricing?",) for i in range(settings["iterations"])]
+    return summarize(*_timed_calls(engine.process_query, queries, concurrency))
+
+
+def _fake_search_results(count=45):
+    fake = FakeDDGS(latency=0)
+    results = []
+    for i in range(count // 3):
+        for result in fake.search(f"fintech search {i}", 3):
+            results.append({"search_query": f"fintech search {i}", "title": result["title"],
+                            "snippet": result["body"], "url": result["href"]})
+    return results
+
+
+def bench_prompt_build(settings, **fake_options):
+    engine = make_engine(settings, **fake_options)
+    context = filler_text(1, 12000)
+    entities = {"competitors": ["Razorpay", "Decentro"], "focus_areas": ["pricing"], "metrics": ["CAC"]}
+    types = ["competitive_analysis", "trend_forecasting", "swot_analysis", "marketing_strategy",
+             "financial_analysis", "generic"]
+    calls = [(f"question {i}", types[i % len(types)], entities, context) for i in range(settings["micro_iterations"])]
+    return summarize(*_timed_calls(engine._build_prompt, calls))
+
+
+def bench_context_assembly(settings, **fake_options):
+    assembler = ContextAssembler()
+    results = _fake_search_results()
+    calls = [(results, "How does Setu pricing compare with Razorpay?", "competitive_analysis",
+              {"competitors": ["Razorpay"], "focus_areas": ["pricing"]})] * settings["micro_iterations"]
+    return summarize(*_timed_calls(assembler.assemble, calls))
+
+
+def bench_ask_concurrent(settings, **fake_options):
+    from src.backend import app as app_module
+
+    engine = make_engine(settings, **fake_options)
+    client = app_module.app.test_client()
+    requests = [(f"Concurrent client question {i}",) for i in range(settings["clients"] * settings["requests_per_client"])]
+
+    def ask(query):
+        response = client.post("/ask", data={"query": query})
+        if response.status_code != 200:
+            raise RuntimeError(f"/ask returned {response.status_code}")
+
+    # A throwaway report store, and no semantic cache, so runs neither write to .cache/reports nor reuse reports
+    with tempfile.TemporaryDirectory() as directory, patch.object(app_module, "query_engine", engine), \
+            patch.object(app_module, "report_store", ReportStore(directory=directory)), \
+            patch.object(app_module, "semantic_cache", None):
+        app_module.report_cache.clear()
+        return summarize(*_timed_calls(ask, requests, settings["clients"]))
+
+
+def run_benchmarks(profile="quick", only=None, **fake_options):
+    """Runs the scenarios of a profile and returns {scenario: summary}."""
+    settings = PROFILES[profile]
+    scenarios = {
+        "process_query_sequential": lambda: bench_process_query(settings, 1, **fake_options),
+        "process_query_concurrent": lambda: bench_process_query(settings, settings["concurrency"], **fake_options),
+        "process_query_sectioned": lambda: bench_process_query(settings, 1, {"sectioned_generation": True}, **fake_options),
+        "prompt_build": lambda: bench_prompt_build(settings, **fake_options),
+        "context_assembly": lambda: bench_context_assembly(settings, **fake_options),
+        "ask_concurrent_clients": lambda: bench_ask_concurrent(settings, **fake_options),
+    }
+    return {name: scenario() for name, scenario in scenarios.items() if not only or name in only}
+
+
+def compare_to_baseline(results, baseline, tolerance=0.25, min_delta_ms=2.0):
+    """
+    Returns a list of regression messages. Latencies regress when they exceed the baseline by
+    more than `tolerance` (relative) and `min_delta_ms` (absolute, to ignore timer noise on
+    micro-benchmarks); throughput regresses when it drops by more than `tolerance` and the
+    time per operation grows by more than `min_delta_ms`.
+    """
+    regressions = []
+    for scenario, current in results.items():
+        expected = baseline.get(scenario)
+        if not expected:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric not in expected:
+                continue
+            old, new = expected[metric], current[metric]
+            if metric == "throughput_per_s":
+                regressed = (new < old / (1 + tolerance) and new > 0
+                             and (1 / new - 1 / old) * 1000 > min_delta_ms)
+            else:
+                regressed = new > old * (1 + tolerance) and new - old > min_delta_ms
+            if regressed:
+                regressions.append(f"{scenario}.{metric}: {new} vs baseline {old}")
+    return regressions
+
+
+def _print_results(results):
+    print(f"{'scenario':28} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'thrpt/s':>10}")
+    for name, r in results.items():
+        print(f"{name:28} {r['iterations']:>5} {r['p50_ms']:>10} {r['p95_ms']:>10} {r['p99_ms']:>10} {r['throughput_per_s']:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the QueryEngine pipeline")
+    parser.add_argument("--quick", action="store_true", help="Small, fast profile (used in CI)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), help="Profile to run (overrides --quick)")
+    parser.add_argument("--only", nargs="*", help="Run only these scenarios")
+    parser.add_argument("--gemini-failure-rate", type=float, default=0.0, help="Share of fake Gemini calls that fail")
+    parser.add_argument("--search-failure-rate", type=float, default=0.0, help="Share of fake searches that fail")
+    parser.add_argument("--compare", action="store_true", help="Exit non-zero if results regress against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression (default: 0.25)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file (default: benchmarks/baseline.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the profile's baseline")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO) # Per-step INFO logs would dominate the measurements
+    profile = args.profile or ("quick" if args.quick else "full")
+    results = run_benchmarks(profile, only=args.only, gemini_failure_rate=args.gemini_failure_rate,
+                             search_failure_rate=args.search_failure_rate)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"Benchmark profile: {profile}")
+        _print_results(results)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    if args.update_baseline:
+        baselines[profile] = results
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline for profile '{profile}' written to {args.baseline}")
+        return 0
+
+    if args.compare:
+        regressions = compare_to_baseline(results, baselines.get(profile, {}), tolerance=args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
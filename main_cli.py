@@ -1,26 +1,169 @@
 # main_cli.py
+import time
+STARTED = time.perf_counter()
+
 import argparse
-from src.assistant.query_engine import QueryEngine
+import signal
+import sys
+from src.assistant.startup import StartupProfiler
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def main():
-    parser = argparse.ArgumentParser(description="AI Business Insights Assistant (CLI)")
+# The pipeline modules are imported after argument parsing, so --help and usage errors stay instant
+
+def print_metrics_summary(summary=None):
+    """Prints the per-stage latencies, Gemini usage and cache hit rates collected during this run (or by the daemon)."""
+    if summary is None:
+        from src.assistant import metrics
+        summary = metrics.summary()
+    print("\n--- Metrics ---")
+    for stage, stats in sorted(summary["stages"].items()):
+        print(f"{stage:10} n={stats['count']:<4} mean={stats['mean_seconds']}s  p50~{stats['p50_seconds']}s  p95~{stats['p95_seconds']}s")
+    tokens = summary["gemini_tokens"]
+    print(f"Gemini tokens: prompt={tokens.get('prompt', 0)} response={tokens.get('response', 0)} cached={tokens.get('cached', 0)}")
+    print(f"Gemini requests: {summary['gemini_requests'] or 'none'}  retries: {sum(summary['gemini_retries'].values())}")
+    if summary["cache_hit_rates"]:
+        print("Cache hit rates: " + ", ".join(f"{name}={rate:.0%}" for name, rate in sorted(summary["cache_hit_rates"].items())))
+
+
+def run_daemon(argv):
+    """`main_cli.py daemon`: keeps a warm engine running for later main_cli.py calls."""
+    parser = argparse.ArgumentParser(prog="main_cli.py daemon", description="Serve reports from a long-lived engine over a Unix socket")
+    parser.add_argument("--socket", type=str, help="Socket path (default: $ASSISTANT_SOCKET or .cache/assistant.sock)")
+    args = parser.parse_args(argv)
+
+    from src.assistant.query_engine import QueryEngine
+    from src.assistant.daemon import serve
+
+    print("Initializing AI Assistant...")
+    engine = QueryEngine()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0)) # Unwind so the socket file is removed
+    print("Daemon ready; main_cli.py queries will use it until it is stopped (Ctrl+C).")
+    try:
+        serve(engine, args.socket)
+    except KeyboardInterrupt:
+        print("Daemon stopped.")
+    return 0
+
+
+def _report_pieces(args, startup):
+    """
+    The report pieces for args.query, from the warm daemon when one is listening and from
+    an in-process engine otherwise. Returns (pieces, engine), engine being None for the daemon.
+    """
+    if not args.no_daemon:
+        from src.assistant.daemon import DaemonClient
+        try:
+            with startup.phase("connect to daemon"):
+                pieces = DaemonClient().query(args.query, profile=args.profile, stream=not args.no_stream)
+            logging.info("Using the running assistant daemon.")
+            return pieces, None
+        except OSError:
+            pass # No daemon listening; run in-process
+
+    with startup.phase("import pipeline"):
+        from src.assistant.query_engine import QueryEngine
+    with startup.phase("QueryEngine()"):
+        engine = QueryEngine()
+
+    def pieces():
+        with engine.use_profile(args.profile):
+            if args.no_stream:
+                yield engine.process_query(args.query)
+            else:
+                yield from engine.process_query_stream(args.query)
+    return pieces(), engine
+
+
+def run_batch(argv):
+    """`main_cli.py batch FILE ...`: runs a JSONL/CSV file of queries through one shared engine."""
+    parser = argparse.ArgumentParser(prog="main_cli.py batch", description="Generate reports for a file of queries")
+    parser.add_argument("input", type=str, help="JSONL ({\"id\": ..., \"query\": ...} per line) or CSV (id,query columns) file; items may name a \"profile\"")
+    parser.add_argument("-d", "--output-dir", type=str, default="reports", help="Directory for the generated reports (default: reports)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Number of queries processed at once (default: 4)")
+    parser.add_argument("--profile", type=str, help="Business profile for items that do not name one (default: the default profile)")
+    parser.add_argument("--metrics", action="store_true", help="Print stage latency, token and cache metrics at the end")
+    args = parser.parse_args(argv)
+
+    from src.assistant.query_engine import QueryEngine
+    from src.assistant.batch import BatchRunner, load_batch_queries
+
+    items = load_batch_queries(args.input)
+    print(f"Loaded {len(items)} queries from {args.input}")
+    print("Initializing AI Assistant...")
+    engine = QueryEngine()
+    if args.profile:
+        engine.profile_registry.get(args.profile) # Fail fast on a typo instead of failing every item
+    runner = BatchRunner(engine, args.output_dir, concurrency=args.concurrency, profile=args.profile)
+
+    done = []
+    def progress(item, status, latency):
+        done.append(item)
+        print(f"[{len(done)}] {status.upper():6} {latency:6.1f}s  {item['id']}: {item['query'][:60]}", flush=True)
+
+    summary = runner.run(items, progress=progress)
+    print("\n--- Batch Summary ---")
+    print(f"Total: {summary['total']}  Skipped (already done): {summary['skipped']}  "
+          f"Succeeded: {summary['succeeded']}  Failed: {summary['failed']}")
+    print(f"Wall time: {summary['wall_time_seconds']}s  Throughput: {summary['throughput_per_minute']} reports/min")
+    print(f"Latency p50: {summary['latency_p50_seconds']}s  p95: {summary['latency_p95_seconds']}s  "
+          f"max: {summary['latency_max_seconds']}s")
+    print(f"Reports written to {args.output_dir}")
+    if args.metrics:
+        print_metrics_summary()
+    return 1 if summary["failed"] else 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "batch":
+        return run_batch(argv[1:])
+    if argv and argv[0] == "daemon":
+        return run_daemon(argv[1:])
+
+    parser = argparse.ArgumentParser(
+        description="AI Business Insights Assistant (CLI)",
+        epilog="Batch mode: main_cli.py batch QUERIES.jsonl|.csv [-d OUTPUT_DIR] [-c CONCURRENCY]\n"
+               "Daemon mode: main_cli.py daemon [--socket PATH] keeps a warm engine that later calls connect to",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("query", type=str, help="Your business query")
     parser.add_argument("-o", "--output", type=str, help="Optional file path to save the report (e.g., report.md)")
+    parser.add_argument("--no-stream", action="store_true", help="Wait for the full report instead of printing it as it is generated")
+    parser.add_argument("--metrics", action="store_true", help="Print stage latency, token and cache metrics after the report")
+    parser.add_argument("--profile", type=str, help="Business profile to use (a file name in PROFILES_DIR without .json)")
+    parser.add_argument("--profile-startup", action="store_true", help="Print where startup time went (imports, client setup) to stderr")
+    parser.add_argument("--no-daemon", action="store_true", help="Run in this process even if a daemon is running")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    startup = StartupProfiler(started=STARTED)
 
     print("Initializing AI Assistant...")
     try:
-        engine = QueryEngine()
+        report_pieces, engine = _report_pieces(args, startup)
         print(f"Processing your query: \"{args.query}\"")
         print("-" * 30)
-        response = engine.process_query(args.query)
-        print("\n--- Generated Insights ---")
-        print(response)
+        # Print the report as it is generated; keep the pieces for --output
+        pieces = []
+        for piece in report_pieces:
+            if not pieces:
+                print("\n--- Generated Insights ---")
+            pieces.append(piece)
+            print(piece, end="", flush=True)
+        print()
+        response = "".join(pieces)
         print("------------------------\n")
+        if args.metrics:
+            if engine is None:
+                from src.assistant.daemon import DaemonClient
+                print_metrics_summary(DaemonClient().metrics()) # The report ran in the daemon
+            else:
+                print_metrics_summary()
+        if args.profile_startup:
+            init_seconds = getattr(engine.gemini_client, "init_seconds", None) if engine else None
+            if init_seconds is not None:
+                startup.record("Gemini SDK setup (first call)", init_seconds)
+            print(startup.report(), file=sys.stderr)
 
         if args.output:
             try:
@@ -36,4 +179,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
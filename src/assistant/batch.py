@@ -0,0 +1,165 @@
+# src/assistant/batch.py
+import csv
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import utils
+from .quota_scheduler import BATCH, request_priority
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def _default_item_id(query, profile=None):
+    # Derived from the query text, not its position, so resuming works after the input file is edited;
+    # the profile is part of it so one query run for two profiles gives two items
+    key = utils.normalize_query(query)
+    profile = str(profile or "").strip()
+    if profile:
+        key = f"{profile}\n{key}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def _item(item_id, query, profile=None):
+    item = {"id": item_id, "query": query}
+    profile = str(profile or "").strip()
+    if profile:
+        item["profile"] = profile
+    return item
+
+
+def load_batch_queries(path):
+    """
+    Reads batch items from a JSONL or CSV file. JSONL lines are either objects with a
+    `query` key (and optional `id` and `profile`) or plain JSON strings; CSV files need a
+    `query` column and may have `id` and `profile` columns. Returns a list of
+    {"id", "query"} dicts, plus "profile" where one was given.
+    """
+    items = []
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                query = (row.get("query") or "").strip()
+                if query:
+                    items.append(_item((row.get("id") or "").strip() or _default_item_id(query, row.get("profile")),
+                                       query, row.get("profile")))
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if isinstance(record, str):
+                    record = {"query": record}
+                query = str(record.get("query", "")).strip()
+                if not query:
+                    logger.warning(f"Skipping batch line {line_number}: no query.")
+                    continue
+                items.append(_item(str(record.get("id") or _default_item_id(query, record.get("profile"))), query,
+                                   record.get("profile")))
+
+    seen = set()
+    unique = []
+    for item in items:
+        if item["id"] in seen:
+            logger.warning(f"Skipping duplicate batch item id '{item['id']}'.")
+            continue
+        seen.add(item["id"])
+        unique.append(item)
+    return unique
+
+
+class BatchRunner:
+    """
+    Runs many queries through one shared QueryEngine with bounded concurrency. Each
+    report is written to `<output_dir>/<id>.md`; an item whose report file already
+    exists is skipped, so an interrupted run can simply be started again.
+    Every finished item is also appended to `manifest.jsonl` in the output directory.
+    Items run under their own "profile", else `profile` (None: the engine default).
+    """
+
+    def __init__(self, engine, output_dir, concurrency=4, profile=None):
+        self.engine = engine
+        self.output_dir = output_dir
+        self.concurrency = max(1, int(concurrency))
+        self.profile = profile
+        self._manifest_lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def report_path(self, item):
+        return os.path.join(self.output_dir, f"{item['id']}.md")
+
+    def _record(self, entry):
+        with self._manifest_lock:
+            with open(os.path.join(self.output_dir, MANIFEST_NAME), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def _run_item(self, item):
+        started = time.perf_counter()
+        try:
+            # Batch calls yield the Gemini quota to interactive requests sharing the process or host
+            with self.engine.use_profile(item.get("profile") or self.profile), request_priority(BATCH):
+                report = self.engine.process_query(item["query"])
+            error = None if self.engine.is_cacheable_report(report) else report
+        except Exception as e:
+            logger.error(f"Batch item '{item['id']}' failed: {e}", exc_info=True)
+            report, error = None, str(e)
+        latency = time.perf_counter() - started
+
+        if error is None:
+            # Write to a temp file first so a crash never leaves a half-written report that looks finished
+            path = self.report_path(item)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(report)
+            os.replace(tmp_path, path)
+
+        status = "ok" if error is None else "failed"
+        self._record({"id": item["id"], "query": item["query"], "status": status,
+                      "latency_seconds": round(latency, 3), "error": error, "finished_at": time.time()})
+        return status, latency
+
+    def run(self, items, progress=None):
+        """
+        Processes `items` (as returned by load_batch_queries) and returns a summary dict.
+        `progress(item, status, latency)` is called after each item, from a worker thread.
+        """
+        pending = [item for item in items if not os.path.exists(self.report_path(item))]
+        skipped = len(items) - len(pending)
+        if skipped:
+            logger.info(f"Resuming batch: {skipped} of {len(items)} items already have reports.")
+
+        latencies = []
+        failed = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as pool:
+            futures = {pool.submit(self._run_item, item): item for item in pending}
+            for future in as_completed(futures):
+                status, latency = future.result()
+                latencies.append(latency)
+                if status != "ok":
+                    failed += 1
+                if progress:
+                    progress(futures[future], status, latency)
+        wall_time = time.perf_counter() - started
+
+        processed = len(latencies)
+        return {
+            "total": len(items),
+            "skipped": skipped,
+            "processed": processed,
+            "succeeded": processed - failed,
+            "failed": failed,
+            "wall_time_seconds": round(wall_time, 3),
+            "throughput_per_minute": round(processed / wall_time * 60, 2) if wall_time > 0 else 0.0,
+            "latency_p50_seconds": round(utils.percentile(latencies, 50), 3),
+            "latency_p95_seconds": round(utils.percentile(latencies, 95), 3),
+            "latency_max_seconds": round(max(latencies), 3) if latencies else 0.0,
+        }
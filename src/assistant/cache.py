@@ -0,0 +1,319 @@
+# src/assistant/cache.py
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from . import utils
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_CACHE_PATH = os.path.join(".cache", "search_cache.sqlite3")
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters shared by the cache tiers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0, "sets": 0, "evictions": 0}
+
+    def record(self, name, amount=1):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / lookups, 4) if lookups else 0.0
+        return counts
+
+
+class TTLCache:
+    """
+    In-memory LRU cache with a per-entry time-to-live.
+    Expired entries are dropped lazily on access; the least recently used entry is
+    evicted once `max_entries` is exceeded.
+    """
+
+    def __init__(self, max_entries=1024, default_ttl=3600, stats=None):
+        self.max_entries = max(1, int(max_entries))
+        self.default_ttl = default_ttl
+        self.stats = stats or CacheStats()
+        self._entries = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.record("evictions")
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteTTLStore:
+    """
+    Disk-backed key/value store with TTLs, safe to share between processes
+    (Flask workers, CLI runs). Values are stored as JSON. The table is pruned
+    to `max_entries` rows, dropping expired and then least recently used rows.
+    """
+
+    def __init__(self, path, max_entries=50000, prune_every=100, stats=None):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.prune_every = max(1, int(prune_every))
+        self.stats = stats or CacheStats()
+        self._writes_since_prune = 0
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self):
+        # One short-lived connection per operation keeps the store usable from any thread
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS entries ("
+                        " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                        " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)")
+                    conn.commit()
+                    self._initialized = True
+        return conn
+
+    def get(self, key):
+        """Returns `(value, remaining_ttl)` or None when the key is missing or expired."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return json.loads(value), expires_at - now
+        finally:
+            conn.close()
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            conn.commit()
+            self._writes_since_prune += 1
+            if self._writes_since_prune >= self.prune_every:
+                self._writes_since_prune = 0
+                self._prune(conn, now)
+        finally:
+            conn.close()
+
+    def _prune(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.stats.record("evictions", overflow)
+        conn.commit()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class SearchCache:
+    """
+    Two-tier cache for search results: an in-process LRU in front of a shared
+    SQLite file. Keys are the normalized query plus `max_results` (and the search
+    provider's namespace, if it has one). Empty result
+    lists are cached too, with a shorter TTL, so dead queries are not retried
+    on every report.
+    """
+
+    def __init__(self, path=None, ttl=6 * 3600, empty_ttl=1800, memory_entries=2048, disk_entries=50000):
+        self.ttl = ttl
+        self.empty_ttl = empty_ttl
+        self.stats = CacheStats()
+        self.memory = TTLCache(max_entries=memory_entries, default_ttl=ttl, stats=self.stats)
+        path = path if path is not None else os.getenv("SEARCH_CACHE_PATH", DEFAULT_SEARCH_CACHE_PATH)
+        self.disk = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.disk = SQLiteTTLStore(path, max_entries=disk_entries, stats=self.stats)
+
+    @staticmethod
+    def make_key(query, max_results, namespace=""):
+        key = f"{utils.normalize_query(query)}|{int(max_results)}"
+        return f"{namespace}:{key}" if namespace else key
+
+    def get(self, query, max_results, namespace=""):
+        """Returns the cached result list, or None on a miss."""
+        key = self.make_key(query, max_results, namespace)
+        results = self.memory.get(key)
+        if results is not None:
+            self.stats.record("hits")
+            self.stats.record("memory_hits")
+            return results
+
+        if self.disk is not None:
+            try:
+                found = self.disk.get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Search cache disk lookup failed for '{query}': {e}")
+                found = None
+            if found is not None:
+                results, remaining_ttl = found
+                self.memory.set(key, results, ttl=remaining_ttl)
+                self.stats.record("hits")
+                self.stats.record("disk_hits")
+                return results
+
+        self.stats.record("misses")
+        return None
+
+    def set(self, query, max_results, results, ttl=None, namespace=""):
+        if ttl is None:
+            ttl = self.ttl if results else self.empty_ttl
+        key = self.make_key(query, max_results, namespace)
+        results = list(results)
+        self.memory.set(key, results, ttl=ttl)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, results, ttl)
+            except sqlite3.Error as e:
+                logger.warning(f"Search cache disk write failed for '{query}': {e}")
+        self.stats.record("sets")
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def get_stats(self):
+        stats = self.stats.snapshot()
+        stats["memory_entries"] = len(self.memory)
+        return stats
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the
+    function, callers arriving while it is in flight wait for and share its
+    result (or exception) instead of repeating the work.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Returns `(result, shared)`; `shared` is True when the result came from another caller's run."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlightCall()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight for coroutines on one event loop. The shared
+    computation runs as its own task, so a cancelled waiter does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, coro_fn):
+        """Returns `(result, shared)` like SingleFlight.do; `coro_fn` is called only by the first caller."""
+        task = self._tasks.get(key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(coro_fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _task: self._tasks.pop(key, None))
+        return await asyncio.shield(task), shared
+
+    def in_flight(self):
+        return len(self._tasks)
@@ -0,0 +1,206 @@
+# src/assistant/context_assembly.py
+"""
+Turns raw search results into a compact prompt context: duplicate URLs and near-duplicate
+(syndicated) snippets are collapsed, the remaining results are ranked against the original
+query and its entities with BM25, and the best ones are packed into a token budget that
+depends on the query type.
+"""
+import hashlib
+import logging
+import math
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from . import utils
+
+logger = logging.getLogger(__name__)
+
+# Rough prompt-token budgets for the search context, per query type
+DEFAULT_TOKEN_BUDGETS = {
+    "competitive_analysis": 3000,
+    "financial_analysis": 3000,
+    "trend_forecasting": 2500,
+    "swot_analysis": 2500,
+    "marketing_strategy": 2500,
+    "market_research": 2500,
+}
+DEFAULT_TOKEN_BUDGET = 2000
+
+# Entity fields that describe what the user cares about; their values join the ranking query
+_RELEVANCE_ENTITY_KEYS = ("competitors", "industry", "products_services", "geography", "focus_areas", "metrics")
+_TRACKING_PARAM_RE = re.compile(r"^(utm_\w+|ref|fbclid|gclid)$", re.IGNORECASE)
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+def canonical_url(url):
+    """Normalizes a URL for duplicate detection: scheme, www., fragment, tracking params and trailing slash are ignored."""
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not _TRACKING_PARAM_RE.match(k)))
+    return urlunsplit(("", host, parts.path.rstrip("/"), query, ""))
+
+
+def _tokens(text):
+    return utils.normalize_query(text).split()
+
+
+class MinHasher:
+    """
+    MinHash signatures over word shingles. The fraction of equal signature slots
+    estimates the Jaccard similarity of two texts' shingle sets.
+    """
+
+    def __init__(self, num_perm=64, shingle_size=3, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # Deterministic (a, b) pairs for the universal hashes h(x) = (a*x + b) mod p
+        self._params = []
+        for i in range(num_perm):
+            digest = hashlib.blake2b(f"{seed}:{i}".encode(), digest_size=16).digest()
+            a = int.from_bytes(digest[:8], "big") % (_MERSENNE_PRIME - 1) + 1
+            b = int.from_bytes(digest[8:], "big") % _MERSENNE_PRIME
+            self._params.append((a, b))
+
+    def shingles(self, text):
+        tokens = _tokens(text)
+        if len(tokens) < self.shingle_size:
+            return {" ".join(tokens)} if tokens else set()
+        return {" ".join(tokens[i:i + self.shingle_size]) for i in range(len(tokens) - self.shingle_size + 1)}
+
+    def signature(self, text):
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in self.shingles(text)]
+        if not hashes:
+            return None
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._params)
+
+    @staticmethod
+    def similarity(first, second):
+        if first is None or second is None:
+            return 0.0
+        return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+def bm25_scores(query_terms, documents, k1=1.5, b=0.75):
+    """Okapi BM25 score of each tokenized document in `documents` for `query_terms`."""
+    if not documents:
+        return []
+    doc_count = len(documents)
+    avg_length = sum(len(doc) for doc in documents) / doc_count or 1.0
+    document_frequency = {}
+    for doc in documents:
+        for term in set(doc):
+            document_frequency[term] = document_frequency.get(term, 0) + 1
+
+    scores = []
+    for doc in documents:
+        term_counts = {}
+        for term in doc:
+            term_counts[term] = term_counts.get(term, 0) + 1
+        score = 0.0
+        for term in set(query_terms):
+            tf = term_counts.get(term)
+            if not tf:
+                continue
+            df = document_frequency[term]
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avg_length))
+        scores.append(score)
+    return scores
+
+
+class ContextAssembler:
+    """
+    Builds the search context for the detailed prompts from structured search results
+    (dicts with search_query, title, snippet and url, in search-plan order).
+    """
+
+    def __init__(self, token_budgets=None, default_token_budget=DEFAULT_TOKEN_BUDGET,
+                 near_duplicate_threshold=0.8, num_perm=64, shingle_size=3):
+        """
+        token_budgets: {query_type: tokens} overriding DEFAULT_TOKEN_BUDGETS.
+        near_duplicate_threshold: estimated Jaccard similarity at which two snippets count as the same story.
+        """
+        self.token_budgets = dict(DEFAULT_TOKEN_BUDGETS, **(token_budgets or {}))
+        self.default_token_budget = default_token_budget
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.minhasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+
+    def budget_for(self, query_type):
+        return self.token_budgets.get(query_type, self.default_token_budget)
+
+    def deduplicate(self, results):
+        """Drops repeated URLs and near-duplicate snippets, keeping the earliest occurrence. Returns (kept, stats)."""
+        kept, signatures, seen_urls = [], [], set()
+        stats = {"duplicate_urls": 0, "near_duplicates": 0}
+        for result in results:
+            url = canonical_url(result.get("url"))
+            if url and url in seen_urls:
+                stats["duplicate_urls"] += 1
+                continue
+            signature = self.minhasher.signature(f"{result.get('title', '')} {result.get('snippet', '')}")
+            if any(MinHasher.similarity(signature, other) >= self.near_duplicate_threshold for other in signatures):
+                stats["near_duplicates"] += 1
+                continue
+            if url:
+                seen_urls.add(url)
+            signatures.append(signature)
+            kept.append(result)
+        return kept, stats
+
+    @staticmethod
+    def _relevance_terms(query, entities):
+        parts = [query]
+        for key in _RELEVANCE_ENTITY_KEYS:
+            value = (entities or {}).get(key)
+            if isinstance(value, str):
+                parts.append(value)
+            elif isinstance(value, list):
+                parts.extend(str(item) for item in value if item)
+        return _tokens(" ".join(parts))
+
+    def rank(self, results, query, entities=None):
+        """Orders results by BM25 relevance to the query and entities; ties keep search-plan order."""
+        documents = [_tokens(f"{r.get('title', '')} {r.get('snippet', '')}") for r in results]
+        scores = bm25_scores(self._relevance_terms(query, entities), documents)
+        order = sorted(range(len(results)), key=lambda i: -scores[i])
+        return [results[i] for i in order]
+
+    @staticmethod
+    def _render(index, result):
+        return (f"{index}. Title: {result.get('title') or 'N/A'}\n"
+                f"   Snippet: {result.get('snippet') or 'N/A'}\n"
+                f"   Source: {result.get('url') or 'N/A'}")
+
+    def assemble(self, results, query, query_type, entities=None):
+        """Returns the deduplicated, ranked and budget-packed search context string."""
+        if not results:
+            return ""
+        unique, stats = self.deduplicate(results)
+        ranked = self.rank(unique, query, entities)
+
+        budget = self.budget_for(query_type)
+        header = "--- Search Results (most relevant first) ---"
+        footer = "--- End of Results ---"
+        used = estimate_tokens(header) + estimate_tokens(footer)
+        lines = [header]
+        for result in ranked:
+            line = self._render(len(lines), result)
+            cost = estimate_tokens(line)
+            if used + cost > budget:
+                continue # A shorter, lower-ranked result may still fit
+            lines.append(line)
+            used += cost
+        lines.append(footer)
+
+        logger.info(f"Context assembly: {len(results)} results, {stats['duplicate_urls']} duplicate URLs, "
+                    f"{stats['near_duplicates']} near-duplicates, {len(lines) - 2} packed (~{used}/{budget} tokens).")
+        return "\n\n".join(lines)
@@ -0,0 +1,182 @@
+# src/assistant/daemon.py
+"""
+Warm local daemon: one long-lived process holds a QueryEngine (Gemini clients, caches,
+search index) and serves reports over a Unix domain socket, so repeated `main_cli.py`
+calls skip engine start-up and share its in-memory caches.
+
+The protocol is JSON lines. The client sends one request per connection:
+    {"op": "query", "query": "...", "profile": null, "stream": true}
+    {"op": "metrics"} / {"op": "ping"}
+and reads events until "done" or "error":
+    {"event": "chunk", "text": "..."} ... {"event": "done"}
+    {"event": "metrics", "summary": {...}} / {"event": "pong", "pid": 123}
+    {"event": "error", "error": "..."}
+Each connection is served on its own thread, so CLI calls run concurrently.
+
+This module only needs the standard library on the client side; the CLI imports it
+before deciding whether to build an engine of its own.
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = os.path.join(".cache", "assistant.sock")
+SUPPORTED = hasattr(socket, "AF_UNIX") # Not on Windows; the CLI then always runs in-process
+
+
+def default_socket_path():
+    return os.getenv("ASSISTANT_SOCKET", DEFAULT_SOCKET_PATH)
+
+
+class DaemonError(Exception):
+    """Raised by DaemonClient when the daemon reports an error or the connection drops mid-request."""
+
+
+def _send(stream, message):
+    stream.write(json.dumps(message).encode("utf-8") + b"\n")
+    stream.flush()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            line = self.rfile.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            op = request.get("op", "query")
+            if op == "ping":
+                _send(self.wfile, {"event": "pong", "pid": os.getpid()})
+            elif op == "metrics":
+                from . import metrics
+                _send(self.wfile, {"event": "metrics", "summary": metrics.summary()})
+            elif op == "query":
+                self._query(request)
+            else:
+                _send(self.wfile, {"event": "error", "error": f"Unknown op: {op!r}"})
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Daemon client disconnected before the reply was complete.")
+        except Exception as e:
+            logger.error(f"Daemon request failed: {e}", exc_info=True)
+            try:
+                _send(self.wfile, {"event": "error", "error": str(e)})
+            except OSError:
+                pass
+
+    def _query(self, request):
+        query = request.get("query")
+        if not isinstance(query, str) or not query.strip():
+            _send(self.wfile, {"event": "error", "error": "Query must be a non-empty string."})
+            return
+        engine = self.server.engine
+        with engine.use_profile(request.get("profile")):
+            if request.get("stream", True):
+                for piece in engine.process_query_stream(query):
+                    _send(self.wfile, {"event": "chunk", "text": piece})
+            else:
+                _send(self.wfile, {"event": "chunk", "text": engine.process_query(query)})
+        _send(self.wfile, {"event": "done"})
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves `engine` on the Unix socket `socket_path` (see the module docstring for the protocol)."""
+
+    daemon_threads = True
+
+    def __init__(self, engine, socket_path=None):
+        self.engine = engine
+        self.socket_path = socket_path or default_socket_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            if is_running(self.socket_path):
+                raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+            os.unlink(self.socket_path) # Left behind by a daemon that did not shut down cleanly
+        previous_umask = os.umask(0o177) # The socket is only for the current user
+        try:
+            super().__init__(self.socket_path, _Handler)
+        finally:
+            os.umask(previous_umask)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+def serve(engine, socket_path=None, ready=None):
+    """Runs the daemon until interrupted. `ready`, if given, is a threading.Event set once listening."""
+    server = DaemonServer(engine, socket_path)
+    logger.info(f"Assistant daemon listening on {server.socket_path} (pid {os.getpid()})")
+    if ready is not None:
+        ready.set()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+class DaemonClient:
+    """Client side of the daemon protocol; one connection per request."""
+
+    def __init__(self, socket_path=None, connect_timeout=1.0):
+        self.socket_path = socket_path or default_socket_path()
+        self.connect_timeout = connect_timeout
+
+    def _request(self, message):
+        """Connects and sends `message`; returns the socket. Raises OSError if no daemon is listening."""
+        if not SUPPORTED:
+            raise OSError("Unix domain sockets are not supported on this platform")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.connect_timeout)
+            sock.connect(self.socket_path)
+            sock.settimeout(None) # Reports can take minutes
+            sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    def _events(self, sock):
+        with sock, sock.makefile("rb") as reader:
+            for line in reader:
+                event = json.loads(line)
+                if event.get("event") == "error":
+                    raise DaemonError(event.get("error", "unknown daemon error"))
+                yield event
+        raise DaemonError("Daemon closed the connection before finishing the request.")
+
+    def ping(self):
+        return next(self._events(self._request({"op": "ping"})))
+
+    def metrics(self):
+        return next(self._events(self._request({"op": "metrics"})))["summary"]
+
+    def query(self, query, profile=None, stream=True):
+        """
+        Yields the report pieces produced by the daemon. Raises OSError right away if no
+        daemon is listening (the caller falls back to running in-process), DaemonError later.
+        """
+        sock = self._request({"op": "query", "query": query, "profile": profile, "stream": stream})
+        return self._pieces(sock)
+
+    def _pieces(self, sock):
+        for event in self._events(sock):
+            if event.get("event") == "done":
+                return
+            yield event["text"]
+
+
+def is_running(socket_path=None):
+    """True if a daemon answers on `socket_path`."""
+    try:
+        DaemonClient(socket_path).ping()
+        return True
+    except (OSError, DaemonError, ValueError):
+        return False
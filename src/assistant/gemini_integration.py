@@ -1,21 +1,47 @@
 # src/assistant/gemini_integration.py
-import google.generativeai as genai
 import os
-from dotenv import load_dotenv
+import asyncio
 import logging
 import json # For parsing structured output from routing model
+import threading
+import time
+from . import hedging, metrics, resilience, utils
+from . import quota_scheduler as quota
+from .prompt_cache import CachedPrompt
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+
+def _genai():
+    """google.generativeai, imported on first use: it takes most of a second to import."""
+    import google.generativeai as genai
+    return genai
+
 
 class GeminiClient:
-    def __init__(self):
+    def __init__(self, request_deadline=120.0, retry_budget=None, circuit_breaker=None, backoff=None, quota_scheduler=None,
+                 hedger=None):
+        """
+        request_deadline: overall seconds allowed per request, across all retries.
+        retry_budget / circuit_breaker: default to the process-wide instances in `resilience`,
+            so every client in the process shares one view of Gemini's health.
+        quota_scheduler: admits every attempt against the RPM/TPM quota, interactive calls
+            first; defaults to the process-wide scheduler configured by GEMINI_RPM / GEMINI_TPM.
+        hedger: a hedging.Hedger that sends a duplicate request when a non-streaming call is
+            slower than usual. Off unless given or GEMINI_HEDGING=1.
+        The SDK is imported and configured, and the models built, on the first real call.
+        """
+        self.request_deadline = request_deadline
+        self.retry_budget = retry_budget or resilience.gemini_retry_budget
+        self.circuit_breaker = circuit_breaker or resilience.gemini_circuit_breaker
+        self.backoff = backoff or resilience.ExponentialBackoff()
+        utils.load_env()
         self.api_key = os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment variables.")
-        genai.configure(api_key=self.api_key)
+        self.quota_scheduler = quota_scheduler or quota.default_scheduler()
+        self.hedger = hedger if hedger is not None else (hedging.Hedger() if os.getenv("GEMINI_HEDGING") == "1" else None)
 
         # Define models for different tasks
         # Using 1.5 Flash for routing/analysis, 1.5 Pro for generation
@@ -23,55 +49,258 @@ class GeminiClient:
         self.generative_model_name = 'gemini-2.0-flash'
         self.analysis_model_name = 'gemini-2.0-flash'
 
-        self.generative_model = genai.GenerativeModel(self.generative_model_name)
-        self.analysis_model = genai.GenerativeModel(self.analysis_model_name)
-        logger.info(f"Gemini Client initialized with models: {self.generative_model_name} (gen) and {self.analysis_model_name} (analysis).")
+        self._models = {}
+        self._models_lock = threading.Lock()
+        self.init_seconds = None # Time spent on the deferred SDK setup, once it has happened
+
+    def _model(self, role):
+        """The GenerativeModel for `role` ("generative" or "analysis"), set up on first use."""
+        model = self._models.get(role)
+        if model is not None:
+            return model
+        with self._models_lock:
+            if role not in self._models:
+                started = time.perf_counter()
+                genai = _genai()
+                genai.configure(api_key=self.api_key)
+                self._models.setdefault("generative", genai.GenerativeModel(self.generative_model_name))
+                self._models.setdefault("analysis", genai.GenerativeModel(self.analysis_model_name))
+                self.init_seconds = time.perf_counter() - started
+                logger.info(f"Gemini Client initialized with models: {self.generative_model_name} (gen) and {self.analysis_model_name} (analysis) in {self.init_seconds:.2f}s.")
+            return self._models[role]
+
+    @property
+    def generative_model(self):
+        return self._model("generative")
+
+    @generative_model.setter
+    def generative_model(self, model):
+        self._models["generative"] = model
+
+    @property
+    def analysis_model(self):
+        return self._model("analysis")
+
+    @analysis_model.setter
+    def analysis_model(self, model):
+        self._models["analysis"] = model
+
+    def _check_response(self, response, attempt):
+        """
+        Validates one generate_content response. Returns the text to hand back to the
+        caller (a success or a terminal "Error:" message), or None if the attempt should be retried.
+        """
+        # Check for valid response content
+        if response.candidates and response.candidates[0].content.parts:
+            if response.candidates[0].finish_reason.name == "STOP":
+                return response.text
+            else:
+                logger.warning(f"Gemini generation stopped prematurely on attempt {attempt + 1}: {response.candidates[0].finish_reason.name}")
+                # Return partial or specific message if needed based on finish_reason
+                # return f"Error: Generation stopped - {response.candidates[0].finish_reason.name}"
+        elif hasattr(response, 'prompt_feedback') and response.prompt_feedback.block_reason:
+             logger.error(f"Prompt blocked on attempt {attempt + 1}: {response.prompt_feedback.block_reason.name}")
+             return f"Error: Prompt blocked - {response.prompt_feedback.block_reason.name}"
+        else:
+            logger.warning(f"Gemini response invalid or empty on attempt {attempt + 1}. Response: {response}")
+        return None
+
+    def _start_attempt(self, contents, deadline_at):
+        """
+        Gatekeeping before each attempt. Returns a terminal "Error:" message if the call must
+        not be made (deadline passed, no quota in time, circuit open), otherwise None. The
+        circuit breaker is asked last, so a half-open trial slot is only taken by a call that
+        is actually sent; the attempt must end in record_success, record_failure or release.
+        """
+        return self._check_deadline(deadline_at) or self._wait_for_quota(contents, deadline_at) or self._check_circuit()
+
+    async def _start_attempt_async(self, contents, deadline_at):
+        """Async counterpart of _start_attempt."""
+        return (self._check_deadline(deadline_at) or await self._wait_for_quota_async(contents, deadline_at)
+                or self._check_circuit())
+
+    def _check_deadline(self, deadline_at):
+        if time.monotonic() >= deadline_at:
+            logger.error("Gemini request deadline exceeded before the next attempt.")
+            return "Error: Gemini request deadline exceeded."
+        return None
+
+    def _check_circuit(self):
+        if not self.circuit_breaker.allow_request():
+            logger.warning("Gemini circuit breaker is open; failing fast.")
+            return "Error: Gemini API is temporarily unavailable (circuit breaker open). Please try again shortly."
+        return None
+
+    def _wait_for_quota(self, contents, deadline_at):
+        """Waits for the quota scheduler to admit an attempt; returns a terminal "Error:" message if it did not in time."""
+        try:
+            self.quota_scheduler.acquire(quota.estimate_tokens(contents), timeout=deadline_at - time.monotonic())
+        except quota.QuotaWaitTimeout as e:
+            logger.error(f"{e}; not sending the request.")
+            return "Error: Gemini quota exhausted - the request waited too long for its turn. Please try again shortly."
+        return None
+
+    async def _wait_for_quota_async(self, contents, deadline_at):
+        """Async counterpart of _wait_for_quota."""
+        try:
+            await self.quota_scheduler.acquire_async(quota.estimate_tokens(contents), timeout=deadline_at - time.monotonic())
+        except quota.QuotaWaitTimeout as e:
+            logger.error(f"{e}; not sending the request.")
+            return "Error: Gemini quota exhausted - the request waited too long for its turn. Please try again shortly."
+        return None
+
+    def _handle_exception(self, error, attempt):
+        """Records a failed attempt. Returns a terminal "Error:" message for fatal errors, None for retryable ones."""
+        retryable = resilience.is_retryable(error)
+        logger.error(f"Error generating response from Gemini on attempt {attempt + 1} ({'retryable' if retryable else 'fatal'}): {error}", exc_info=True)
+        if not retryable:
+            # The request itself is bad; this says nothing about the API's health
+            return f"Error: Gemini request failed - {error}"
+        if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+            self.quota_scheduler.throttle() # Over quota: hold every caller back, not just this one
+        self.circuit_breaker.record_failure()
+        return None
+
+    def _retry_delay(self, attempt, max_retries, deadline_at):
+        """Seconds to wait before the next attempt, or None if the request should give up now."""
+        if attempt >= max_retries:
+            logger.error(f"Gemini call failed after {max_retries + 1} attempts.")
+            return None
+        if not self.retry_budget.try_spend():
+            logger.error("Gemini retry budget exhausted; not retrying.")
+            return None
+        delay = self.backoff.delay(attempt)
+        if time.monotonic() + delay >= deadline_at:
+            logger.error("Gemini request deadline would be exceeded by the next retry; giving up.")
+            return None
+        logger.info(f"Retrying Gemini call in {delay:.2f}s (attempt {attempt + 2}/{max_retries + 1})...")
+        return delay
+
+    def _request_options(self, deadline_at):
+        return {"timeout": max(1.0, deadline_at - time.monotonic())}
+
+    def _hedge_options(self, model, contents, generation_config):
+        """(key, admit) for the hedger: calls are compared by model, output limit and prompt size; hedges need quota too."""
+        tokens = quota.estimate_tokens(contents)
+        key = (metrics.model_label(model), getattr(generation_config, "max_output_tokens", None), hedging.size_bucket(tokens))
+        return key, lambda: self.quota_scheduler.try_acquire(tokens)
+
+    def _send(self, model, contents, generation_config, deadline_at):
+        """One generate_content attempt, hedged with a duplicate request if it is slow and hedging is on."""
+        options = {"generation_config": generation_config, "request_options": self._request_options(deadline_at)}
+        if self.hedger is None:
+            return model.generate_content(contents, **options)
+        key, admit = self._hedge_options(model, contents, generation_config)
+        return self.hedger.call(key, model.generate_content, contents, label=metrics.model_label(model), admit=admit, **options)
+
+    async def _send_async(self, model, contents, generation_config, deadline_at):
+        """Async counterpart of _send; the slower of two hedged requests is cancelled."""
+        options = {"generation_config": generation_config, "request_options": self._request_options(deadline_at)}
+        if self.hedger is None:
+            return await model.generate_content_async(contents, **options)
+        key, admit = self._hedge_options(model, contents, generation_config)
+        return await self.hedger.call_async(key, model.generate_content_async, contents,
+                                            label=metrics.model_label(model), admit=admit, **options)
 
-    def _generate_with_retry(self, model, prompt, generation_config, max_retries=2):
-        """Internal method to handle generation with retries for potential transient issues."""
+    def _record_outcome(self, model, result):
+        outcome = "error" if not result or result.startswith("Error:") else "ok"
+        metrics.GEMINI_REQUESTS.labels(metrics.model_label(model), outcome).inc()
+
+    def _generate_with_retry(self, model, prompt, generation_config, max_retries=2, deadline=None):
+        """Runs _generate_attempts while recording the in-flight gauge and the request outcome."""
+        with metrics.IN_FLIGHT.labels("gemini").track_inprogress():
+            result = self._generate_attempts(model, prompt, generation_config, max_retries, deadline)
+        self._record_outcome(model, result)
+        return result
+
+    async def _generate_with_retry_async(self, model, prompt, generation_config, max_retries=2, deadline=None):
+        """Async counterpart of _generate_with_retry."""
+        with metrics.IN_FLIGHT.labels("gemini").track_inprogress():
+            result = await self._generate_attempts_async(model, prompt, generation_config, max_retries, deadline)
+        self._record_outcome(model, result)
+        return result
+
+    def _generate_attempts(self, model, prompt, generation_config, max_retries=2, deadline=None):
+        """
+        Internal method to handle generation with retries for transient issues: fatal errors
+        are not retried, retries back off exponentially with jitter, draw from the shared
+        retry budget and stop at the request deadline; the circuit breaker fails fast while
+        the API is unhealthy.
+        """
+        deadline_at = time.monotonic() + (deadline or self.request_deadline)
+        self.retry_budget.record_request()
         for attempt in range(max_retries + 1):
+            refused = self._start_attempt(prompt, deadline_at)
+            if refused:
+                return refused
             try:
-                response = model.generate_content(
-                    prompt,
-                    generation_config=generation_config
-                )
-                # Check for valid response content
-                if response.candidates and response.candidates[0].content.parts:
-                    if response.candidates[0].finish_reason.name == "STOP":
-                        return response.text
-                    else:
-                        logger.warning(f"Gemini generation stopped prematurely on attempt {attempt + 1}: {response.candidates[0].finish_reason.name}")
-                        # Return partial or specific message if needed based on finish_reason
-                        # return f"Error: Generation stopped - {response.candidates[0].finish_reason.name}"
-                elif hasattr(response, 'prompt_feedback') and response.prompt_feedback.block_reason:
-                     logger.error(f"Prompt blocked on attempt {attempt + 1}: {response.prompt_feedback.block_reason.name}")
-                     return f"Error: Prompt blocked - {response.prompt_feedback.block_reason.name}"
-                else:
-                    logger.warning(f"Gemini response invalid or empty on attempt {attempt + 1}. Response: {response}")
+                response = self._send(model, prompt, generation_config, deadline_at)
+                self.circuit_breaker.record_success()
+                metrics.record_usage(model, response)
+                result = self._check_response(response, attempt)
+                if result is not None:
+                    return result
 
             except Exception as e:
-                logger.error(f"Error generating response from Gemini on attempt {attempt + 1}: {e}", exc_info=True)
+                fatal = self._handle_exception(e, attempt)
+                if fatal:
+                    return fatal
+            finally:
+                self.circuit_breaker.release() # No-op once the attempt recorded a verdict
 
-            if attempt < max_retries:
-                logger.info(f"Retrying Gemini call (attempt {attempt + 2}/{max_retries + 1})...")
-                # import time
-                # time.sleep(1)
-            else:
-                logger.error(f"Gemini call failed after {max_retries + 1} attempts.")
-                return f"Error: Failed to get response from Gemini after multiple attempts."
-        return "Error: Max retries exceeded." # Should not be reached if loop logic is correct
+            delay = self._retry_delay(attempt, max_retries, deadline_at)
+            if delay is None:
+                break
+            metrics.GEMINI_RETRIES.labels(metrics.model_label(model)).inc()
+            time.sleep(delay)
+        return "Error: Failed to get response from Gemini after multiple attempts."
 
+    async def _generate_attempts_async(self, model, prompt, generation_config, max_retries=2, deadline=None):
+        """Async counterpart of _generate_attempts built on generate_content_async."""
+        deadline_at = time.monotonic() + (deadline or self.request_deadline)
+        self.retry_budget.record_request()
+        for attempt in range(max_retries + 1):
+            refused = await self._start_attempt_async(prompt, deadline_at)
+            if refused:
+                return refused
+            try:
+                response = await self._send_async(model, prompt, generation_config, deadline_at)
+                self.circuit_breaker.record_success()
+                metrics.record_usage(model, response)
+                result = self._check_response(response, attempt)
+                if result is not None:
+                    return result
 
-    def generate_analysis(self, prompt, temperature=0.2, max_output_tokens=8192):
-        """Uses the analysis model (Flash) for tasks like routing and entity extraction."""
-        generation_config = genai.types.GenerationConfig(
+            except Exception as e:
+                fatal = self._handle_exception(e, attempt)
+                if fatal:
+                    return fatal
+            finally:
+                self.circuit_breaker.release() # No-op once the attempt recorded a verdict
+
+            delay = self._retry_delay(attempt, max_retries, deadline_at)
+            if delay is None:
+                break
+            metrics.GEMINI_RETRIES.labels(metrics.model_label(model)).inc()
+            await asyncio.sleep(delay)
+        return "Error: Failed to get response from Gemini after multiple attempts."
+
+    def _analysis_config(self, temperature, max_output_tokens):
+        return _genai().types.GenerationConfig(
             temperature=temperature, # Lower temp for more deterministic analysis
             max_output_tokens=max_output_tokens,
             response_mime_type="application/json" # Request JSON output
         )
-        logger.info(f"Sending prompt to Analysis Model ({self.analysis_model_name})...")
-        raw_response = self._generate_with_retry(self.analysis_model, prompt, generation_config)
 
+    def _response_config(self, temperature, max_output_tokens):
+        return _genai().types.GenerationConfig(
+            temperature=temperature,
+            max_output_tokens=max_output_tokens
+            # Consider response_mime_type="text/plain" if Markdown causes issues
+        )
+
+    def _parse_analysis_response(self, raw_response):
+        """Turns the analysis model's raw text into a dict, or an {"error": ...} dict."""
         if raw_response and not raw_response.startswith("Error:"):
             try:
                 # Gemini's JSON mode might include ```json ... ``` markers, try to strip them
@@ -86,15 +315,249 @@ class GeminiClient:
             logger.error(f"Analysis model returned an error or no response: {raw_response}")
             return {"error": raw_response or "No response from analysis model"}
 
+    def _log_generated_response(self, response_text):
+        logger.info(f"Received response from Generative Model (length: {len(response_text)})." if response_text and not response_text.startswith("Error:") else f"Generative model returned: {response_text}")
+
+
+    def generate_analysis(self, prompt, temperature=0.2, max_output_tokens=8192):
+        """Uses the analysis model (Flash) for tasks like routing and entity extraction."""
+        generation_config = self._analysis_config(temperature, max_output_tokens)
+        logger.info(f"Sending prompt to Analysis Model ({self.analysis_model_name})...")
+        raw_response = self._generate_with_retry(self.analysis_model, prompt, generation_config)
+        return self._parse_analysis_response(raw_response)
+
+    async def generate_analysis_async(self, prompt, temperature=0.2, max_output_tokens=8192):
+        """Async counterpart of generate_analysis."""
+        generation_config = self._analysis_config(temperature, max_output_tokens)
+        logger.info(f"Sending prompt to Analysis Model ({self.analysis_model_name}, async)...")
+        raw_response = await self._generate_with_retry_async(self.analysis_model, prompt, generation_config)
+        return self._parse_analysis_response(raw_response)
+
+
+    def _resolve_prompt(self, prompt, use_cached_prefix=True):
+        """
+        Returns (model, contents) for a prompt string or a CachedPrompt. A CachedPrompt whose
+        prefix is registered server-side only sends its suffix to the model bound to the cache;
+        otherwise prefix and suffix are sent together to the generative model.
+        """
+        if isinstance(prompt, CachedPrompt):
+            if use_cached_prefix and prompt.prefix.model is not None:
+                return prompt.prefix.model, prompt.suffix
+            return self.generative_model, prompt.prefix.full_text(prompt.suffix)
+        return self.generative_model, prompt
+
+    def _cached_prefix_failed(self, prompt, model, result):
+        """
+        True if a request against a cached prefix failed fatally (e.g. the cached content
+        expired server-side). The prefix is marked for re-registration and the caller
+        retries once with the full prompt.
+        """
+        if model is self.generative_model or not (result or "").startswith("Error: Gemini request failed"):
+            return False
+        logger.warning("Request using the cached prompt prefix failed; retrying with the full prompt.")
+        prompt.prefix.model = None
+        prompt.prefix.expires_at = 0
+        return True
 
     def generate_response(self, prompt, temperature=0.7, max_output_tokens=8192):
-        """Uses the main generative model for detailed insights."""
-        generation_config = genai.types.GenerationConfig(
-            temperature=temperature,
-            max_output_tokens=max_output_tokens
-            # Consider response_mime_type="text/plain" if Markdown causes issues
-        )
+        """Uses the main generative model for detailed insights. `prompt` is a string or a CachedPrompt."""
+        generation_config = self._response_config(temperature, max_output_tokens)
         logger.info(f"Sending prompt to Generative Model ({self.generative_model_name})...")
-        response_text = self._generate_with_retry(self.generative_model, prompt, generation_config)
-        logger.info(f"Received response from Generative Model (length: {len(response_text)})." if response_text and not response_text.startswith("Error:") else f"Generative model returned: {response_text}")
-        return response_text
\ No newline at end of file
+        with metrics.timed("generate"):
+            model, contents = self._resolve_prompt(prompt)
+            response_text = self._generate_with_retry(model, contents, generation_config)
+            if self._cached_prefix_failed(prompt, model, response_text):
+                model, contents = self._resolve_prompt(prompt, use_cached_prefix=False)
+                response_text = self._generate_with_retry(model, contents, generation_config)
+        self._log_generated_response(response_text)
+        return response_text
+
+    async def generate_response_async(self, prompt, temperature=0.7, max_output_tokens=8192):
+        """Async counterpart of generate_response."""
+        generation_config = self._response_config(temperature, max_output_tokens)
+        logger.info(f"Sending prompt to Generative Model ({self.generative_model_name}, async)...")
+        with metrics.timed("generate"):
+            model, contents = self._resolve_prompt(prompt)
+            response_text = await self._generate_with_retry_async(model, contents, generation_config)
+            if self._cached_prefix_failed(prompt, model, response_text):
+                model, contents = self._resolve_prompt(prompt, use_cached_prefix=False)
+                response_text = await self._generate_with_retry_async(model, contents, generation_config)
+        self._log_generated_response(response_text)
+        return response_text
+
+    @staticmethod
+    def _chunk_text(chunk):
+        try:
+            return chunk.text
+        except ValueError:
+            # Chunks without parts (e.g. the final one carrying only finish_reason)
+            return ""
+
+    def generate_response_stream(self, prompt, temperature=0.7, max_output_tokens=8192, max_retries=2):
+        """
+        Streaming counterpart of generate_response: yields text chunks as the generative
+        model produces them. Retries only happen before the first chunk was yielded; a
+        failure mid-stream ends the stream with an "Error:" chunk. If nothing could be
+        generated, a single "Error: ..." chunk is yielded, like generate_response returns.
+        """
+        generation_config = self._response_config(temperature, max_output_tokens)
+        logger.info(f"Streaming prompt to Generative Model ({self.generative_model_name})...")
+        with metrics.timed("generate"):
+            model, contents = self._resolve_prompt(prompt)
+            first = True
+            for text in self._stream_with_retry(model, contents, generation_config, max_retries):
+                if first and self._cached_prefix_failed(prompt, model, text):
+                    model, contents = self._resolve_prompt(prompt, use_cached_prefix=False)
+                    yield from self._stream_with_retry(model, contents, generation_config, max_retries)
+                    return
+                first = False
+                yield text
+
+    @staticmethod
+    def _stream_failed(first_text, last_text):
+        return first_text.startswith("Error:") or last_text.startswith("\n\nError:")
+
+    def _stream_with_retry(self, model, prompt, generation_config, max_retries):
+        """Runs _stream_attempts while recording the in-flight gauge and the request outcome."""
+        first_text = last_text = None
+        with metrics.IN_FLIGHT.labels("gemini").track_inprogress():
+            for text in self._stream_attempts(model, prompt, generation_config, max_retries):
+                first_text = text if first_text is None else first_text
+                last_text = text
+                yield text
+        self._record_outcome(model, "Error:" if self._stream_failed(first_text or "", last_text or "") else "ok")
+
+    def _stream_attempts(self, model, prompt, generation_config, max_retries):
+        """Streams one prompt from `model`, with the retry rules described in generate_response_stream."""
+        deadline_at = time.monotonic() + self.request_deadline
+        self.retry_budget.record_request()
+        for attempt in range(max_retries + 1):
+            refused = self._start_attempt(prompt, deadline_at)
+            if refused:
+                yield refused
+                return
+            emitted = 0
+            last_chunk = None
+            try:
+                response = model.generate_content(
+                    prompt,
+                    generation_config=generation_config,
+                    stream=True,
+                    request_options=self._request_options(deadline_at)
+                )
+                for chunk in response:
+                    last_chunk = chunk
+                    text = self._chunk_text(chunk)
+                    if text:
+                        emitted += len(text)
+                        yield text
+
+                self.circuit_breaker.record_success()
+                metrics.record_usage(model, last_chunk) # Usage metadata arrives with the final chunk
+                if emitted:
+                    logger.info(f"Finished streaming response from Generative Model (length: {emitted}).")
+                    return
+                if hasattr(response, 'prompt_feedback') and response.prompt_feedback.block_reason:
+                    logger.error(f"Prompt blocked on attempt {attempt + 1}: {response.prompt_feedback.block_reason.name}")
+                    yield f"Error: Prompt blocked - {response.prompt_feedback.block_reason.name}"
+                    return
+                logger.warning(f"Gemini stream returned no content on attempt {attempt + 1}.")
+
+            except Exception as e:
+                fatal = self._handle_exception(e, attempt)
+                if emitted:
+                    # Part of the answer is already on its way to the user; it cannot be retried transparently
+                    yield f"\n\nError: Response stream interrupted - {e}"
+                    return
+                if fatal:
+                    yield fatal
+                    return
+            finally:
+                self.circuit_breaker.release() # No-op once the attempt recorded a verdict
+
+            delay = self._retry_delay(attempt, max_retries, deadline_at)
+            if delay is None:
+                break
+            metrics.GEMINI_RETRIES.labels(metrics.model_label(model)).inc()
+            time.sleep(delay)
+        yield "Error: Failed to get response from Gemini after multiple attempts."
+
+    async def generate_response_stream_async(self, prompt, temperature=0.7, max_output_tokens=8192, max_retries=2):
+        """Async counterpart of generate_response_stream; an async generator of text chunks."""
+        generation_config = self._response_config(temperature, max_output_tokens)
+        logger.info(f"Streaming prompt to Generative Model ({self.generative_model_name}, async)...")
+        with metrics.timed("generate"):
+            model, contents = self._resolve_prompt(prompt)
+            first = True
+            async for text in self._stream_with_retry_async(model, contents, generation_config, max_retries):
+                if first and self._cached_prefix_failed(prompt, model, text):
+                    model, contents = self._resolve_prompt(prompt, use_cached_prefix=False)
+                    async for retried in self._stream_with_retry_async(model, contents, generation_config, max_retries):
+                        yield retried
+                    return
+                first = False
+                yield text
+
+    async def _stream_with_retry_async(self, model, prompt, generation_config, max_retries):
+        """Async counterpart of _stream_with_retry."""
+        first_text = last_text = None
+        with metrics.IN_FLIGHT.labels("gemini").track_inprogress():
+            async for text in self._stream_attempts_async(model, prompt, generation_config, max_retries):
+                first_text = text if first_text is None else first_text
+                last_text = text
+                yield text
+        self._record_outcome(model, "Error:" if self._stream_failed(first_text or "", last_text or "") else "ok")
+
+    async def _stream_attempts_async(self, model, prompt, generation_config, max_retries):
+        """Async counterpart of _stream_attempts."""
+        deadline_at = time.monotonic() + self.request_deadline
+        self.retry_budget.record_request()
+        for attempt in range(max_retries + 1):
+            refused = await self._start_attempt_async(prompt, deadline_at)
+            if refused:
+                yield refused
+                return
+            emitted = 0
+            last_chunk = None
+            try:
+                response = await model.generate_content_async(
+                    prompt,
+                    generation_config=generation_config,
+                    stream=True,
+                    request_options=self._request_options(deadline_at)
+                )
+                async for chunk in response:
+                    last_chunk = chunk
+                    text = self._chunk_text(chunk)
+                    if text:
+                        emitted += len(text)
+                        yield text
+
+                self.circuit_breaker.record_success()
+                metrics.record_usage(model, last_chunk) # Usage metadata arrives with the final chunk
+                if emitted:
+                    logger.info(f"Finished streaming response from Generative Model (length: {emitted}).")
+                    return
+                if hasattr(response, 'prompt_feedback') and response.prompt_feedback.block_reason:
+                    logger.error(f"Prompt blocked on attempt {attempt + 1}: {response.prompt_feedback.block_reason.name}")
+                    yield f"Error: Prompt blocked - {response.prompt_feedback.block_reason.name}"
+                    return
+                logger.warning(f"Gemini stream returned no content on attempt {attempt + 1}.")
+
+            except Exception as e:
+                fatal = self._handle_exception(e, attempt)
+                if emitted:
+                    yield f"\n\nError: Response stream interrupted - {e}"
+                    return
+                if fatal:
+                    yield fatal
+                    return
+            finally:
+                self.circuit_breaker.release() # No-op once the attempt recorded a verdict
+
+            delay = self._retry_delay(attempt, max_retries, deadline_at)
+            if delay is None:
+                break
+            metrics.GEMINI_RETRIES.labels(metrics.model_label(model)).inc()
+            await asyncio.sleep(delay)
+        yield "Error: Failed to get response from Gemini after multiple attempts."
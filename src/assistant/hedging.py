@@ -0,0 +1,141 @@
+# src/assistant/hedging.py
+"""
+Request hedging for Gemini calls: if a call has not returned after the latency most calls
+of its kind finish within (the observed p90 for the same model, output limit and prompt
+size), an identical second request is sent and whichever answers first is used. The
+slower one is cancelled (async) or left to finish with its result ignored (threads).
+
+Hedges are paid for from a budget that every call tops up by `budget_ratio`, so hedging
+adds at most about that share of extra requests however slow the API gets.
+"""
+import asyncio
+import contextvars
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from . import metrics, resilience, utils
+
+logger = logging.getLogger(__name__)
+
+
+def size_bucket(tokens):
+    """Prompt size class: 0 for up to 1k tokens, then one class per factor of 4 (4k, 16k, ...)."""
+    return 0 if tokens <= 1024 else math.ceil(math.log(tokens / 1024, 4))
+
+
+class Hedger:
+    """
+    percentile: hedge once a call is slower than this share of recent calls of its kind.
+    min_samples: calls of a kind seen before it is hedged at all.
+    min_delay: never hedge sooner than this many seconds.
+    budget_ratio: hedges allowed per call, on average (plus a small burst of `max_burst`).
+    """
+
+    def __init__(self, percentile=90, min_samples=20, min_delay=0.5, budget_ratio=0.05, max_burst=2.0,
+                 window=200, max_workers=64):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        # Same accounting as the retry budget, without its low-traffic floor: hedges are always a share of calls
+        self.budget = resilience.RetryBudget(ratio=budget_ratio, min_retries_per_second=0.0, max_tokens=max_burst)
+        self.window = window
+        self._latencies = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def record(self, key, seconds):
+        with self._lock:
+            samples = self._latencies.get(key)
+            if samples is None:
+                samples = self._latencies[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def delay(self, key):
+        """Seconds to wait before hedging a call of kind `key`, or None while too few calls were seen."""
+        with self._lock:
+            samples = list(self._latencies.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return max(self.min_delay, utils.percentile(samples, self.percentile))
+
+    def _timed(self, key, fn, args, kwargs):
+        started = time.monotonic()
+        result = fn(*args, **kwargs)
+        self.record(key, time.monotonic() - started) # Losers are recorded too, so slow calls keep counting
+        return result
+
+    def _submit(self, key, fn, args, kwargs):
+        return self._executor.submit(contextvars.copy_context().run, self._timed, key, fn, args, kwargs)
+
+    def _should_hedge(self, key, label, admit):
+        if not self.budget.try_spend():
+            metrics.GEMINI_HEDGES.labels(label, "budget_exhausted").inc()
+            return False
+        if admit is not None and not admit():
+            metrics.GEMINI_HEDGES.labels(label, "quota_exhausted").inc()
+            return False
+        logger.info(f"Gemini call of kind {key} is slower than its p{self.percentile}; sending a hedged request.")
+        return True
+
+    def call(self, key, fn, *args, label="unknown", admit=None, **kwargs):
+        """
+        Returns fn(*args, **kwargs), hedged with a second call if it is slow. `admit()` is asked
+        before a hedge is sent (e.g. for quota) and may refuse it. If every call raised, the
+        first call's exception is raised.
+        """
+        self.budget.record_request()
+        delay = self.delay(key)
+        if delay is None: # Nothing to compare against yet: run inline
+            return self._timed(key, fn, args, kwargs)
+        primary = self._submit(key, fn, args, kwargs)
+        if wait([primary], timeout=delay).done or not self._should_hedge(key, label, admit):
+            return primary.result()
+        hedge = self._submit(key, fn, args, kwargs)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    metrics.GEMINI_HEDGES.labels(label, "hedge_won" if future is hedge else "primary_won").inc()
+                    return future.result() # The other call keeps running; its result is dropped
+        return primary.result()
+
+    async def _timed_async(self, key, coro_fn, args, kwargs):
+        started = time.monotonic()
+        try:
+            result = await coro_fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            # A cancelled loser ran at least this long; leaving it out would let the threshold drift down
+            self.record(key, time.monotonic() - started)
+            raise
+        self.record(key, time.monotonic() - started)
+        return result
+
+    async def call_async(self, key, coro_fn, *args, label="unknown", admit=None, **kwargs):
+        """Async counterpart of call(); the slower request is cancelled."""
+        self.budget.record_request()
+        delay = self.delay(key)
+        if delay is None:
+            return await self._timed_async(key, coro_fn, args, kwargs)
+        tasks = [asyncio.ensure_future(self._timed_async(key, coro_fn, args, kwargs))]
+        try:
+            await asyncio.wait(tasks, timeout=delay)
+            if tasks[0].done() or not self._should_hedge(key, label, admit):
+                return await tasks[0]
+            tasks.append(asyncio.ensure_future(self._timed_async(key, coro_fn, args, kwargs)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        metrics.GEMINI_HEDGES.labels(label, "hedge_won" if task is tasks[1] else "primary_won").inc()
+                        return task.result()
+            return tasks[0].result()
+        finally:
+            for task in tasks: # Also when the caller itself is cancelled
+                if not task.done():
+                    task.cancel()
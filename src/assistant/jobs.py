@@ -0,0 +1,226 @@
+# src/assistant/jobs.py
+"""
+Background execution of long-running report jobs. Clients submit a query, get a job ID
+back immediately and then poll (or subscribe to) the job's status, progress stage and
+result, while a fixed pool of worker threads runs the pipeline.
+
+The queue sits behind the small JobQueue interface; InProcessJobQueue is the only backend
+today, but a Redis- or database-backed queue can replace it without touching the workers.
+"""
+import logging
+import queue
+import threading
+import time
+import uuid
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+
+class JobQueueFull(Exception):
+    """Raised by JobQueue.put when the backlog limit is reached."""
+
+
+class JobQueue:
+    """Interface of the job queue backends: a FIFO of job IDs."""
+
+    def put(self, job_id):
+        raise NotImplementedError
+
+    def get(self, timeout=None):
+        """Returns the next job ID, or None if none arrived within `timeout` seconds."""
+        raise NotImplementedError
+
+    def qsize(self):
+        raise NotImplementedError
+
+
+class InProcessJobQueue(JobQueue):
+    """queue.Queue-backed backend; jobs are lost when the process exits."""
+
+    def __init__(self, max_size=0):
+        self._queue = queue.Queue(maxsize=max_size)
+
+    def put(self, job_id):
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            raise JobQueueFull(f"Job queue is full ({self._queue.maxsize} jobs waiting).") from None
+
+    def get(self, timeout=None):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+class Job:
+    """State of one submitted query. `version` increases on every change, for subscribers."""
+
+    def __init__(self, query, profile=None):
+        self.id = uuid.uuid4().hex
+        self.query = query
+        self.profile = profile
+        self.status = QUEUED
+        self.stage = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.version = 0
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def to_dict(self, include_result=True):
+        data = {
+            "id": self.id,
+            "query": self.query,
+            "profile": self.profile,
+            "status": self.status,
+            "stage": self.stage,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """
+    Runs `handler(job, progress)` for submitted jobs on `workers` threads. The handler
+    reports pipeline stages through `progress(stage)` and returns the job's result; an
+    exception fails the job. Finished jobs are kept for `finished_ttl` seconds (and at
+    most `max_finished` of them) so clients can still fetch the result.
+    """
+
+    def __init__(self, handler, workers=4, job_queue=None, max_finished=1000, finished_ttl=3600, poll_interval=0.5):
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.queue = job_queue if job_queue is not None else InProcessJobQueue()
+        self.max_finished = max_finished
+        self.finished_ttl = finished_ttl
+        self.poll_interval = poll_interval
+        self._jobs = {}
+        self._changed = threading.Condition()
+        self._busy = 0
+        self._busy_seconds = 0.0
+        self._started_at = time.monotonic()
+        self._stopping = threading.Event()
+        self._threads = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, query, profile=None):
+        """Queues a job and returns it; raises JobQueueFull when the backlog is at its limit."""
+        job = Job(query, profile)
+        with self._changed:
+            self._prune()
+            self._jobs[job.id] = job
+        try:
+            self.queue.put(job.id)
+        except JobQueueFull:
+            with self._changed:
+                del self._jobs[job.id]
+            raise
+        logger.info(f"Queued job {job.id} for query: '{query}'")
+        return job
+
+    def get(self, job_id):
+        with self._changed:
+            return self._jobs.get(job_id)
+
+    def wait_for_change(self, job_id, seen_version, timeout=None):
+        """
+        Blocks until the job's version differs from `seen_version` (or `timeout` passes).
+        Returns (job_dict, version), or (None, None) if the job is unknown.
+        """
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None, None
+            self._changed.wait_for(lambda: job.version != seen_version, timeout=timeout)
+            return job.to_dict(include_result=job.finished), job.version
+
+    def _update(self, job, **changes):
+        with self._changed:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.version += 1
+            self._changed.notify_all()
+
+    def _prune(self):
+        """Drops expired finished jobs, then the oldest finished ones beyond max_finished. Caller holds the lock."""
+        now = time.time()
+        finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.finished_at)
+        expired = [job for job in finished if now - job.finished_at > self.finished_ttl]
+        overflow = finished[len(expired):][:max(0, len(finished) - len(expired) - self.max_finished)]
+        for job in expired + overflow:
+            del self._jobs[job.id]
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job_id = self.queue.get(timeout=self.poll_interval)
+            if job_id is None:
+                continue
+            job = self.get(job_id)
+            if job is None:
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        started = time.monotonic()
+        with self._changed:
+            self._busy += 1
+        self._update(job, status=RUNNING, started_at=time.time())
+        try:
+            with metrics.IN_FLIGHT.labels("job").track_inprogress():
+                result = self.handler(job, lambda stage: self._update(job, stage=stage))
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+            self._update(job, status=FAILED, error=str(e), finished_at=time.time())
+        else:
+            self._update(job, status=SUCCEEDED, result=result, finished_at=time.time())
+        finally:
+            with self._changed:
+                self._busy -= 1
+                self._busy_seconds += time.monotonic() - started
+
+    def stats(self):
+        """Queue depth, worker utilization and job counts by status."""
+        with self._changed:
+            counts = {state: 0 for state in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            busy, busy_seconds = self._busy, self._busy_seconds
+        capacity = self.workers * (time.monotonic() - self._started_at)
+        return {
+            "queue_depth": self.queue.qsize(),
+            "workers": self.workers,
+            "busy_workers": busy,
+            "utilization": round(busy_seconds / capacity, 4) if capacity > 0 else 0.0,
+            "jobs": counts,
+        }
+
+    def shutdown(self, wait=True):
+        """Stops the workers after their current job; queued jobs stay queued."""
+        self._stopping.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
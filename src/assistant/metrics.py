@@ -0,0 +1,178 @@
+# src/assistant/metrics.py
+"""
+Prometheus instrumentation for the report pipeline: per-stage latency histograms, Gemini
+token/retry counters, in-flight gauges and cache hit rates. Everything lives on the
+module's own `registry` (not prometheus_client's global one); the Flask app serves it on
+/metrics and the CLI prints `summary()` with --metrics.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+registry = CollectorRegistry()
+
+# Searches take well under a second when cached; generation can take a minute or more
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+STAGE_SECONDS = Histogram(
+    "assistant_stage_seconds", "Wall time of one pipeline stage (analysis, search, generate).",
+    ["stage"], buckets=LATENCY_BUCKETS, registry=registry)
+GEMINI_TOKENS = Counter(
+    "assistant_gemini_tokens", "Tokens reported in Gemini usage metadata (kind: prompt, response, cached).",
+    ["model", "kind"], registry=registry)
+GEMINI_REQUESTS = Counter(
+    "assistant_gemini_requests", "Gemini requests by final outcome (ok, error).",
+    ["model", "outcome"], registry=registry)
+GEMINI_RETRIES = Counter(
+    "assistant_gemini_retries", "Gemini attempts retried after a failure or an unusable response.",
+    ["model"], registry=registry)
+IN_FLIGHT = Gauge(
+    "assistant_in_flight", "Operations currently in progress (kind: report, search, gemini, job).",
+    ["kind"], registry=registry)
+JOB_QUEUE_DEPTH = Gauge(
+    "assistant_job_queue_depth", "Report jobs waiting for a worker.", registry=registry)
+QUERY_ROUTES = Counter(
+    "assistant_query_routes", "Query analyses by route (local: fast-path classifier, llm: Gemini, audit: both).",
+    ["route"], registry=registry)
+CLASSIFIER_AGREEMENT = Counter(
+    "assistant_classifier_agreement", "Local query-type predictions checked against the LLM analysis (outcome: agree, disagree).",
+    ["confidence", "outcome"], registry=registry)
+GEMINI_HEDGES = Counter(
+    "assistant_gemini_hedges", "Slow Gemini calls considered for a hedged request "
+    "(outcome: primary_won, hedge_won, budget_exhausted, quota_exhausted).",
+    ["model", "outcome"], registry=registry)
+QUOTA_WAIT_SECONDS = Histogram(
+    "assistant_gemini_quota_wait_seconds", "Time a Gemini call waited for quota admission (priority: interactive, batch).",
+    ["priority"], buckets=(0.0, 0.05) + LATENCY_BUCKETS[2:], registry=registry)
+QUOTA_TIMEOUTS = Counter(
+    "assistant_gemini_quota_timeouts", "Gemini calls that gave up after the maximum quota queue wait.",
+    ["priority"], registry=registry)
+SEMANTIC_SIMILARITY = Histogram(
+    "assistant_semantic_similarity", "Best cosine similarity of a semantic report cache lookup (outcome: hit, miss).",
+    ["outcome"], buckets=(0.3, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99, 1.0), registry=registry)
+
+_USAGE_FIELDS = (("prompt", "prompt_token_count"), ("response", "candidates_token_count"), ("cached", "cached_content_token_count"))
+
+
+class _CacheCollector:
+    """Exports the CacheStats snapshots of registered caches at scrape time."""
+
+    def __init__(self):
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, get_stats):
+        with self._lock:
+            self._sources[name] = get_stats # Re-registering a name replaces the previous cache
+
+    def snapshots(self):
+        with self._lock:
+            sources = dict(self._sources)
+        return {name: get_stats() for name, get_stats in sources.items()}
+
+    def collect(self):
+        hits = CounterMetricFamily("assistant_cache_hits", "Cache lookups answered from the cache.", labels=["cache"])
+        misses = CounterMetricFamily("assistant_cache_misses", "Cache lookups that missed.", labels=["cache"])
+        ratio = GaugeMetricFamily("assistant_cache_hit_ratio", "Share of cache lookups that hit.", labels=["cache"])
+        for name, stats in self.snapshots().items():
+            hits.add_metric([name], stats.get("hits", 0))
+            misses.add_metric([name], stats.get("misses", 0))
+            ratio.add_metric([name], stats.get("hit_rate", 0.0))
+        return [hits, misses, ratio]
+
+
+_cache_collector = _CacheCollector()
+registry.register(_cache_collector)
+
+
+def register_cache(name, get_stats):
+    """Exports a cache's hit/miss counters; `get_stats()` returns a CacheStats.snapshot()-style dict."""
+    _cache_collector.register(name, get_stats)
+
+
+@contextmanager
+def timed(stage):
+    """Observes the wall time of the enclosed block in the stage latency histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def model_label(model):
+    name = getattr(model, "model_name", None)
+    return name.removeprefix("models/") if isinstance(name, str) else "unknown"
+
+
+def record_usage(model, response):
+    """Adds the token counts from a Gemini response's usage_metadata, if it has any."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    label = model_label(model)
+    for kind, field in _USAGE_FIELDS:
+        count = getattr(usage, field, None)
+        if isinstance(count, int) and count > 0:
+            GEMINI_TOKENS.labels(label, kind).inc(count)
+
+
+def render():
+    """Returns (body, content_type) in the Prometheus text exposition format."""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def _bucket_quantile(buckets, count, q):
+    """Estimates a quantile from cumulative histogram buckets, like PromQL's histogram_quantile."""
+    if not count:
+        return 0.0
+    rank = q * count
+    lower_bound, lower_count = 0.0, 0.0
+    for upper_bound, cumulative in buckets:
+        if cumulative >= rank:
+            if upper_bound == float("inf"):
+                return lower_bound
+            width = cumulative - lower_count
+            return lower_bound + (upper_bound - lower_bound) * ((rank - lower_count) / width if width else 1.0)
+        lower_bound, lower_count = upper_bound, cumulative
+    return lower_bound
+
+
+def summary():
+    """Plain-dict digest of the registry for the CLI: stage latencies, tokens, retries and cache hit rates."""
+    stages, tokens, retries, requests = {}, {}, {}, {}
+    for family in registry.collect():
+        if family.name == "assistant_stage_seconds":
+            by_stage = {}
+            for sample in family.samples:
+                entry = by_stage.setdefault(sample.labels["stage"], {"buckets": []})
+                if sample.name.endswith("_bucket"):
+                    entry["buckets"].append((float(sample.labels["le"]), sample.value))
+                elif sample.name.endswith("_count"):
+                    entry["count"] = sample.value
+                elif sample.name.endswith("_sum"):
+                    entry["sum"] = sample.value
+            for stage, entry in by_stage.items():
+                count = int(entry.get("count", 0))
+                stages[stage] = {
+                    "count": count,
+                    "mean_seconds": round(entry.get("sum", 0.0) / count, 3) if count else 0.0,
+                    "p50_seconds": round(_bucket_quantile(entry["buckets"], count, 0.5), 3),
+                    "p95_seconds": round(_bucket_quantile(entry["buckets"], count, 0.95), 3),
+                }
+        elif family.name in ("assistant_gemini_tokens", "assistant_gemini_retries", "assistant_gemini_requests"):
+            for sample in family.samples:
+                if not sample.name.endswith("_total"):
+                    continue
+                if family.name == "assistant_gemini_tokens":
+                    tokens[sample.labels["kind"]] = tokens.get(sample.labels["kind"], 0) + int(sample.value)
+                elif family.name == "assistant_gemini_retries":
+                    retries[sample.labels["model"]] = retries.get(sample.labels["model"], 0) + int(sample.value)
+                else:
+                    requests[sample.labels["outcome"]] = requests.get(sample.labels["outcome"], 0) + int(sample.value)
+    caches = {name: stats.get("hit_rate", 0.0) for name, stats in _cache_collector.snapshots().items()}
+    return {"stages": stages, "gemini_tokens": tokens, "gemini_requests": requests,
+            "gemini_retries": retries, "cache_hit_rates": caches}
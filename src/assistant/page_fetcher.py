@@ -0,0 +1,254 @@
+# src/assistant/page_fetcher.py
+"""
+Deep fetch of search hits: downloads result pages concurrently over a pooled HTTP session
+and extracts readable text, so the prompt gets passages instead of one-line snippets.
+
+Each page is read in chunks and parsed as it arrives; reading stops once `max_chars` of
+text have been extracted, `max_bytes` have been read or the per-page deadline passes.
+Connections per host are capped, and extracted passages are cached per URL together with
+the page's ETag/Last-Modified validators so stale entries are revalidated with a
+conditional request instead of being downloaded again.
+"""
+import codecs
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cache import CacheStats, SQLiteTTLStore, TTLCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_CACHE_PATH = os.path.join(".cache", "page_cache.sqlite3")
+USER_AGENT = "Mozilla/5.0 (compatible; StrategosInsightsBot/1.0)"
+TEXT_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+_SKIPPED_TAGS = {"head", "title", "script", "style", "noscript", "svg", "nav", "header", "footer", "aside", "form", "button", "template", "iframe"}
+_BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "table", "tr", "td", "th",
+               "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "br", "hr", "dd", "dt"}
+_WHITESPACE_RE = re.compile(r"[ \t\r\f\v]+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+
+
+class _TextExtractor(HTMLParser):
+    """Incremental HTML-to-text: keeps visible text, drops scripts, styles and page chrome."""
+
+    def __init__(self, max_chars):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts = []
+        self.chars = 0
+        self._skip_depth = 0
+
+    @property
+    def done(self):
+        return self.chars >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._skip_depth or self.done:
+            return
+        text = _WHITESPACE_RE.sub(" ", data)
+        if text.strip():
+            self.parts.append(text)
+            self.chars += len(text)
+
+    def text(self):
+        text = _BLANK_LINES_RE.sub("\n", "".join(self.parts))
+        lines = (line.strip() for line in text.split("\n"))
+        return "\n".join(line for line in lines if line)[:self.max_chars]
+
+
+def extract_text(html, max_chars=4000):
+    """Readable text of an HTML document, at most `max_chars` characters."""
+    extractor = _TextExtractor(max_chars)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.text()
+
+
+class PageCache:
+    """
+    Extracted passages by URL, with the validators of the response they came from. Entries
+    younger than `fresh_ttl` are used as is; older ones (kept up to `max_age`) are
+    revalidated. In-process LRU in front of an optional SQLite file, like SearchCache.
+    """
+
+    def __init__(self, path=None, fresh_ttl=6 * 3600, max_age=7 * 24 * 3600, memory_entries=512, disk_entries=20000):
+        self.fresh_ttl = fresh_ttl
+        self.max_age = max_age
+        self.stats = CacheStats()
+        self.memory = TTLCache(max_entries=memory_entries, default_ttl=max_age, stats=self.stats)
+        path = path if path is not None else os.getenv("PAGE_CACHE_PATH", DEFAULT_PAGE_CACHE_PATH)
+        self.disk = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.disk = SQLiteTTLStore(path, max_entries=disk_entries, stats=self.stats)
+
+    def get(self, url):
+        """The cached entry dict (text, etag, last_modified, fetched_at) or None."""
+        entry = self.memory.get(url)
+        if entry is None and self.disk is not None:
+            try:
+                found = self.disk.get(url)
+            except sqlite3.Error as e:
+                logger.warning(f"Page cache disk lookup failed for {url}: {e}")
+                found = None
+            if found is not None:
+                entry, remaining_ttl = found
+                self.memory.set(url, entry, ttl=remaining_ttl)
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry["fetched_at"] < self.fresh_ttl
+
+    def set(self, url, text, etag=None, last_modified=None):
+        entry = {"text": text, "etag": etag, "last_modified": last_modified, "fetched_at": time.time()}
+        self.memory.set(url, entry)
+        if self.disk is not None:
+            try:
+                self.disk.set(url, entry, self.max_age)
+            except sqlite3.Error as e:
+                logger.warning(f"Page cache disk write failed for {url}: {e}")
+        self.stats.record("sets")
+
+
+class PageFetcher:
+    """
+    Fetches pages concurrently (`max_workers` threads, at most `per_host_limit` requests per
+    host at once) and returns their extracted text.
+
+    timeout: (connect, read) timeout of each socket operation, as in requests.
+    page_deadline: wall-clock limit for downloading one page.
+    max_bytes: stop reading a response after this many bytes.
+    max_chars: stop reading once this much text has been extracted.
+    """
+
+    def __init__(self, max_workers=8, per_host_limit=2, timeout=(3.05, 5.0), page_deadline=8.0,
+                 max_bytes=1_000_000, max_chars=3000, cache=None, session=None, chunk_size=16 * 1024):
+        self.max_workers = max(1, int(max_workers))
+        self.per_host_limit = max(1, int(per_host_limit))
+        self.timeout = timeout
+        self.page_deadline = page_deadline
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.chunk_size = chunk_size
+        self.cache = cache if cache is not None else PageCache()
+        self.session = session if session is not None else self._make_session()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fetch")
+        self._host_slots = {}
+        self._host_slots_lock = threading.Lock()
+
+    def _make_session(self):
+        session = requests.Session()
+        # Keep-alive connections are reused per host; the pool never holds more than the host limit
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.per_host_limit, pool_block=True, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["User-Agent"] = USER_AGENT
+        return session
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._host_slots_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return slot
+
+    def fetch(self, url):
+        """
+        Returns {"url", "text", "cached", "error"}. Never raises: failures come back as an
+        empty text with an error message (and a stale cached passage if one exists).
+        """
+        cached = self.cache.get(url)
+        if cached is not None and self.cache.is_fresh(cached):
+            self.cache.stats.record("hits")
+            return {"url": url, "text": cached["text"], "cached": True, "error": None}
+
+        headers = {}
+        if cached is not None:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            with self._host_slot(url):
+                with self.session.get(url, headers=headers, timeout=self.timeout, stream=True, allow_redirects=True) as response:
+                    if response.status_code == 304 and cached is not None:
+                        self.cache.stats.record("hits")
+                        self.cache.stats.record("revalidated")
+                        self.cache.set(url, cached["text"], cached.get("etag"), cached.get("last_modified"))
+                        return {"url": url, "text": cached["text"], "cached": True, "error": None}
+                    response.raise_for_status()
+                    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                    if content_type and content_type not in TEXT_CONTENT_TYPES:
+                        raise ValueError(f"unsupported content type {content_type}")
+                    text = self._read_text(response, plain=content_type == "text/plain")
+                    self.cache.stats.record("misses")
+                    self.cache.set(url, text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+                    return {"url": url, "text": text, "cached": False, "error": None}
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"Deep fetch failed for {url}: {e}")
+            stale = cached["text"] if cached is not None else ""
+            return {"url": url, "text": stale, "cached": cached is not None, "error": str(e)}
+
+    def _read_text(self, response, plain=False):
+        """Decodes and parses the body chunk by chunk, stopping at the text, size or time limit."""
+        deadline = time.monotonic() + self.page_deadline
+        try:
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        except LookupError: # Unknown charset in the Content-Type header
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        extractor = _TextExtractor(self.max_chars)
+        received = 0
+        plain_parts = []
+        for chunk in response.iter_content(chunk_size=self.chunk_size):
+            received += len(chunk)
+            data = decoder.decode(chunk)
+            if plain:
+                plain_parts.append(data)
+                if sum(len(part) for part in plain_parts) >= self.max_chars:
+                    break
+            else:
+                extractor.feed(data)
+                if extractor.done:
+                    break
+            if received >= self.max_bytes:
+                logger.info(f"Deep fetch of {response.url} stopped at the {self.max_bytes}-byte cap.")
+                break
+            if time.monotonic() > deadline:
+                logger.info(f"Deep fetch of {response.url} stopped at the {self.page_deadline}s deadline.")
+                break
+        if plain:
+            return _BLANK_LINES_RE.sub("\n", "".join(plain_parts)).strip()[:self.max_chars]
+        return extractor.text()
+
+    def fetch_many(self, urls):
+        """Fetches `urls` concurrently; results are returned in the same order."""
+        return list(self._executor.map(self.fetch, urls))
@@ -0,0 +1,170 @@
+# src/assistant/profiles.py
+"""
+Business profiles for the tenants served by one QueryEngine. Profiles are JSON files
+(`<PROFILES_DIR>/<name>.json`) picked up and re-read when they change; the built-in
+"default" profile is used when no file overrides it.
+
+The profile of the current request is held in a context variable (see `activate`), so
+one engine and one GeminiClient serve every tenant from any thread or asyncio task.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from . import prompt_engineering as pe
+from . import utils
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_NAME = "default"
+DEFAULT_PROFILES_DIR = "profiles"
+REQUIRED_FIELDS = ("company_name", "industry", "size", "primary_products") # Used by every prompt template
+
+DEFAULT_BUSINESS_PROFILE = {
+    "company_name": "Setu",
+    "industry": "Financial Services",
+    "size": "201-500 employees (growth from 51-200 in 2020)[3][5]",
+    "primary_products": [
+        "API solutions for financial onboarding (KYC, Aadhaar/PAN verification)[1][4]",
+        "Payment infrastructure (BBPS, UPI payment links)",
+        "Account Aggregator services"
+    ],
+    "target_customer": "Fintech companies, banks, and businesses requiring financial infrastructure",
+    "known_competitors": ["Razorpay", "Decentro", "Zaggle", "Signzy", "Perfios"],
+    "goals": [
+        "Simplify financial integration through APIs",
+        "Enable seamless bill payments and loan repayments at scale",
+        "Promote financial inclusion through open-source initiatives (D91 Labs)"
+    ]
+}
+
+_active_profile = contextvars.ContextVar("active_business_profile", default=None)
+
+
+class UnknownProfileError(KeyError):
+    """Raised when a requested profile name is not in the registry."""
+
+
+class BusinessProfile(dict):
+    """
+    A profile dict plus the values derived from it, computed once instead of per report:
+    the cache fingerprint, the JSON shown to the analysis model, the known competitors
+    and (on first use) the static prompt prefix. Treat it as read-only.
+    """
+
+    def __init__(self, data, name=DEFAULT_PROFILE_NAME, source=None):
+        super().__init__(data)
+        self.name = name
+        self.source = source
+        self.fingerprint = utils.profile_fingerprint(dict(data))
+        self.profile_json = json.dumps(dict(data), indent=2)
+        self.known_competitors = tuple(data.get("known_competitors", []))
+        self._static_prompt_prefix = None
+
+    @property
+    def static_prompt_prefix(self):
+        if self._static_prompt_prefix is None:
+            self._static_prompt_prefix = pe.get_static_prompt_prefix(self)
+        return self._static_prompt_prefix
+
+
+def _validate(data, path):
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: a profile must be a JSON object")
+    missing = [field for field in REQUIRED_FIELDS if field not in data]
+    if missing:
+        raise ValueError(f"{path}: missing required fields {missing}")
+
+
+class ProfileRegistry:
+    """
+    Named business profiles loaded from `directory`. The directory is re-scanned at most
+    every `reload_interval` seconds on lookup; new, changed and deleted files take effect
+    without a restart. A file that fails to parse is logged and its previous version kept.
+    """
+
+    def __init__(self, directory=None, default_name=None, reload_interval=2.0):
+        self.directory = directory if directory is not None else os.getenv("PROFILES_DIR", DEFAULT_PROFILES_DIR)
+        self.default_name = default_name or os.getenv("DEFAULT_PROFILE", DEFAULT_PROFILE_NAME)
+        self.reload_interval = reload_interval
+        self._builtin = {DEFAULT_PROFILE_NAME: BusinessProfile(DEFAULT_BUSINESS_PROFILE)}
+        self._profiles = {} # name -> BusinessProfile loaded from a file
+        self._stamps = {} # path -> (mtime_ns, size) of the last scan
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _scan(self):
+        stamps = {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return stamps # A missing directory just means no file-based profiles
+        for entry in entries:
+            if entry.name.endswith(".json") and entry.is_file():
+                stat = entry.stat()
+                stamps[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def reload(self):
+        """Re-reads new and changed profile files and drops deleted ones. Returns True if anything changed."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            stamps = self._scan()
+            if stamps == self._stamps:
+                return False
+
+            profiles = {name: profile for name, profile in self._profiles.items() if profile.source in stamps}
+            for path, stamp in stamps.items():
+                if self._stamps.get(path) == stamp and any(p.source == path for p in profiles.values()):
+                    continue
+                name = os.path.splitext(os.path.basename(path))[0]
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        data = json.load(f)
+                    _validate(data, path)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Could not load business profile '{name}': {e}")
+                    continue
+                profiles[name] = BusinessProfile(data, name=name, source=path)
+                logger.info(f"Loaded business profile '{name}' from {path}")
+
+            self._profiles = profiles
+            self._stamps = stamps
+            return True
+
+    def _maybe_reload(self):
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+
+    def get(self, name=None):
+        """The named profile (default: `default_name`); raises UnknownProfileError."""
+        self._maybe_reload()
+        name = name or self.default_name
+        profile = self._profiles.get(name) or self._builtin.get(name)
+        if profile is None:
+            raise UnknownProfileError(name)
+        return profile
+
+    def names(self):
+        self._maybe_reload()
+        return sorted(set(self._profiles) | set(self._builtin))
+
+
+def active_profile():
+    """The profile selected for the current thread or task, or None."""
+    return _active_profile.get()
+
+
+@contextmanager
+def activate(profile):
+    """Selects `profile` for the enclosed block in the current thread or asyncio task."""
+    token = _active_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _active_profile.reset(token)
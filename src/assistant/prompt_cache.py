@@ -0,0 +1,119 @@
+# src/assistant/prompt_cache.py
+"""
+Registers the static prompt prefix (see prompt_engineering.get_static_prompt_prefix) once
+per business profile, prompt version and model, so each report only sends its per-query
+suffix. GeminiContextCacheBackend uses Gemini context caching; LocalPrefixCacheBackend is
+an in-process stand-in (and the test double) that keeps the prefix but caches nothing
+server-side. If registration fails, prompts transparently fall back to prefix + suffix.
+"""
+import collections
+import datetime
+import logging
+import threading
+import time
+
+from . import prompt_engineering as pe
+from . import utils
+
+logger = logging.getLogger(__name__)
+
+# A detailed prompt split for caching; GeminiClient accepts it wherever it accepts a prompt string
+CachedPrompt = collections.namedtuple("CachedPrompt", ["prefix", "suffix"])
+
+
+class CachedPrefix:
+    """
+    A registered prefix. `model` is a generative model bound to the server-side cached
+    content, or None when the prefix has to be sent along with every request.
+    """
+
+    def __init__(self, key, text, model=None, expires_at=None):
+        self.key = key
+        self.text = text
+        self.model = model
+        self.expires_at = expires_at
+
+    def full_text(self, suffix):
+        return self.text + suffix
+
+
+class LocalPrefixCacheBackend:
+    """Keeps registered prefixes in process memory only; requests still carry the full prompt."""
+
+    def __init__(self):
+        self.registrations = collections.Counter()
+
+    def register(self, model_name, key, text, ttl):
+        self.registrations[key] += 1
+        return None
+
+
+class GeminiContextCacheBackend:
+    """Registers prefixes with Gemini's cached-content API and returns models bound to them."""
+
+    def register(self, model_name, key, text, ttl):
+        import google.generativeai as genai
+        cached_content = genai.caching.CachedContent.create(
+            model=model_name if model_name.startswith("models/") else f"models/{model_name}",
+            display_name=key,
+            system_instruction=text,
+            ttl=datetime.timedelta(seconds=ttl),
+        )
+        logger.info(f"Registered Gemini cached content '{cached_content.name}' for prompt prefix {key}.")
+        return genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+
+
+class PromptCache:
+    """
+    Builds and registers the static prompt prefix once per (profile, PROMPT_VERSION, model)
+    and hands out CachedPrompt objects. Registrations are renewed `renew_margin` seconds
+    before the backend's TTL runs out; after a failed registration the prefix is sent
+    inline until `retry_after` seconds have passed.
+    """
+
+    def __init__(self, backend=None, model_name="gemini-2.0-flash", ttl=3600, renew_margin=120, retry_after=600):
+        self.backend = backend if backend is not None else GeminiContextCacheBackend()
+        self.model_name = model_name
+        self.ttl = ttl
+        self.renew_margin = renew_margin
+        self.retry_after = retry_after
+        self._prefixes = {}
+        self._lock = threading.Lock()
+        self.stats = {"registrations": 0, "reuses": 0, "fallbacks": 0}
+
+    def prefix_key(self, business_profile):
+        return f"prefix-v{pe.PROMPT_VERSION}-{utils.profile_fingerprint(business_profile)}-{self.model_name.replace('/', '-')}"
+
+    def get_prefix(self, business_profile):
+        key = self.prefix_key(business_profile)
+        with self._lock: # Serialized so concurrent reports do not register the same prefix twice
+            prefix = self._prefixes.get(key)
+            if prefix is not None and time.monotonic() < prefix.expires_at:
+                self.stats["reuses"] += 1
+                return prefix
+
+            if prefix is not None:
+                text = prefix.text
+            else:
+                text = getattr(business_profile, "static_prompt_prefix", None) or pe.get_static_prompt_prefix(business_profile)
+            try:
+                model = self.backend.register(self.model_name, key, text, self.ttl)
+                expires_at = time.monotonic() + max(1, self.ttl - self.renew_margin)
+                self.stats["registrations"] += 1
+            except Exception as e:
+                logger.warning(f"Prompt prefix caching unavailable ({e}); sending the full prompt for {self.retry_after}s.")
+                model = None
+                expires_at = time.monotonic() + self.retry_after
+                self.stats["fallbacks"] += 1
+            prefix = CachedPrefix(key, text, model=model, expires_at=expires_at)
+            self._prefixes[key] = prefix
+            return prefix
+
+    def build_prompt(self, query_type, business_profile, entities, search_context, original_query):
+        """The detailed prompt for one report as a CachedPrompt (registered prefix + per-query suffix)."""
+        suffix = pe.get_prompt_suffix(query_type, business_profile, entities, search_context, original_query)
+        return CachedPrompt(self.get_prefix(business_profile), suffix)
+
+    def clear(self):
+        with self._lock:
+            self._prefixes.clear()
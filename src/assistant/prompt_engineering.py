@@ -25,8 +25,12 @@ def _get_dynamic_prompt_header() -> str:
     return dynamic_persona + "\n\n" # Add spacing for the rest of the prompt
 
 # --- Prompt for Query Analysis (Unaffected by Base Persona Date) ---
+# Bump whenever the analysis prompt changes so cached analyses from the old prompt are not reused
+ANALYSIS_PROMPT_VERSION = "1"
+
 def get_query_analysis_prompt(query, business_profile):
-    profile_str = json.dumps(business_profile, indent=2) # Format profile for clarity in prompt
+    # Format profile for clarity in prompt (profiles.BusinessProfile has it precomputed)
+    profile_str = getattr(business_profile, "profile_json", None) or json.dumps(business_profile, indent=2)
     prompt = f"""Analyze the following user query submitted to an AI Business Insights Assistant.
     Your goal is to understand the user's intent, identify key entities, and determine what *current, publicly available information* needs to be searched online to provide the best possible answer.
 
@@ -80,21 +84,13 @@ def get_query_analysis_prompt(query, business_profile):
     return prompt
 
 # --- UPDATED: Detailed Prompt Templates (Using Dynamic Header) ---
-def get_detailed_competitive_analysis_prompt(
-        business_profile,
-        entities,
-        search_context,
-        original_query):
-
+def _competitive_analysis_context(business_profile, entities, search_context, original_query):
+    """Per-query part of the competitive analysis prompt: task, query, profile summary, entities and search context."""
     competitors = entities.get('competitors', [])
     focus_areas = entities.get('focus_areas', ['Overall Strategy', 'Products/Services', 'Pricing', 'Market Positioning', 'Strengths', 'Weaknesses'])
     profile_str = f"Our Company: '{business_profile['company_name']}', Industry: '{business_profile['industry']}', Size: '{business_profile['size']}', Core Products: {', '.join(business_profile['primary_products'])}"
 
-    # --- Use the dynamic header function ---
-    prompt = _get_dynamic_prompt_header()
-    # --- End dynamic header usage ---
-
-    prompt += f"**Task:** Conduct a detailed competitive analysis based on the user query and recent information.\n"
+    prompt = f"**Task:** Conduct a detailed competitive analysis based on the user query and recent information.\n"
     prompt += f"**User Query:** \"{original_query}\"\n"
     prompt += f"**Our Business Profile:** {profile_str}\n"
     prompt += f"**Competitors Identified:** {', '.join(competitors) if competitors else 'General market competitors'}\n"
@@ -102,48 +98,54 @@ def get_detailed_competitive_analysis_prompt(
 
     prompt += "**Recent Information Context (from web searches):**\n"
     prompt += f"{search_context if search_context else 'No specific real-time data was fetched or available for this query.'}\n\n"
-
-    prompt += "**Instructions for Comprehensive Analysis:**\n"
-    prompt += "1.  **Executive Summary:** Start with a brief overview of the key findings and most critical strategic takeaways for OurCompany.\n"
-    prompt += "2.  **Methodology:** Briefly state that the analysis is based on publicly available information, the provided search context, and general industry knowledge.\n"
-    prompt += "3.  **Competitor Profiles:** For each identified competitor (and OurCompany), provide a concise profile covering:\n"
-    prompt += "     * Key Offerings & Target Market\n"
-    prompt += "     * Recent News/Developments (referencing search context where applicable)\n"
-    prompt += "     * Perceived Strengths\n"
-    prompt += "     * Perceived Weaknesses\n"
-    prompt += "4.  **Comparative Analysis (Condensed Paragraph Format):** For each of the specified `focus_areas`, write a paragraph comparing OurCompany and the key competitors. Synthesize information from the search context and general knowledge. Analyze factors within these paragraphs such as:\n"
-    prompt += "     * Product Features & Innovation Pace\n"
-    prompt += "     * Pricing Tiers & Value Proposition\n"
-    prompt += "     * Go-to-Market Strategy (Sales channels, Marketing approach)\n"
-    prompt += "     * Customer Reviews & Brand Perception (cite search context if reviews were found)\n"
-    prompt += "     * Estimated Market Share / Position (if discernible)\n"
-    prompt += "5.  **SWOT Analysis (Derived):** Based *specifically* on the comparison above, generate a SWOT analysis (Strengths, Weaknesses, Opportunities, Threats) for OurCompany relative to these competitors.\n"
-    prompt += "6.  **Strategic Differentiators & Actionable Recommendations:** This is the most critical section. Provide concrete, actionable recommendations for OurCompany. Focus on:\n"
-    prompt += "     * How to leverage strengths and mitigate weaknesses.\n"
-    prompt += "     * How to capitalize on opportunities and defend against threats.\n"
-    prompt += "     * Suggest specific strategic differentiators (e.g., focus on a niche, enhance a specific feature, improve support, adjust pricing, form partnerships).\n"
-    prompt += "     * Consider feasibility for a mid-size enterprise (resource constraints).\n"
-    prompt += "     * Suggest 1-2 key metrics (KPIs) to track progress if these recommendations are implemented.\n\n"
-
-    prompt += f"{OUTPUT_FORMAT_REQUIREMENT}\n"
     return prompt
 
-def get_detailed_trend_forecasting_prompt(
+COMPETITIVE_ANALYSIS_INSTRUCTIONS = (
+    "**Instructions for Comprehensive Analysis:**\n"
+    "1.  **Executive Summary:** Start with a brief overview of the key findings and most critical strategic takeaways for OurCompany.\n"
+    "2.  **Methodology:** Briefly state that the analysis is based on publicly available information, the provided search context, and general industry knowledge.\n"
+    "3.  **Competitor Profiles:** For each identified competitor (and OurCompany), provide a concise profile covering:\n"
+    "     * Key Offerings & Target Market\n"
+    "     * Recent News/Developments (referencing search context where applicable)\n"
+    "     * Perceived Strengths\n"
+    "     * Perceived Weaknesses\n"
+    "4.  **Comparative Analysis (Condensed Paragraph Format):** For each of the specified `focus_areas`, write a paragraph comparing OurCompany and the key competitors. Synthesize information from the search context and general knowledge. Analyze factors within these paragraphs such as:\n"
+    "     * Product Features & Innovation Pace\n"
+    "     * Pricing Tiers & Value Proposition\n"
+    "     * Go-to-Market Strategy (Sales channels, Marketing approach)\n"
+    "     * Customer Reviews & Brand Perception (cite search context if reviews were found)\n"
+    "     * Estimated Market Share / Position (if discernible)\n"
+    "5.  **SWOT Analysis (Derived):** Based *specifically* on the comparison above, generate a SWOT analysis (Strengths, Weaknesses, Opportunities, Threats) for OurCompany relative to these competitors.\n"
+    "6.  **Strategic Differentiators & Actionable Recommendations:** This is the most critical section. Provide concrete, actionable recommendations for OurCompany. Focus on:\n"
+    "     * How to leverage strengths and mitigate weaknesses.\n"
+    "     * How to capitalize on opportunities and defend against threats.\n"
+    "     * Suggest specific strategic differentiators (e.g., focus on a niche, enhance a specific feature, improve support, adjust pricing, form partnerships).\n"
+    "     * Consider feasibility for a mid-size enterprise (resource constraints).\n"
+    "     * Suggest 1-2 key metrics (KPIs) to track progress if these recommendations are implemented.\n\n"
+)
+
+def get_detailed_competitive_analysis_prompt(
         business_profile,
         entities,
         search_context,
         original_query):
+    # --- Use the dynamic header function ---
+    prompt = _get_dynamic_prompt_header()
+    # --- End dynamic header usage ---
+
+    prompt += _competitive_analysis_context(business_profile, entities, search_context, original_query)
+    prompt += COMPETITIVE_ANALYSIS_INSTRUCTIONS
+    prompt += f"{OUTPUT_FORMAT_REQUIREMENT}\n"
+    return prompt
 
+def _trend_forecasting_context(business_profile, entities, search_context, original_query):
+    """Per-query part of the trend forecasting prompt: task, query, profile summary, entities and search context."""
     industry = entities.get('industry', business_profile['industry'])
     time_horizon = entities.get('time_horizon', 'next 1-3 years')
     focus_areas = entities.get('focus_areas', ['Technology', 'Market Dynamics', 'Customer Behavior', 'Regulatory Changes'])
     profile_str = f"Our Company: '{business_profile['company_name']}', Industry: '{industry}', Size: '{business_profile['size']}'"
 
-    # --- Use the dynamic header function ---
-    prompt = _get_dynamic_prompt_header()
-    # --- End dynamic header usage ---
-
-    prompt += f"**Task:** Provide a detailed trend analysis and forecast for the specified industry, focusing on implications for a mid-size enterprise.\n"
+    prompt = f"**Task:** Provide a detailed trend analysis and forecast for the specified industry, focusing on implications for a mid-size enterprise.\n"
     prompt += f"**User Query:** \"{original_query}\"\n"
     prompt += f"**Our Business Profile Context:** {profile_str}\n"
     prompt += f"**Industry Focus:** {industry}\n"
@@ -152,105 +154,128 @@ def get_detailed_trend_forecasting_prompt(
 
     prompt += "**Recent Information Context (from web searches):**\n"
     prompt += f"{search_context if search_context else 'No specific real-time data was fetched or available for this query.'}\n\n"
+    return prompt
+
+TREND_FORECASTING_INSTRUCTIONS = (
+    "**Instructions for Comprehensive Analysis:**\n"
+    "1.  **Executive Summary:** Briefly summarize the most impactful trends identified and the overall strategic outlook for a mid-size player in this industry over the time horizon.\n"
+    "2.  **Methodology:** State that the analysis uses recent public data (including provided search context), general industry knowledge, and forecasting principles.\n"
+    "3.  **Key Trend Analysis:** For each major trend identified (use the `focus_areas` and search context as guides), provide:\n"
+    "     * **Trend Description:** Clearly define the trend.\n"
+    "     * **Evidence/Signals:** Mention supporting data points (from search context or general knowledge).\n"
+    "     * **Impact Analysis:** Analyze the potential positive and negative impacts specifically on a *mid-size enterprise* like OurCompany within this industry. Consider resource constraints and agility.\n"
+    "     * **Forecast & Likelihood:** Briefly forecast the trend's likely evolution over the specified `time_horizon`. You can optionally add a qualitative likelihood (e.g., High, Medium, Low).\n"
+    "     * **Categorization (Optional but helpful):** Tag the trend (e.g., Technology, Market, Social, Regulatory/Legal, Environmental).\n"
+    "4.  **Cross-Trend Synergies/Conflicts:** Briefly discuss any notable interactions between the identified trends.\n"
+    "5.  **Strategic Implications & Actionable Recommendations:** Provide concrete, prioritized recommendations for OurCompany:\n"
+    "     * How to leverage opportunities presented by trends.\n"
+    "     * How to mitigate risks posed by trends.\n"
+    "     * Suggest specific initiatives (e.g., technology adoption, market repositioning, partnership strategies, talent development).\n"
+    "     * Frame recommendations considering mid-size company resources (avoid suggesting massive R&D unless critical).\n"
+    "     * Recommend 1-2 KPIs per major recommendation area to track adaptation and success.\n\n"
+)
 
-    prompt += "**Instructions for Comprehensive Analysis:**\n"
-    prompt += "1.  **Executive Summary:** Briefly summarize the most impactful trends identified and the overall strategic outlook for a mid-size player in this industry over the time horizon.\n"
-    prompt += "2.  **Methodology:** State that the analysis uses recent public data (including provided search context), general industry knowledge, and forecasting principles.\n"
-    prompt += "3.  **Key Trend Analysis:** For each major trend identified (use the `focus_areas` and search context as guides), provide:\n"
-    prompt += "     * **Trend Description:** Clearly define the trend.\n"
-    prompt += "     * **Evidence/Signals:** Mention supporting data points (from search context or general knowledge).\n"
-    prompt += "     * **Impact Analysis:** Analyze the potential positive and negative impacts specifically on a *mid-size enterprise* like OurCompany within this industry. Consider resource constraints and agility.\n"
-    prompt += "     * **Forecast & Likelihood:** Briefly forecast the trend's likely evolution over the specified `time_horizon`. You can optionally add a qualitative likelihood (e.g., High, Medium, Low).\n"
-    prompt += "     * **Categorization (Optional but helpful):** Tag the trend (e.g., Technology, Market, Social, Regulatory/Legal, Environmental).\n"
-    prompt += "4.  **Cross-Trend Synergies/Conflicts:** Briefly discuss any notable interactions between the identified trends.\n"
-    prompt += "5.  **Strategic Implications & Actionable Recommendations:** Provide concrete, prioritized recommendations for OurCompany:\n"
-    prompt += "     * How to leverage opportunities presented by trends.\n"
-    prompt += "     * How to mitigate risks posed by trends.\n"
-    prompt += "     * Suggest specific initiatives (e.g., technology adoption, market repositioning, partnership strategies, talent development).\n"
-    prompt += "     * Frame recommendations considering mid-size company resources (avoid suggesting massive R&D unless critical).\n"
-    prompt += "     * Recommend 1-2 KPIs per major recommendation area to track adaptation and success.\n\n"
+def get_detailed_trend_forecasting_prompt(
+        business_profile,
+        entities,
+        search_context,
+        original_query):
+    # --- Use the dynamic header function ---
+    prompt = _get_dynamic_prompt_header()
+    # --- End dynamic header usage ---
 
+    prompt += _trend_forecasting_context(business_profile, entities, search_context, original_query)
+    prompt += TREND_FORECASTING_INSTRUCTIONS
     prompt += f"{OUTPUT_FORMAT_REQUIREMENT}\n"
     return prompt
 
-def get_detailed_swot_analysis_prompt(business_profile, entities, search_context, original_query):
+def _swot_analysis_context(business_profile, entities, search_context, original_query):
+    """Per-query part of the SWOT analysis prompt: task, query, profile summary, entities and search context."""
     # SWOT often needs context, potentially from competitors or market position
     profile_str = f"Our Company: '{business_profile['company_name']}', Industry: '{business_profile['industry']}', Size: '{business_profile['size']}', Core Products: {', '.join(business_profile['primary_products'])}"
     focus = entities.get('focus_areas', ["overall business"]) # What aspect to SWOT?
 
-    # --- Use the dynamic header function ---
-    prompt = _get_dynamic_prompt_header()
-    # --- End dynamic header usage ---
-
-    prompt += f"**Task:** Conduct a detailed SWOT analysis (Strengths, Weaknesses, Opportunities, Threats) for OurCompany.\n"
+    prompt = f"**Task:** Conduct a detailed SWOT analysis (Strengths, Weaknesses, Opportunities, Threats) for OurCompany.\n"
     prompt += f"**User Query:** \"{original_query}\"\n"
     prompt += f"**Our Business Profile:** {profile_str}\n"
     prompt += f"**Focus of SWOT:** {' '.join(focus)}\n\n"
 
     prompt += "**Recent Information Context (from web searches relevant to market/competitors):**\n"
     prompt += f"{search_context if search_context else 'No specific real-time data was fetched. Analysis based on general knowledge and business profile.'}\n\n"
+    return prompt
+
+SWOT_ANALYSIS_INSTRUCTIONS = (
+    "**Instructions for Comprehensive SWOT Analysis:**\n"
+    "1.  **Introduction:** Briefly state the purpose of the SWOT analysis for OurCompany focusing on the specified area.\n"
+    "2.  **Methodology:** Mention reliance on the business profile, provided search context (if any), and general industry understanding.\n"
+    "3.  **Internal Analysis:**\n"
+    "     * **Strengths:** Identify internal capabilities, resources, and advantages relative to the market/competitors. Be specific (e.g., 'Proprietary algorithm', 'Strong regional presence', 'Experienced engineering team'). List at least 3-5 key strengths.\n"
+    "     * **Weaknesses:** Identify internal limitations, resource gaps, or disadvantages. Be honest and specific (e.g., 'Limited marketing budget', 'Dependency on single supplier', 'Aging technology stack'). List at least 3-5 key weaknesses.\n"
+    "4.  **External Analysis:**\n"
+    "     * **Opportunities:** Identify external factors or trends (use search context) that OurCompany could potentially leverage for growth or advantage (e.g., 'Growing demand in adjacent market', 'Competitor product recall', 'New favorable regulation', 'Emerging technology partnership'). List at least 3-5 key opportunities.\n"
+    "     * **Threats:** Identify external factors or trends that could negatively impact OurCompany (e.g., 'New entrant with lower pricing', 'Changing customer preferences', 'Economic downturn impacting client budgets', 'Potential cybersecurity risks'). List at least 3-5 key threats.\n"
+    "5.  **SWOT Matrix Summary:** Present the findings clearly, perhaps using Markdown lists under each heading (S, W, O, T).\n"
+    "6.  **Strategic Implications & Actionable Recommendations:** This is crucial. Analyze the interactions within the SWOT matrix (TOWS analysis approach can be useful mentally):\n"
+    "     * **SO Strategies (Strength-Opportunity):** How to use strengths to exploit opportunities?\n"
+    "     * **WO Strategies (Weakness-Opportunity):** How to overcome weaknesses by taking advantage of opportunities?\n"
+    "     * **ST Strategies (Strength-Threat):** How to use strengths to avoid or mitigate threats?\n"
+    "     * **WT Strategies (Weakness-Threat):** What defensive actions are needed to prevent weaknesses from making the company vulnerable to threats?\n"
+    "     * Provide 3-5 prioritized, actionable recommendations based on these strategic implications, suitable for a mid-size enterprise.\n\n"
+)
 
-    prompt += "**Instructions for Comprehensive SWOT Analysis:**\n"
-    prompt += "1.  **Introduction:** Briefly state the purpose of the SWOT analysis for OurCompany focusing on the specified area.\n"
-    prompt += "2.  **Methodology:** Mention reliance on the business profile, provided search context (if any), and general industry understanding.\n"
-    prompt += "3.  **Internal Analysis:**\n"
-    prompt += "     * **Strengths:** Identify internal capabilities, resources, and advantages relative to the market/competitors. Be specific (e.g., 'Proprietary algorithm', 'Strong regional presence', 'Experienced engineering team'). List at least 3-5 key strengths.\n"
-    prompt += "     * **Weaknesses:** Identify internal limitations, resource gaps, or disadvantages. Be honest and specific (e.g., 'Limited marketing budget', 'Dependency on single supplier', 'Aging technology stack'). List at least 3-5 key weaknesses.\n"
-    prompt += "4.  **External Analysis:**\n"
-    prompt += "     * **Opportunities:** Identify external factors or trends (use search context) that OurCompany could potentially leverage for growth or advantage (e.g., 'Growing demand in adjacent market', 'Competitor product recall', 'New favorable regulation', 'Emerging technology partnership'). List at least 3-5 key opportunities.\n"
-    prompt += "     * **Threats:** Identify external factors or trends that could negatively impact OurCompany (e.g., 'New entrant with lower pricing', 'Changing customer preferences', 'Economic downturn impacting client budgets', 'Potential cybersecurity risks'). List at least 3-5 key threats.\n"
-    prompt += "5.  **SWOT Matrix Summary:** Present the findings clearly, perhaps using Markdown lists under each heading (S, W, O, T).\n"
-    prompt += "6.  **Strategic Implications & Actionable Recommendations:** This is crucial. Analyze the interactions within the SWOT matrix (TOWS analysis approach can be useful mentally):\n"
-    prompt += "     * **SO Strategies (Strength-Opportunity):** How to use strengths to exploit opportunities?\n"
-    prompt += "     * **WO Strategies (Weakness-Opportunity):** How to overcome weaknesses by taking advantage of opportunities?\n"
-    prompt += "     * **ST Strategies (Strength-Threat):** How to use strengths to avoid or mitigate threats?\n"
-    prompt += "     * **WT Strategies (Weakness-Threat):** What defensive actions are needed to prevent weaknesses from making the company vulnerable to threats?\n"
-    prompt += "     * Provide 3-5 prioritized, actionable recommendations based on these strategic implications, suitable for a mid-size enterprise.\n\n"
+def get_detailed_swot_analysis_prompt(business_profile, entities, search_context, original_query):
+    # --- Use the dynamic header function ---
+    prompt = _get_dynamic_prompt_header()
+    # --- End dynamic header usage ---
 
+    prompt += _swot_analysis_context(business_profile, entities, search_context, original_query)
+    prompt += SWOT_ANALYSIS_INSTRUCTIONS
     prompt += f"{OUTPUT_FORMAT_REQUIREMENT}\n"
     return prompt
 
 # --- NEWLY ADDED FUNCTION ---
-def get_detailed_generic_query_prompt(
-        business_profile,
-        entities,
-        search_context,
-        original_query):
-
+def _generic_query_context(business_profile, entities, search_context, original_query):
+    """Per-query part of the generic query prompt: task, query, profile summary, entities and search context."""
     profile_str = f"Our Company: '{business_profile['company_name']}', Industry: '{business_profile['industry']}', Size: '{business_profile['size']}'"
 
-    # --- Use the dynamic header function ---
-    prompt = _get_dynamic_prompt_header()
-    # --- End dynamic header usage ---
-
-    prompt += f"**Task:** Address the following business query comprehensively, providing insights relevant to a mid-size enterprise.\n"
+    prompt = f"**Task:** Address the following business query comprehensively, providing insights relevant to a mid-size enterprise.\n"
     prompt += f"**User Query:** \"{original_query}\"\n"
     prompt += f"**Our Business Profile Context:** {profile_str}\n\n"
 
     prompt += "**Potentially Relevant Context (from web searches):**\n"
     prompt += f"{search_context if search_context else 'No specific real-time data was fetched for this query.'}\n\n"
-
-    prompt += "**Instructions for Comprehensive Response:**\n"
-    prompt += "1.  **Deconstruct the Query:** Clearly state your understanding of the user's core question and objective(s).\n"
-    prompt += "2.  **Identify Key Concepts:** Define or explain any central business terms or concepts relevant to the query.\n"
-    prompt += "3.  **Structured Analysis:** Break down the answer into logical sections. Consider multiple perspectives (e.g., financial, operational, marketing, strategic) if applicable.\n"
-    prompt += "4.  **Incorporate Context:** Relate the analysis specifically to a *mid-size enterprise* context. How might the answer differ for a large corporation or a small startup? Use the business profile and search context where relevant.\n"
-    prompt += "5.  **Provide Nuance:** Discuss pros and cons, potential challenges, assumptions, and trade-offs related to the query or potential solutions.\n"
-    prompt += "6.  **Use Examples (if applicable):** Illustrate points with brief, relevant examples (hypothetical or based on general knowledge).\n"
-    prompt += "7.  **Actionable Insights/Recommendations (if appropriate):** If the query implies seeking advice or solutions, conclude with clear, actionable steps or strategic considerations suitable for the target company profile. If the query is purely informational, summarize the key takeaways.\n\n"
-
-    prompt += f"{OUTPUT_FORMAT_REQUIREMENT}\n"
     return prompt
-# --- END NEWLY ADDED FUNCTION ---
 
+GENERIC_QUERY_INSTRUCTIONS = (
+    "**Instructions for Comprehensive Response:**\n"
+    "1.  **Deconstruct the Query:** Clearly state your understanding of the user's core question and objective(s).\n"
+    "2.  **Identify Key Concepts:** Define or explain any central business terms or concepts relevant to the query.\n"
+    "3.  **Structured Analysis:** Break down the answer into logical sections. Consider multiple perspectives (e.g., financial, operational, marketing, strategic) if applicable.\n"
+    "4.  **Incorporate Context:** Relate the analysis specifically to a *mid-size enterprise* context. How might the answer differ for a large corporation or a small startup? Use the business profile and search context where relevant.\n"
+    "5.  **Provide Nuance:** Discuss pros and cons, potential challenges, assumptions, and trade-offs related to the query or potential solutions.\n"
+    "6.  **Use Examples (if applicable):** Illustrate points with brief, relevant examples (hypothetical or based on general knowledge).\n"
+    "7.  **Actionable Insights/Recommendations (if appropriate):** If the query implies seeking advice or solutions, conclude with clear, actionable steps or strategic considerations suitable for the target company profile. If the query is purely informational, summarize the key takeaways.\n\n"
+)
 
-# --- START NEW FUNCTION: get_detailed_financial_analysis_prompt ---
-def get_detailed_financial_analysis_prompt(
+def get_detailed_generic_query_prompt(
         business_profile,
         entities,
         search_context,
         original_query):
+    # --- Use the dynamic header function ---
+    prompt = _get_dynamic_prompt_header()
+    # --- End dynamic header usage ---
 
+    prompt += _generic_query_context(business_profile, entities, search_context, original_query)
+    prompt += GENERIC_QUERY_INSTRUCTIONS
+    prompt += f"{OUTPUT_FORMAT_REQUIREMENT}\n"
+    return prompt
+# --- END NEWLY ADDED FUNCTION ---
+
+
+# --- START NEW FUNCTION: get_detailed_financial_analysis_prompt ---
+def _financial_analysis_context(business_profile, entities, search_context, original_query):
+    """Per-query part of the financial analysis prompt: task, query, profile summary, entities and search context."""
     industry = entities.get('industry', business_profile['industry'])
     time_horizon = entities.get('time_horizon', 'latest reported period / next 12 months')
     focus_areas = entities.get('focus_areas', ['Profitability', 'Liquidity', 'Solvency', 'Efficiency Ratios', 'Cash Flow Analysis'])
@@ -258,11 +283,7 @@ def get_detailed_financial_analysis_prompt(
     competitors = entities.get('competitors', []) # For benchmarking if requested/relevant
     profile_str = f"Our Company: '{business_profile['company_name']}', Industry: '{industry}', Size: '{business_profile['size']}'"
 
-    # --- Use the dynamic header function ---
-    prompt = _get_dynamic_prompt_header()
-    # --- End dynamic header usage ---
-
-    prompt += f"**Task:** Conduct a detailed financial analysis based on the user query, focusing on the specified areas and their implications for a mid-size enterprise.\n"
+    prompt = f"**Task:** Conduct a detailed financial analysis based on the user query, focusing on the specified areas and their implications for a mid-size enterprise.\n"
     prompt += f"**User Query:** \"{original_query}\"\n"
     prompt += f"**Our Business Profile Context:** {profile_str}\n"
     prompt += f"**Industry Focus:** {industry}\n"
@@ -276,34 +297,44 @@ def get_detailed_financial_analysis_prompt(
 
     prompt += "**Recent Information Context (from web searches - e.g., industry benchmarks, competitor financial summaries):**\n"
     prompt += f"{search_context if search_context else 'No specific real-time financial data or benchmarks were fetched. Analysis based on general principles and business profile.'}\n\n"
-
-    prompt += "**Instructions for Comprehensive Financial Analysis:**\n"
-    prompt += "1.  **Executive Summary:** Provide a high-level overview of the company's perceived financial health based on the analysis, highlighting key strengths, weaknesses, and critical recommendations.\n"
-    prompt += "2.  **Methodology:** Briefly state that the analysis relies on general financial principles, the business profile, potentially provided search context (industry averages, competitor data snippets), and the specific user query focus.\n"
-    prompt += "3.  **Analysis by Key Financial Area:** For each specified `focus_area` (or standard areas if none specified):\n"
-    prompt += "     * **Define Key Metrics:** Explain the relevant financial ratios or metrics within this area (e.g., Gross Profit Margin for Profitability, Current Ratio for Liquidity, Debt-to-Equity for Solvency, Asset Turnover for Efficiency).\n"
-    prompt += "     * **Assess Performance:** Analyze the likely performance in this area based on general knowledge of mid-size businesses in this industry and any data points from the search context. Discuss trends if applicable (e.g., improving/declining margins).\n"
-    prompt += "     * **Industry Context/Benchmarking:** Compare performance against typical benchmarks for mid-size companies in this industry, or against specific competitors if data is available/requested. Use search context here if applicable.\n"
-    prompt += "     * **Implications for Mid-Size Enterprise:** Discuss what these findings mean specifically for a company of this size (e.g., impact of tight cash flow on growth, ability to secure loans).\n"
-    prompt += "4.  **Cash Flow Analysis (if applicable):** Detail the importance of cash flow (Operating, Investing, Financing) for sustainability and growth in a mid-size context.\n"
-    prompt += "5.  **Overall Financial Health Assessment:** Synthesize the findings into a concluding assessment of the company's financial strengths and weaknesses.\n"
-    prompt += "6.  **Strategic Financial Recommendations:** Provide actionable financial strategies tailored for a mid-size enterprise:\n"
-    prompt += "     * Suggestions for improving profitability, managing cash flow, optimizing capital structure, controlling costs, or making investment decisions.\n"
-    prompt += "     * Consider resource limitations and access to capital typical for mid-size firms.\n"
-    prompt += "     * Recommend 2-3 key financial KPIs (beyond those perhaps already requested) to monitor financial health and track the impact of recommendations (e.g., 'Days Sales Outstanding', 'Operating Cash Flow Margin', 'Interest Coverage Ratio').\n\n"
-
-    prompt += f"{OUTPUT_FORMAT_REQUIREMENT}\n"
     return prompt
-# --- END NEW FUNCTION: get_detailed_financial_analysis_prompt ---
 
+FINANCIAL_ANALYSIS_INSTRUCTIONS = (
+    "**Instructions for Comprehensive Financial Analysis:**\n"
+    "1.  **Executive Summary:** Provide a high-level overview of the company's perceived financial health based on the analysis, highlighting key strengths, weaknesses, and critical recommendations.\n"
+    "2.  **Methodology:** Briefly state that the analysis relies on general financial principles, the business profile, potentially provided search context (industry averages, competitor data snippets), and the specific user query focus.\n"
+    "3.  **Analysis by Key Financial Area:** For each specified `focus_area` (or standard areas if none specified):\n"
+    "     * **Define Key Metrics:** Explain the relevant financial ratios or metrics within this area (e.g., Gross Profit Margin for Profitability, Current Ratio for Liquidity, Debt-to-Equity for Solvency, Asset Turnover for Efficiency).\n"
+    "     * **Assess Performance:** Analyze the likely performance in this area based on general knowledge of mid-size businesses in this industry and any data points from the search context. Discuss trends if applicable (e.g., improving/declining margins).\n"
+    "     * **Industry Context/Benchmarking:** Compare performance against typical benchmarks for mid-size companies in this industry, or against specific competitors if data is available/requested. Use search context here if applicable.\n"
+    "     * **Implications for Mid-Size Enterprise:** Discuss what these findings mean specifically for a company of this size (e.g., impact of tight cash flow on growth, ability to secure loans).\n"
+    "4.  **Cash Flow Analysis (if applicable):** Detail the importance of cash flow (Operating, Investing, Financing) for sustainability and growth in a mid-size context.\n"
+    "5.  **Overall Financial Health Assessment:** Synthesize the findings into a concluding assessment of the company's financial strengths and weaknesses.\n"
+    "6.  **Strategic Financial Recommendations:** Provide actionable financial strategies tailored for a mid-size enterprise:\n"
+    "     * Suggestions for improving profitability, managing cash flow, optimizing capital structure, controlling costs, or making investment decisions.\n"
+    "     * Consider resource limitations and access to capital typical for mid-size firms.\n"
+    "     * Recommend 2-3 key financial KPIs (beyond those perhaps already requested) to monitor financial health and track the impact of recommendations (e.g., 'Days Sales Outstanding', 'Operating Cash Flow Margin', 'Interest Coverage Ratio').\n\n"
+)
 
-# --- START NEW FUNCTION: get_detailed_marketing_strategy_prompt ---
-def get_detailed_marketing_strategy_prompt(
+def get_detailed_financial_analysis_prompt(
         business_profile,
         entities,
         search_context,
         original_query):
+    # --- Use the dynamic header function ---
+    prompt = _get_dynamic_prompt_header()
+    # --- End dynamic header usage ---
+
+    prompt += _financial_analysis_context(business_profile, entities, search_context, original_query)
+    prompt += FINANCIAL_ANALYSIS_INSTRUCTIONS
+    prompt += f"{OUTPUT_FORMAT_REQUIREMENT}\n"
+    return prompt
+# --- END NEW FUNCTION: get_detailed_financial_analysis_prompt ---
 
+
+# --- START NEW FUNCTION: get_detailed_marketing_strategy_prompt ---
+def _marketing_strategy_context(business_profile, entities, search_context, original_query):
+    """Per-query part of the marketing strategy prompt: task, query, profile summary, entities and search context."""
     industry = entities.get('industry', business_profile['industry'])
     products_services = entities.get('products_services', business_profile['primary_products'])
     geography = entities.get('geography', 'Not specified')
@@ -312,11 +343,7 @@ def get_detailed_marketing_strategy_prompt(
     metrics = entities.get('metrics', []) # Specific marketing KPIs requested
     profile_str = f"Our Company: '{business_profile['company_name']}', Industry: '{industry}', Size: '{business_profile['size']}'"
 
-    # --- Use the dynamic header function ---
-    prompt = _get_dynamic_prompt_header()
-    # --- End dynamic header usage ---
-
-    prompt += f"**Task:** Develop or analyze a marketing strategy based on the user query, tailored for a mid-size enterprise in the specified industry.\n"
+    prompt = f"**Task:** Develop or analyze a marketing strategy based on the user query, tailored for a mid-size enterprise in the specified industry.\n"
     prompt += f"**User Query:** \"{original_query}\"\n"
     prompt += f"**Our Business Profile Context:** {profile_str}\n"
     prompt += f"**Industry Focus:** {industry}\n"
@@ -331,24 +358,141 @@ def get_detailed_marketing_strategy_prompt(
 
     prompt += "**Recent Information Context (from web searches - e.g., competitor campaigns, industry marketing trends, customer reviews):**\n"
     prompt += f"{search_context if search_context else 'No specific real-time marketing data was fetched. Analysis based on general principles, business profile, and user query.'}\n\n"
+    return prompt
+
+MARKETING_STRATEGY_INSTRUCTIONS = (
+    "**Instructions for Comprehensive Marketing Strategy Analysis:**\n"
+    "1.  **Executive Summary:** Briefly summarize the core marketing challenge or opportunity, key findings, and the most critical strategic marketing recommendations.\n"
+    "2.  **Methodology:** State reliance on the business profile, user query, general marketing principles, and any provided search context (competitor activities, trends).\n"
+    "3.  **Market & Customer Understanding:**\n"
+    "     * **Target Audience:** Define or refine the likely primary and secondary target customer segments for the specified products/services in this industry. Consider demographics, psychographics, pain points, and buying behavior.\n"
+    "     * **Market Landscape:** Briefly describe the competitive environment and any relevant market trends impacting marketing (use search context).\n"
+    "4.  **Analysis of Marketing Strategy Components (based on `focus_areas`):**\n"
+    "     * **Value Proposition & Positioning:** Articulate a compelling value proposition. How should the company position itself against competitors (use search context for competitor positioning if available)?\n"
+    "     * **Channel Mix:** Evaluate potential marketing channels (e.g., SEO, SEM, Content, Social Media, Email, Partnerships, Events, Sales Team Support). Recommend a cost-effective mix suitable for a mid-size budget. Analyze competitor channels if data exists.\n"
+    "     * **Messaging & Content:** Outline key marketing messages. Suggest types of content (blog posts, case studies, webinars, videos) that would resonate with the target audience and support the channel strategy.\n"
+    "     * **Digital Presence:** Assess the importance and potential optimization areas for website, SEO, and social media.\n"
+    "     * **Budget Considerations:** Discuss typical marketing budget allocation approaches for mid-size companies in this sector (even if specific numbers aren't available).\n"
+    "5.  **Competitor Marketing Snapshot (if applicable):** Briefly analyze the apparent marketing strategies of key competitors identified (channels used, messaging, estimated strengths/weaknesses) based on search context.\n"
+    "6.  **Actionable Marketing Recommendations:** Provide specific, prioritized marketing initiatives:\n"
+    "     * Suggest concrete campaigns, channel optimizations, content ideas, or strategic shifts.\n"
+    "     * Emphasize tactics with measurable ROI and feasibility for a mid-size enterprise (e.g., focus on niche marketing, leverage digital tools effectively, build community).\n"
+    "     * Recommend 2-3 key marketing KPIs (e.g., 'Customer Acquisition Cost (CAC)', 'Lead Conversion Rate', 'Website Traffic Growth', 'Social Media Engagement Rate') to measure success.\n\n"
+)
 
-    prompt += "**Instructions for Comprehensive Marketing Strategy Analysis:**\n"
-    prompt += "1.  **Executive Summary:** Briefly summarize the core marketing challenge or opportunity, key findings, and the most critical strategic marketing recommendations.\n"
-    prompt += "2.  **Methodology:** State reliance on the business profile, user query, general marketing principles, and any provided search context (competitor activities, trends).\n"
-    prompt += "3.  **Market & Customer Understanding:**\n"
-    prompt += "     * **Target Audience:** Define or refine the likely primary and secondary target customer segments for the specified products/services in this industry. Consider demographics, psychographics, pain points, and buying behavior.\n"
-    prompt += "     * **Market Landscape:** Briefly describe the competitive environment and any relevant market trends impacting marketing (use search context).\n"
-    prompt += "4.  **Analysis of Marketing Strategy Components (based on `focus_areas`):**\n"
-    prompt += "     * **Value Proposition & Positioning:** Articulate a compelling value proposition. How should the company position itself against competitors (use search context for competitor positioning if available)?\n"
-    prompt += "     * **Channel Mix:** Evaluate potential marketing channels (e.g., SEO, SEM, Content, Social Media, Email, Partnerships, Events, Sales Team Support). Recommend a cost-effective mix suitable for a mid-size budget. Analyze competitor channels if data exists.\n"
-    prompt += "     * **Messaging & Content:** Outline key marketing messages. Suggest types of content (blog posts, case studies, webinars, videos) that would resonate with the target audience and support the channel strategy.\n"
-    prompt += "     * **Digital Presence:** Assess the importance and potential optimization areas for website, SEO, and social media.\n"
-    prompt += "     * **Budget Considerations:** Discuss typical marketing budget allocation approaches for mid-size companies in this sector (even if specific numbers aren't available).\n"
-    prompt += "5.  **Competitor Marketing Snapshot (if applicable):** Briefly analyze the apparent marketing strategies of key competitors identified (channels used, messaging, estimated strengths/weaknesses) based on search context.\n"
-    prompt += "6.  **Actionable Marketing Recommendations:** Provide specific, prioritized marketing initiatives:\n"
-    prompt += "     * Suggest concrete campaigns, channel optimizations, content ideas, or strategic shifts.\n"
-    prompt += "     * Emphasize tactics with measurable ROI and feasibility for a mid-size enterprise (e.g., focus on niche marketing, leverage digital tools effectively, build community).\n"
-    prompt += "     * Recommend 2-3 key marketing KPIs (e.g., 'Customer Acquisition Cost (CAC)', 'Lead Conversion Rate', 'Website Traffic Growth', 'Social Media Engagement Rate') to measure success.\n\n"
+def get_detailed_marketing_strategy_prompt(
+        business_profile,
+        entities,
+        search_context,
+        original_query):
+    # --- Use the dynamic header function ---
+    prompt = _get_dynamic_prompt_header()
+    # --- End dynamic header usage ---
 
+    prompt += _marketing_strategy_context(business_profile, entities, search_context, original_query)
+    prompt += MARKETING_STRATEGY_INSTRUCTIONS
     prompt += f"{OUTPUT_FORMAT_REQUIREMENT}\n"
-    return prompt
\ No newline at end of file
+    return prompt
+
+# --- Cacheable prompt layout: a stable prefix plus a per-query suffix ---
+# Bump whenever the static prefix changes so prefixes registered with the old text are not reused
+PROMPT_VERSION = "1"
+
+# query_type -> (report type heading, per-query context builder, instructions); other types use "generic"
+DETAILED_PROMPT_PARTS = {
+    "competitive_analysis": ("Competitive Analysis", _competitive_analysis_context, COMPETITIVE_ANALYSIS_INSTRUCTIONS),
+    "trend_forecasting": ("Trend Forecasting", _trend_forecasting_context, TREND_FORECASTING_INSTRUCTIONS),
+    "swot_analysis": ("SWOT Analysis", _swot_analysis_context, SWOT_ANALYSIS_INSTRUCTIONS),
+    "marketing_strategy": ("Marketing Strategy", _marketing_strategy_context, MARKETING_STRATEGY_INSTRUCTIONS),
+    "financial_analysis": ("Financial Analysis", _financial_analysis_context, FINANCIAL_ANALYSIS_INSTRUCTIONS),
+    "generic": ("Business Question", _generic_query_context, GENERIC_QUERY_INSTRUCTIONS),
+}
+
+def get_static_prompt_prefix(business_profile):
+    """
+    The part of every detailed prompt that depends only on the business profile and
+    PROMPT_VERSION: persona, full profile, the instructions for every report type and the
+    output format. No date or query data, so it can be cached and reused across reports.
+    """
+    prefix = BASE_PERSONA_TEMPLATE + "\n\n"
+    prefix += "**Business Profile of OurCompany:**\n"
+    prefix += json.dumps(business_profile, indent=2, sort_keys=True) + "\n\n"
+    prefix += "Every request names a report type. Follow the instructions for that report type below.\n\n"
+    for heading, _, instructions in DETAILED_PROMPT_PARTS.values():
+        prefix += f"### Report Type: {heading}\n{instructions}"
+    prefix += f"{OUTPUT_FORMAT_REQUIREMENT}\n"
+    return prefix
+
+def get_prompt_suffix(query_type, business_profile, entities, search_context, original_query):
+    """The per-query remainder of a detailed prompt; it follows get_static_prompt_prefix."""
+    heading, build_context, _ = DETAILED_PROMPT_PARTS.get(query_type, DETAILED_PROMPT_PARTS["generic"])
+    prompt = f"CURRENT DATE IS: {datetime.datetime.now().strftime('%Y-%m-%d')}.\n"
+    prompt += f"**Report Type:** {heading}\n"
+    prompt += build_context(business_profile, entities, search_context, original_query)
+    prompt += f"Follow the instructions for the '{heading}' report type.\n"
+    return prompt
+
+# --- Sectioned generation: report sections drafted concurrently, then summarized ---
+SECTION_MAX_OUTPUT_TOKENS = 2048
+SUMMARY_MAX_OUTPUT_TOKENS = 1024
+SUMMARY_SECTION_HEADING = "Executive Summary"
+
+# query_type -> [(section heading, instructions)], in report order. Each section is drafted from the
+# shared context without seeing the others; the executive summary is written last, from the drafts.
+# Types without an entry (e.g. generic) are always generated in one call.
+REPORT_SECTIONS = {
+    "competitive_analysis": [
+        ("Competitor Profiles", "For each identified competitor (and OurCompany), give a concise profile: key offerings and target market, recent news/developments (reference the search context), perceived strengths and perceived weaknesses."),
+        ("Comparative Analysis", "For each of the specified focus areas, write a paragraph comparing OurCompany and the key competitors: product features and innovation pace, pricing and value proposition, go-to-market strategy, customer reviews and brand perception (cite the search context), and market position if discernible."),
+        ("SWOT Analysis", "Generate a SWOT analysis (Strengths, Weaknesses, Opportunities, Threats) for OurCompany relative to these competitors, based on the information above."),
+        ("Strategic Differentiators & Actionable Recommendations", "Provide concrete, actionable recommendations for OurCompany: how to leverage strengths and mitigate weaknesses, capitalize on opportunities and defend against threats, and which strategic differentiators to pursue. Consider the resource constraints of a mid-size enterprise and suggest 1-2 KPIs to track progress."),
+    ],
+    "swot_analysis": [
+        ("Strengths", "Identify 3-5 internal capabilities, resources and advantages relative to the market/competitors. Be specific."),
+        ("Weaknesses", "Identify 3-5 internal limitations, resource gaps or disadvantages. Be honest and specific."),
+        ("Opportunities", "Identify 3-5 external factors or trends (use the search context) that OurCompany could leverage for growth or advantage."),
+        ("Threats", "Identify 3-5 external factors or trends that could negatively impact OurCompany."),
+        ("Strategic Implications & Actionable Recommendations", "Analyze the interactions between strengths, weaknesses, opportunities and threats (SO, WO, ST and WT strategies) and provide 3-5 prioritized, actionable recommendations suitable for a mid-size enterprise."),
+    ],
+    "trend_forecasting": [
+        ("Key Trend Analysis", "For each major trend (use the focus areas and search context as guides): describe the trend, list the evidence/signals, analyze the impact on a mid-size enterprise like OurCompany, forecast its evolution over the time horizon with a qualitative likelihood, and tag its category."),
+        ("Cross-Trend Synergies & Conflicts", "Discuss notable interactions between the major trends in this market: which reinforce each other and which pull in opposite directions."),
+        ("Strategic Implications & Actionable Recommendations", "Provide prioritized recommendations for OurCompany: how to leverage the opportunities and mitigate the risks these trends present, with specific initiatives sized for mid-size company resources and 1-2 KPIs per recommendation area."),
+    ],
+    "financial_analysis": [
+        ("Analysis by Key Financial Area", "For each focus area (or the standard areas if none are given): define the key metrics, assess the likely performance, benchmark against mid-size companies or competitors in this industry (use the search context), and explain the implications for a company of this size."),
+        ("Cash Flow Analysis", "Detail the importance of operating, investing and financing cash flows for the sustainability and growth of OurCompany in a mid-size context."),
+        ("Strategic Financial Recommendations", "Provide actionable financial strategies for a mid-size enterprise (profitability, cash flow, capital structure, cost control, investment decisions) considering its access to capital, and recommend 2-3 financial KPIs to monitor."),
+    ],
+    "marketing_strategy": [
+        ("Market & Customer Understanding", "Define the primary and secondary target customer segments (pain points, buying behavior) and describe the competitive environment and market trends that affect marketing (use the search context)."),
+        ("Marketing Strategy Components", "Cover the value proposition and positioning, a cost-effective channel mix for a mid-size budget, key messages and content types, digital presence, and budget allocation approaches."),
+        ("Competitor Marketing Snapshot", "Briefly analyze the apparent marketing strategies of the key competitors (channels, messaging, strengths/weaknesses) based on the search context."),
+        ("Actionable Marketing Recommendations", "Provide specific, prioritized marketing initiatives with measurable ROI that a mid-size enterprise can execute, and recommend 2-3 marketing KPIs to measure success."),
+    ],
+}
+
+def get_section_prompt(query_type, section_index, business_profile, entities, search_context, original_query):
+    """Prompt for drafting one section of a sectioned report (see REPORT_SECTIONS)."""
+    heading, build_context, _ = DETAILED_PROMPT_PARTS[query_type]
+    sections = REPORT_SECTIONS[query_type]
+    title, instructions = sections[section_index]
+    outline = ", ".join(f"'{name}'" for name, _ in sections)
+
+    prompt = _get_dynamic_prompt_header()
+    prompt += build_context(business_profile, entities, search_context, original_query)
+    prompt += f"**Your Part:** This {heading} report is written section by section. Its sections are {outline}, preceded by an '{SUMMARY_SECTION_HEADING}'. "
+    prompt += f"Write ONLY the '{title}' section; the other sections and the summary are written separately, so do not repeat their content.\n"
+    prompt += f"**Section Instructions:** {instructions}\n"
+    prompt += f"Start with the heading '## {title}'. Use Markdown for clarity. Do not add a report title, a methodology note or closing remarks.\n"
+    return prompt
+
+def get_section_summary_prompt(query_type, original_query, drafted_sections):
+    """Prompt for the final pass of a sectioned report: an executive summary consistent with the drafted sections."""
+    heading = DETAILED_PROMPT_PARTS[query_type][0]
+    prompt = _get_dynamic_prompt_header()
+    prompt += f"**Task:** Below are the drafted sections of a {heading} report answering the user query \"{original_query}\". "
+    prompt += f"Write the '## {SUMMARY_SECTION_HEADING}' section that opens the report: the key findings and the most critical recommendations in a few short paragraphs or bullets. "
+    prompt += "Keep it consistent with the sections; where two sections contradict each other, state the better-supported view. Do not rewrite or repeat the sections themselves.\n\n"
+    prompt += "**Drafted Sections:**\n\n" + "\n\n".join(drafted_sections) + "\n"
+    return prompt
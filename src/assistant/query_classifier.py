@@ -0,0 +1,332 @@
+# src/assistant/query_classifier.py
+"""
+Local fast path for query analysis. Most traffic follows a few patterns ("compare us to X",
+"SWOT for ...", "trends in ...") that the LLM analysis classifies the same way every time;
+QueryClassifier predicts the query type from keyword/regex rules plus, once enough LLM
+analyses have been logged, a TF-IDF nearest-centroid model trained on them. Confident
+predictions get locally extracted entities and a templated search plan and skip the
+Gemini analysis call; the rest fall back to the LLM.
+
+Every routing decision is appended to a JSONL log together with the LLM's answer when
+there is one. The log is the model's training data and shows how often the local
+prediction agrees with the LLM per confidence bucket, for tuning the threshold.
+"""
+import collections
+import datetime
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+
+from . import metrics
+from . import speculation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_PATH = os.path.join(".cache", "query_routes.jsonl")
+
+# (query_type, pattern, weight). Weight 2 is a decisive phrase, 1 a supporting keyword;
+# STRONG_SCORE is the score at which a prediction can reach full confidence.
+RULES = [
+    ("swot_analysis", r"\bswot\b", 2),
+    ("swot_analysis", r"\bstrengths?\b.*\bweaknesse?s?\b|\bopportunities\b.*\bthreats\b", 2),
+    ("competitive_analysis", r"\b(compare|comparison|benchmark)\b.*\b(us|our|we|with|to|against)\b", 2),
+    ("competitive_analysis", r"\bstack up\b|\bhead[- ]to[- ]head\b|\bcompetitive (analysis|landscape|position)", 2),
+    ("competitive_analysis", r"\b(vs\.?|versus|against|competitors?|rivals?)\b", 1),
+    ("trend_forecasting", r"\btrends? (in|for|of|shaping)\b|\bforecast\b|\boutlook\b|\bfuture of\b", 2),
+    ("trend_forecasting", r"\bnext \d+ (years|quarters|months)\b|\bemerging\b|\btrends?\b", 1),
+    ("financial_analysis", r"\bfinancial (health|analysis|performance|position)\b|\bcash flow\b|\bebitda\b", 2),
+    ("financial_analysis", r"\b(revenue|profit|profitability|margins?|valuation|funding|burn rate|unit economics)\b", 1),
+    ("marketing_strategy", r"\bmarketing (strategy|plan|mix|campaign)s?\b|\bgo[- ]to[- ]market\b|\bgtm\b", 2),
+    ("marketing_strategy", r"\b(marketing|campaigns?|brand|branding|positioning|channels?|acquisition)\b", 1),
+]
+_COMPILED_RULES = [(query_type, re.compile(pattern, re.IGNORECASE), weight) for query_type, pattern, weight in RULES]
+STRONG_SCORE = 2.0
+MODEL_WEIGHT = 2.0 # A perfect centroid match counts as much as a decisive phrase
+
+# Confidence buckets of the agreement statistics
+CONFIDENCE_BUCKETS = (0.5, 0.7, 0.8, 0.9, 1.01)
+
+_FOCUS_KEYWORDS = {
+    "pricing": ("pricing", "price", "prices", "fees", "cost"),
+    "customer reviews": ("reviews", "customer satisfaction", "nps", "ratings"),
+    "products/services": ("product", "products", "features", "offering", "offerings"),
+    "market share": ("market share", "market position"),
+    "profitability": ("profit", "profitability", "margin", "margins", "ebitda"),
+    "funding": ("funding", "valuation", "investors", "raised"),
+    "marketing channels": ("channel", "channels", "campaign", "campaigns", "seo"),
+    "regulation": ("regulation", "regulatory", "rbi", "compliance"),
+    "technology": ("technology", "tech stack", "ai", "api", "apis"),
+}
+_METRICS = ("ebitda", "roi", "cac", "ltv", "arr", "mrr", "nps", "gmv", "tpv", "churn", "burn rate", "gross margin", "kpi", "kpis")
+_TIME_HORIZON_RE = re.compile(r"\b(?:next|coming)\s+(?:\d+|few|two|three|five)\s+(?:years?|quarters?|months?)\b|\b20\d\d\b", re.IGNORECASE)
+# The subject of "trends in X over the next ..." style questions
+_TREND_TOPIC_RE = re.compile(r"\b(?:trends?|outlook|future|forecast)\s+(?:in|for|of|shaping)\s+(?:the\s+)?(.+?)(?:\s+(?:over|in|for|during|by|within)\b|[?.!,;]|$)", re.IGNORECASE)
+_TERM_RE = re.compile(r"[a-z0-9]+")
+
+
+def _bucket(confidence):
+    lower = 0.0
+    for upper in CONFIDENCE_BUCKETS:
+        if confidence < upper:
+            return f"{lower:.1f}-{min(upper, 1.0):.1f}"
+        lower = upper
+    return f"{lower:.1f}-1.0"
+
+
+def _normalize(vector):
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+
+class TfidfCentroidModel:
+    """
+    TF-IDF over word unigrams and bigrams with one L2-normalized centroid per query type;
+    a query's score for a type is its cosine similarity to that centroid (a linear model).
+    """
+
+    def __init__(self):
+        self.idf = {}
+        self.centroids = {}
+
+    @staticmethod
+    def _terms(text):
+        tokens = _TERM_RE.findall(text.lower())
+        return collections.Counter(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+
+    def _vector(self, terms):
+        return _normalize({term: count * self.idf[term] for term, count in terms.items() if term in self.idf})
+
+    def fit(self, examples):
+        """Trains on (query, query_type) pairs; returns self."""
+        documents = [(self._terms(query), query_type) for query, query_type in examples]
+        document_frequency = collections.Counter(term for terms, _ in documents for term in terms)
+        count = len(documents)
+        self.idf = {term: math.log((1 + count) / (1 + df)) + 1.0 for term, df in document_frequency.items()}
+        sums = collections.defaultdict(collections.Counter)
+        for terms, query_type in documents:
+            sums[query_type].update(self._vector(terms))
+        self.centroids = {query_type: _normalize(vector) for query_type, vector in sums.items()}
+        return self
+
+    def scores(self, query):
+        vector = self._vector(self._terms(query))
+        return {query_type: sum(weight * centroid.get(term, 0.0) for term, weight in vector.items())
+                for query_type, centroid in self.centroids.items()}
+
+
+class Prediction:
+    """A local classification: query type, confidence in [0, 1] and the scores behind it."""
+
+    def __init__(self, query_type, confidence, scores):
+        self.query_type = query_type
+        self.confidence = confidence
+        self.scores = scores
+
+
+def extract_entities(query, business_profile):
+    """The entities the analysis prompt asks for, extracted from the query text."""
+    words = f" {' '.join(_TERM_RE.findall(query.lower()))} "
+    focus_areas = [area for area, keywords in _FOCUS_KEYWORDS.items() if any(f" {keyword} " in words for keyword in keywords)]
+    found_metrics = [metric.upper() for metric in _METRICS if f" {metric} " in words]
+    # Capitalized metric acronyms (EBITDA, CAC) look like company names to the competitor extraction
+    competitors = [name for name in speculation.extract_competitors(query, business_profile) if name.lower() not in _METRICS]
+    horizon = _TIME_HORIZON_RE.search(query)
+    topic = _TREND_TOPIC_RE.search(query)
+    return {
+        "competitors": competitors,
+        "industry": business_profile.get("industry"),
+        "products_services": [],
+        "geography": None,
+        "time_horizon": horizon.group(0) if horizon else None,
+        "focus_areas": focus_areas,
+        "metrics": found_metrics,
+        "topic": topic.group(1).strip() if topic else None,
+        "original_query": query,
+    }
+
+
+def plan_searches(query_type, entities, business_profile, max_searches=10):
+    """A templated search plan for the query type, like the one the LLM analysis produces."""
+    year = datetime.date.today().year
+    company = business_profile.get("company_name", "")
+    industry = entities.get("industry") or business_profile.get("industry", "")
+    competitors = entities.get("competitors") or list(business_profile.get("known_competitors", []))[:3]
+    focus = entities.get("focus_areas") or []
+
+    searches = []
+    if query_type == "competitive_analysis":
+        for competitor in competitors:
+            searches += [f"{competitor} pricing {year}", f"{competitor} latest news {year}", f"{competitor} customer reviews"]
+            searches += [f"{competitor} {area}" for area in focus if area not in ("pricing", "customer reviews")]
+        searches += [f"{company} vs {competitor}" for competitor in competitors[:2]]
+        searches.append(f"{industry} market share {year}")
+    elif query_type == "swot_analysis":
+        searches += [f"{company} latest news {year}", f"{company} customer reviews", f"{company} funding {year}",
+                     f"{industry} market trends {year}", f"{industry} regulatory changes {year}"]
+        searches += [f"{competitor} latest news {year}" for competitor in competitors]
+    elif query_type == "trend_forecasting":
+        topic = entities.get("topic") or industry
+        searches += [f"{topic} trends {year}", f"{topic} market forecast {year}-{year + 3}",
+                     f"{industry} market trends {year}", f"emerging technology {topic} {year}",
+                     f"{topic} regulation {year}", f"{topic} investment funding {year}"]
+        searches += [f"{area} trends {industry} {year}" for area in focus]
+    elif query_type == "financial_analysis":
+        searches += [f"{company} revenue {year}", f"{company} funding valuation", f"{industry} average margins {year}",
+                     f"{industry} financial benchmarks mid-size companies {year}"]
+        searches += [f"{competitor} revenue {year}" for competitor in competitors]
+    elif query_type == "marketing_strategy":
+        searches += [f"{company} marketing strategy", f"{industry} marketing trends {year}",
+                     f"{industry} customer acquisition cost benchmarks", f"{industry} B2B marketing channels {year}"]
+        searches += [f"{competitor} marketing campaign {year}" for competitor in competitors]
+    if company:
+        searches.append(f"{company} latest news {year}")
+
+    unique, seen = [], set()
+    for search in searches:
+        key = " ".join(search.lower().split())
+        if search.strip() and key not in seen:
+            seen.add(key)
+            unique.append(search)
+    return unique[:max_searches]
+
+
+class QueryClassifier:
+    """
+    Predicts the analysis of a query locally. A prediction is used instead of the LLM when
+    its confidence is at least `threshold`; `audit_rate` of those confident queries still go
+    to the LLM so agreement above the threshold keeps being measured.
+
+    log_path: JSONL routing log (None disables logging and training). When it holds at least
+        `min_training_examples` LLM analyses, the TF-IDF model is trained from them.
+    """
+
+    def __init__(self, threshold=0.8, log_path=None, audit_rate=0.0, min_training_examples=20, max_searches=10, seed=None):
+        self.threshold = threshold
+        self.log_path = log_path
+        self.audit_rate = audit_rate
+        self.min_training_examples = min_training_examples
+        self.max_searches = max_searches
+        self.model = None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._routes = collections.Counter()
+        self._agreement = collections.defaultdict(collections.Counter) # bucket -> {agree, disagree}
+        if log_path:
+            self.retrain()
+
+    def retrain(self):
+        """(Re)trains the TF-IDF model from the LLM analyses in the log. Returns the number of examples."""
+        examples = []
+        try:
+            with open(self.log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get("llm_query_type"):
+                        examples.append((record["query"], record["llm_query_type"]))
+        except OSError:
+            pass
+        if len(examples) >= self.min_training_examples:
+            self.model = TfidfCentroidModel().fit(examples)
+            logger.info(f"Query classifier model trained on {len(examples)} logged analyses.")
+        return len(examples)
+
+    def predict(self, query):
+        scores = collections.Counter()
+        for query_type, pattern, weight in _COMPILED_RULES:
+            if pattern.search(query):
+                scores[query_type] += weight
+        if self.model is not None:
+            for query_type, similarity in self.model.scores(query).items():
+                scores[query_type] += MODEL_WEIGHT * similarity
+        total = sum(scores.values())
+        if total <= 0:
+            return Prediction(None, 0.0, {})
+        query_type, top = scores.most_common(1)[0]
+        confidence = (top / total) * min(1.0, top / STRONG_SCORE)
+        return Prediction(query_type, round(confidence, 4), dict(scores))
+
+    def route(self, query, business_profile):
+        """
+        Returns (prediction, analysis). `analysis` is the local analysis dict when the fast path
+        is taken, or None when the caller should ask the LLM (and then call `record`).
+        """
+        prediction = self.predict(query)
+        if prediction.confidence < self.threshold:
+            logger.info(f"Query routed to LLM analysis (local guess '{prediction.query_type}', confidence {prediction.confidence:.2f}).")
+            self._count_route("llm")
+            return prediction, None
+        if self.audit_rate and self._random.random() < self.audit_rate:
+            logger.info(f"Auditing confident local prediction '{prediction.query_type}' ({prediction.confidence:.2f}) against the LLM.")
+            self._count_route("audit")
+            return prediction, None
+
+        entities = extract_entities(query, business_profile)
+        analysis = {
+            "query_type": prediction.query_type,
+            "entities": entities,
+            "required_searches": plan_searches(prediction.query_type, entities, business_profile, self.max_searches),
+        }
+        logger.info(f"Query classified locally as '{prediction.query_type}' (confidence {prediction.confidence:.2f}); skipping LLM analysis.")
+        self._count_route("local")
+        self._log({"query": query, "route": "local", "predicted": prediction.query_type, "confidence": prediction.confidence})
+        return prediction, analysis
+
+    def record(self, query, prediction, llm_analysis):
+        """Logs the LLM's answer for a query the fast path did not take, and whether the local guess agreed."""
+        if not isinstance(llm_analysis, dict) or "error" in llm_analysis or "query_type" not in llm_analysis:
+            return
+        llm_query_type = llm_analysis["query_type"]
+        record = {"query": query, "route": "llm", "predicted": prediction.query_type,
+                  "confidence": prediction.confidence, "llm_query_type": llm_query_type}
+        if prediction.query_type is not None:
+            outcome = "agree" if prediction.query_type == llm_query_type else "disagree"
+            bucket = _bucket(prediction.confidence)
+            with self._lock:
+                self._agreement[bucket][outcome] += 1
+            metrics.CLASSIFIER_AGREEMENT.labels(bucket, outcome).inc()
+            record["agree"] = outcome == "agree"
+        self._log(record)
+
+    def _count_route(self, route):
+        with self._lock:
+            self._routes[route] += 1
+        metrics.QUERY_ROUTES.labels(route).inc()
+
+    def _log(self, record):
+        if not self.log_path:
+            return
+        record["ts"] = time.time()
+        line = json.dumps(record) + "\n"
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            logger.warning(f"Could not write query routing log {self.log_path}: {e}")
+
+    def stats(self):
+        """Route counts, fast-path share and agreement with the LLM per confidence bucket."""
+        with self._lock:
+            routes = dict(self._routes)
+            buckets = {bucket: dict(counts) for bucket, counts in sorted(self._agreement.items())}
+        routed = sum(routes.values())
+        agree = sum(counts.get("agree", 0) for counts in buckets.values())
+        checked = sum(sum(counts.values()) for counts in buckets.values())
+        return {
+            "routes": routes,
+            "local_rate": round(routes.get("local", 0) / routed, 4) if routed else 0.0,
+            "agreement_rate": round(agree / checked, 4) if checked else None,
+            "agreement_by_confidence": {
+                bucket: {**counts, "rate": round(counts.get("agree", 0) / sum(counts.values()), 4)}
+                for bucket, counts in buckets.items()
+            },
+        }
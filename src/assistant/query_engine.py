@@ -2,52 +2,143 @@
 from .gemini_integration import GeminiClient
 from . import prompt_engineering as pe
 from . import utils
+from . import speculation
+from . import metrics
+from . import profiles
+from .cache import SearchCache, TTLCache
+from .context_assembly import ContextAssembler
+from .prompt_cache import PromptCache
+from .query_classifier import DEFAULT_LOG_PATH as DEFAULT_QUERY_ROUTES_LOG, QueryClassifier
+from .profiles import BusinessProfile, ProfileRegistry
+from .search_providers import MergedSearchProvider, default_search_provider
+import asyncio
+import collections
+import contextvars
+import copy
 import logging
-import time 
-
-try:
-    from duckduckgo_search import DDGS
-    SEARCH_ENABLED = True
-except ImportError:
-    SEARCH_ENABLED = False
-    logging.warning("duckduckgo_search library not found. Real-time search functionality will be disabled. Install with: pip install -U duckduckgo-search")
-
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+REPORT_TITLE_PREFIX = "# AI Business Insight Report:"
+# A report drafted section by section (see QueryEngine sectioned_generation): one prompt per section
+SectionedPrompt = collections.namedtuple("SectionedPrompt", ["query_type", "query", "section_prompts"])
+REPORT_FOOTER = "\n\n---\n*Disclaimer: This report is AI-generated based on provided context and publicly available data (as of the time of the search). Verify critical information before making decisions.*"
+
 class QueryEngine:
-    def __init__(self):
+    def __init__(self, search_concurrency=4, search_rate_limit=2.0, search_cache=None,
+                 analysis_cache_ttl=3600, analysis_cache_size=512,
+                 speculative_search=False, speculative_search_limit=4, context_assembler=None,
+                 prompt_cache=None, search_provider=None, profile_registry=None,
+                 sectioned_generation=False, section_concurrency=4, query_classifier=None,
+                 deep_fetch=None, deep_fetch_pages=5):
+        """
+        search_concurrency: max number of searches in flight at once.
+        search_rate_limit: sustained DuckDuckGo searches per second across all workers (0 disables).
+        search_cache: SearchCache used in front of cacheable providers (defaults to the shared on-disk cache).
+        analysis_cache_ttl / analysis_cache_size: lifetime (seconds) and capacity of memoized
+            query analyses. A TTL of 0 disables the analysis cache.
+        speculative_search: start locally guessed searches while the LLM analysis is running;
+            at most `speculative_search_limit` of them per query.
+        context_assembler: ContextAssembler (or True for the defaults) that deduplicates, ranks
+            and token-budgets search results; None keeps every result in plan order.
+        prompt_cache: PromptCache (or True for Gemini context caching) that registers the static
+            prompt prefix once per profile; None sends the full detailed prompt every time.
+        search_provider: SearchProvider to query; defaults to DuckDuckGo, merged with the local
+            corpus when LOCAL_SEARCH_DIRS is set (see search_providers.default_search_provider).
+        profile_registry: ProfileRegistry of the tenants' business profiles (defaults to the
+            files in PROFILES_DIR plus the built-in default profile).
+        sectioned_generation: draft the sections of report types listed in
+            prompt_engineering.REPORT_SECTIONS concurrently (at most `section_concurrency`
+            Gemini calls at once across reports), then write the executive summary from the
+            drafts. Cuts latency on long reports at the cost of one extra, short call.
+        query_classifier: QueryClassifier (or True for one logging to QUERY_CLASSIFIER_LOG or
+            .cache/query_routes.jsonl) that answers confidently classified queries locally
+            instead of calling the LLM analysis; None always uses the LLM.
+        deep_fetch: PageFetcher (or True for the defaults) that downloads the top
+            `deep_fetch_pages` result pages after the searches and adds their extracted text
+            to the search context; None keeps the search snippets only.
+        """
         self.gemini_client = GeminiClient()
-        self.business_profile = {
-    "company_name": "Setu",
-    "industry": "Financial Services",
-    "size": "201-500 employees (growth from 51-200 in 2020)[3][5]",
-    "primary_products": [
-        "API solutions for financial onboarding (KYC, Aadhaar/PAN verification)[1][4]", 
-        "Payment infrastructure (BBPS, UPI payment links)",
-        "Account Aggregator services"
-    ],
-    "target_customer": "Fintech companies, banks, and businesses requiring financial infrastructure",
-    "goals": [
-        "Simplify financial integration through APIs",
-        "Enable seamless bill payments and loan repayments at scale",
-        "Promote financial inclusion through open-source initiatives (D91 Labs)"
-    ]
-}
+        # Searches fan out on a shared, bounded pool; the rate limiter replaces the old fixed sleep
+        self.search_concurrency = max(1, int(search_concurrency))
+        self.search_rate_limiter = utils.RateLimiter(search_rate_limit, burst=self.search_concurrency)
+        self._search_executor = ThreadPoolExecutor(max_workers=self.search_concurrency, thread_name_prefix="search")
+        self.search_cache = search_cache if search_cache is not None else SearchCache()
+        self.search_provider = search_provider if search_provider is not None else default_search_provider(self.search_rate_limiter, self.search_concurrency)
+        self.analysis_cache = TTLCache(max_entries=analysis_cache_size, default_ttl=analysis_cache_ttl) if analysis_cache_ttl > 0 else None
+        self.speculative_search = speculative_search
+        self.speculative_search_limit = speculative_search_limit
+        self.context_assembler = ContextAssembler() if context_assembler is True else context_assembler
+        if self.search_cache is not None:
+            metrics.register_cache("search", self.search_cache.get_stats)
+        if self.analysis_cache is not None:
+            metrics.register_cache("analysis", self.analysis_cache.stats.snapshot)
+        self.prompt_cache = PromptCache(model_name=self.gemini_client.generative_model_name) if prompt_cache is True else prompt_cache
+        self.profile_registry = profile_registry if profile_registry is not None else ProfileRegistry()
+        self._default_profile = None # Set by assigning business_profile; otherwise the registry's default
+        self.sectioned_generation = sectioned_generation
+        if query_classifier is True:
+            query_classifier = QueryClassifier(log_path=os.getenv("QUERY_CLASSIFIER_LOG", DEFAULT_QUERY_ROUTES_LOG))
+        self.query_classifier = query_classifier
+        if deep_fetch is True:
+            from .page_fetcher import PageFetcher # Imported on demand; keeps requests out of CLI startup
+            deep_fetch = PageFetcher()
+        self.page_fetcher = deep_fetch
+        self.deep_fetch_pages = deep_fetch_pages
+        if self.page_fetcher is not None:
+            metrics.register_cache("pages", self.page_fetcher.cache.stats.snapshot)
+        # Separate from the search pool so section drafts never wait behind searches
+        self._section_executor = ThreadPoolExecutor(max_workers=max(1, int(section_concurrency)), thread_name_prefix="section") if sectioned_generation else None
 
+    @property
+    def business_profile(self):
+        """The profile of the current request (see use_profile), else the engine's default profile."""
+        return profiles.active_profile() or self._default_profile or self.profile_registry.get()
 
-    def _analyze_query_with_llm(self, query):
+    @business_profile.setter
+    def business_profile(self, value):
+        self._default_profile = value if isinstance(value, BusinessProfile) else BusinessProfile(value)
+
+    def use_profile(self, name=None):
         """
-        Uses the Gemini Flash model to analyze the query, determine type,
-        extract entities, and suggest search queries.
+        Context manager selecting the registry profile `name` for the calling thread or task;
+        None keeps the engine default. Raises UnknownProfileError right away for unknown names.
         """
-        logger.info(f"Analyzing query with LLM: '{query}'")
-        prompt = pe.get_query_analysis_prompt(query, self.business_profile)
-        analysis_result = self.gemini_client.generate_analysis(prompt)
+        return profiles.activate(self.profile_registry.get(name) if name else None)
+
+
+    def _analysis_cache_key(self, query):
+        """Analyses depend on the query wording, the business profile and the analysis prompt itself."""
+        return (utils.normalize_query(query), utils.profile_fingerprint(self.business_profile), pe.ANALYSIS_PROMPT_VERSION)
+
+    def _get_cached_analysis(self, query):
+        """Returns (cache_key, cached_analysis_or_None). cache_key is None when caching is disabled."""
+        if self.analysis_cache is None:
+            return None, None
+        cache_key = self._analysis_cache_key(query)
+        cached = self.analysis_cache.get(cache_key)
+        if cached is None:
+            self.analysis_cache.stats.record("misses")
+            return cache_key, None
+
+        self.analysis_cache.stats.record("hits")
+        logger.info(f"Analysis cache hit for query: '{query}' (Type='{cached.get('query_type')}')")
+        analysis_result = copy.deepcopy(cached)
+        # The cached plan may come from a differently worded query; keep the caller's wording
+        if isinstance(analysis_result.get("entities"), dict):
+            analysis_result["entities"]["original_query"] = query
+        return cache_key, analysis_result
 
+    def _validate_analysis(self, query, analysis_result, cache_key=None):
+        """Accepts a well-formed analysis (memoizing it) or substitutes the generic fallback."""
         # Basic validation
         if isinstance(analysis_result, dict) and "error" not in analysis_result and "query_type" in analysis_result:
              logger.info(f"LLM Analysis successful: Type='{analysis_result.get('query_type')}', Entities={analysis_result.get('entities')}, Searches={analysis_result.get('required_searches')}")
+             # Only successful analyses are memoized; the generic fallback below never is
+             if cache_key is not None:
+                 self.analysis_cache.set(cache_key, copy.deepcopy(analysis_result))
              return analysis_result
         else:
              logger.error(f"LLM Analysis failed or returned invalid format: {analysis_result}")
@@ -59,69 +150,262 @@ class QueryEngine:
                  "error": "LLM analysis failed, proceeding with generic handling."
              }
 
-    def _fetch_realtime_data(self, search_queries, max_results_per_query=3):
+    def _classify_locally(self, query):
+        """(prediction, analysis) from the query classifier; analysis is None when the LLM should decide."""
+        if self.query_classifier is None:
+            return None, None
+        return self.query_classifier.route(query, self.business_profile)
+
+    def _analyze_query_with_llm(self, query):
         """
-        Executes the suggested search queries using a search tool (DuckDuckGo example).
+        Uses the Gemini Flash model to analyze the query, determine type,
+        extract entities, and suggest search queries.
         """
-        if not SEARCH_ENABLED or not search_queries:
-            logger.info("Search disabled or no search queries provided.")
-            return "" # Return empty string if search is off or no queries
+        cache_key, cached = self._get_cached_analysis(query)
+        if cached is not None:
+            return cached
+        prediction, local_analysis = self._classify_locally(query)
+        if local_analysis is not None:
+            return local_analysis
+
+        logger.info(f"Analyzing query with LLM: '{query}'")
+        prompt = pe.get_query_analysis_prompt(query, self.business_profile)
+        with metrics.timed("analysis"):
+            analysis_result = self.gemini_client.generate_analysis(prompt)
+        if prediction is not None:
+            self.query_classifier.record(query, prediction, analysis_result)
+        return self._validate_analysis(query, analysis_result, cache_key)
+
+    async def _analyze_query_with_llm_async(self, query):
+        """Async counterpart of _analyze_query_with_llm."""
+        cache_key, cached = self._get_cached_analysis(query)
+        if cached is not None:
+            return cached
+        prediction, local_analysis = self._classify_locally(query)
+        if local_analysis is not None:
+            return local_analysis
+
+        logger.info(f"Analyzing query with LLM (async): '{query}'")
+        prompt = pe.get_query_analysis_prompt(query, self.business_profile)
+        with metrics.timed("analysis"):
+            analysis_result = await self.gemini_client.generate_analysis_async(prompt)
+        if prediction is not None:
+            self.query_classifier.record(query, prediction, analysis_result)
+        return self._validate_analysis(query, analysis_result, cache_key)
+
+    def _search_single_query(self, query, max_results):
+        """Runs one search (see _run_search), recording its latency and the in-flight search gauge."""
+        with metrics.timed("search"), metrics.IN_FLIGHT.labels("search").track_inprogress():
+            return self._run_search(query, max_results)
+
+    def _run_search(self, query, max_results):
+        """
+        Runs one search on the engine's provider. Merged providers go through the cache per
+        underlying provider, so a cached web result is still combined with fresh local hits.
+        """
+        if isinstance(self.search_provider, MergedSearchProvider):
+            return self.search_provider.search(query, max_results, search_fn=self._cached_provider_search)
+        return self._cached_provider_search(self.search_provider, query, max_results)
+
+    def _cached_provider_search(self, provider, query, max_results):
+        """
+        Answers from the search cache when the provider is cacheable. Only cache misses reach
+        the provider (and so wait for its rate limiter).
+        """
+        use_cache = self.search_cache is not None and provider.cacheable
+        if use_cache:
+            cached = self.search_cache.get(query, max_results, namespace=provider.cache_namespace)
+            if cached is not None:
+                logger.info(f"Search cache hit ({provider.name}): '{query}'")
+                return cached
+
+        results = provider.search(query, max_results)
+
+        if use_cache:
+            self.search_cache.set(query, max_results, results, namespace=provider.cache_namespace)
+        return results
+
+    def _format_search_results(self, query, results):
+        """Renders the results of one search as the text block the prompt templates expect."""
+        if not results:
+            logger.info(f"No results found for query: '{query}'")
+            return [f"--- No significant results found online for query: '{query}' ---"]
+
+        block = [f"--- Search Results for '{query}' ---"]
+        for i, result in enumerate(results):
+            # Extract title and snippet (body)
+            title = result.get('title', 'N/A')
+            snippet = result.get('body', 'N/A')
+            url = result.get('href', 'N/A')
+            entry = f"{i+1}. Title: {title}\n   Snippet: {snippet}\n   Source: {url}"
+            if result.get('page_text'):
+                entry += f"\n   Page extract: {result['page_text']}"
+            block.append(entry)
+        block.append("--- End of Results ---")
+        return block
+
+    def _collect_search_results(self, search_queries, outcomes):
+        """Flattens per-query outcomes into structured results (search_query, title, snippet, url), in plan order."""
+        collected = []
+        for query, outcome in zip(search_queries, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Error during search for query '{query}': {outcome}", exc_info=outcome)
+                continue
+            for result in outcome:
+                snippet = result.get('body', '')
+                if result.get('page_text'):
+                    snippet = f"{snippet}\n   Page extract: {result['page_text']}"
+                collected.append({"search_query": query, "title": result.get('title', ''),
+                                  "snippet": snippet, "url": result.get('href', '')})
+        return collected
+
+    def _combine_search_results(self, search_queries, outcomes, relevance=None):
+        """
+        Joins per-query outcomes (a result list, or the exception the search raised)
+        into the search context string, in the order of `search_queries`. With a context
+        assembler and `relevance` ({"query", "query_type", "entities"}) the results are
+        deduplicated, ranked and packed into the query type's token budget instead.
+        """
+        if self.context_assembler is not None and relevance is not None:
+            results = self._collect_search_results(search_queries, outcomes)
+            return self.context_assembler.assemble(results, relevance["query"], relevance["query_type"], relevance.get("entities"))
 
         all_search_results = []
-        logger.info(f"Fetching real-time data for {len(search_queries)} queries...")
-
-        # Use the context manager for DDGS
-        with DDGS() as ddgs:
-            for query in search_queries:
-                try:
-                    logger.info(f"Searching: '{query}'")
-                    # Fetch results using the text method
-                    results = list(ddgs.text(query, max_results=max_results_per_query)) # Using text search
-
-                    if results:
-                        all_search_results.append(f"--- Search Results for '{query}' ---")
-                        for i, result in enumerate(results):
-                            # Extract title and snippet (body)
-                            title = result.get('title', 'N/A')
-                            snippet = result.get('body', 'N/A')
-                            url = result.get('href', 'N/A')
-                            all_search_results.append(f"{i+1}. Title: {title}\n   Snippet: {snippet}\n   Source: {url}")
-                        all_search_results.append("--- End of Results ---")
-                    else:
-                         logger.info(f"No results found for query: '{query}'")
-                         all_search_results.append(f"--- No significant results found online for query: '{query}' ---")
-
-                    # Optional: Add a small delay between searches to avoid rate limiting
-                    time.sleep(0.5)
-
-                except Exception as e:
-                    logger.error(f"Error during search for query '{query}': {e}", exc_info=True)
-                    all_search_results.append(f"--- Error searching for query: '{query}' ---")
+        for query, outcome in zip(search_queries, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Error during search for query '{query}': {outcome}", exc_info=outcome)
+                all_search_results.append(f"--- Error searching for query: '{query}' ---")
+                continue
+            all_search_results.extend(self._format_search_results(query, outcome))
 
         logger.info(f"Finished fetching search data. Total snippets collected: approx {len(all_search_results)}")
+        if self.search_cache is not None:
+            logger.info(f"Search cache stats: {self.search_cache.get_stats()}")
         return "\n\n".join(all_search_results)
 
+    def _start_speculative_searches(self, query, max_results_per_query=3):
+        """
+        Submits a first wave of searches guessed locally from the query and business profile,
+        before the LLM analysis has produced its search plan. Returns [(search_query, future)].
+        """
+        if not self.search_provider.available():
+            return []
+        searches = speculation.extract_speculative_searches(query, self.business_profile, max_searches=self.speculative_search_limit)
+        logger.info(f"Starting {len(searches)} speculative searches: {searches}")
+        return [(search, self._search_executor.submit(self._search_single_query, search, max_results_per_query))
+                for search in searches]
 
-    def process_query(self, query):
+    def _plan_searches(self, search_queries, max_results_per_query, speculative_searches=None):
         """
-        Orchestrates the query processing: Analyze -> Search -> Generate -> Format
+        Pairs every planned search with a running future, in plan order. Speculative searches
+        matching a planned one are reused; the unneeded ones are cancelled (or, if already
+        running, left to finish and ignored) before the remaining planned searches are submitted.
+        Returns [(executed_query, future)].
         """
-        logger.info(f"--- Starting processing for query: '{query}' ---")
+        remaining = list(speculative_searches or [])
+        matches = []
+        for query in search_queries:
+            match = next((item for item in remaining if speculation.searches_match(query, item[0])), None)
+            if match is not None:
+                remaining.remove(match)
+            matches.append((query, match))
 
-        # 1. Analyze Query using LLM (Flash model)
-        analysis = self._analyze_query_with_llm(query)
-        query_type = analysis.get("query_type", "generic")
-        entities = analysis.get("entities", {"original_query": query})
-        search_queries = analysis.get("required_searches", [])
-        if "error" in analysis:
-             logger.warning(f"LLM Analysis reported an error: {analysis['error']}")
-             # Optionally prepend this error to the final output or handle differently
+        cancelled = sum(1 for _, future in remaining if future.cancel())
+        if speculative_searches:
+            reused = len(speculative_searches) - len(remaining)
+            logger.info(f"Speculative searches: {reused} reused, {cancelled} cancelled, {len(remaining) - cancelled} discarded after starting.")
 
-        # 2. Fetch Real-time Data based on suggested searches
-        search_context = self._fetch_realtime_data(search_queries)
+        return [
+            match if match is not None
+            else (query, self._search_executor.submit(self._search_single_query, query, max_results_per_query))
+            for query, match in matches
+        ]
 
-        # 3. Generate the Main Prompt using updated templates
+    def _attach_page_text(self, outcomes):
+        """
+        Deep fetch: downloads the top `deep_fetch_pages` web results (first results of every
+        search first) and returns the outcomes with each fetched page's text as `page_text`.
+        Result lists are copied, never modified, since they may be shared with the search cache.
+        """
+        ranked = [outcome for outcome in outcomes if not isinstance(outcome, Exception)]
+        urls = []
+        for rank in range(max((len(outcome) for outcome in ranked), default=0)):
+            for outcome in ranked:
+                url = outcome[rank].get('href', '') if rank < len(outcome) else ''
+                if url.startswith(("http://", "https://")) and url not in urls:
+                    urls.append(url)
+        urls = urls[:self.deep_fetch_pages]
+        if not urls:
+            return outcomes
+
+        logger.info(f"Deep-fetching {len(urls)} result pages...")
+        with metrics.timed("fetch"):
+            pages = {page["url"]: page["text"] for page in self.page_fetcher.fetch_many(urls) if page["text"]}
+        return [
+            outcome if isinstance(outcome, Exception)
+            else [dict(result, page_text=pages[result['href']]) if result.get('href') in pages else result for result in outcome]
+            for outcome in outcomes
+        ]
+
+    def _fetch_realtime_data(self, search_queries, max_results_per_query=3, speculative_searches=None, relevance=None):
+        """
+        Executes the suggested search queries on the engine's search provider.
+        Searches run concurrently on the engine's search pool; blocks are emitted in the
+        same order as `search_queries`. `speculative_searches` ([(query, future)]) are reused
+        where they match the plan; `relevance` enables context assembly (see _combine_search_results).
+        """
+        if not self.search_provider.available() or not search_queries:
+            logger.info("Search disabled or no search queries provided.")
+            self._plan_searches([], max_results_per_query, speculative_searches) # Cancels leftovers
+            return "" # Return empty string if search is off or no queries
+
+        logger.info(f"Fetching real-time data for {len(search_queries)} queries (concurrency: {self.search_concurrency})...")
+        planned = self._plan_searches(search_queries, max_results_per_query, speculative_searches)
+        outcomes = []
+        for _, future in planned:
+            try:
+                outcomes.append(future.result())
+            except Exception as e:
+                outcomes.append(e)
+        if self.page_fetcher is not None:
+            outcomes = self._attach_page_text(outcomes)
+        return self._combine_search_results([query for query, _ in planned], outcomes, relevance)
+
+    async def _fetch_realtime_data_async(self, search_queries, max_results_per_query=3, speculative_searches=None, relevance=None):
+        """
+        Async counterpart of _fetch_realtime_data. The providers have no async clients, so the
+        searches run on the engine's bounded search pool and are awaited from the event loop.
+        """
+        if not self.search_provider.available() or not search_queries:
+            logger.info("Search disabled or no search queries provided.")
+            self._plan_searches([], max_results_per_query, speculative_searches)
+            return ""
+
+        logger.info(f"Fetching real-time data for {len(search_queries)} queries (async, concurrency: {self.search_concurrency})...")
+        planned = self._plan_searches(search_queries, max_results_per_query, speculative_searches)
+        outcomes = await asyncio.gather(
+            *(asyncio.wrap_future(future) for _, future in planned),
+            return_exceptions=True
+        )
+        if self.page_fetcher is not None:
+            outcomes = await asyncio.to_thread(self._attach_page_text, outcomes)
+        return self._combine_search_results([query for query, _ in planned], outcomes, relevance)
+
+
+    def _build_prompt(self, query, query_type, entities, search_context):
+        """
+        Selects the detailed prompt template for the query type and fills it in. With a
+        prompt cache the result is a CachedPrompt (registered static prefix + per-query suffix).
+        """
         logger.info(f"Generating main prompt for type: {query_type}")
+        if self.sectioned_generation and query_type in pe.REPORT_SECTIONS:
+            section_prompts = [
+                pe.get_section_prompt(query_type, index, self.business_profile, entities, search_context, query)
+                for index in range(len(pe.REPORT_SECTIONS[query_type]))
+            ]
+            return SectionedPrompt(query_type, query, section_prompts)
+        if self.prompt_cache is not None:
+            return self.prompt_cache.build_prompt(query_type, self.business_profile, entities, search_context, query)
         prompt = ""
         # Ensure entities and business profile are passed correctly
         prompt_context = {
@@ -146,18 +430,307 @@ class QueryEngine:
         else: # Generic query
             prompt = pe.get_detailed_generic_query_prompt(**prompt_context)
 
+        return prompt
+
+    def _unpack_analysis(self, query, analysis):
+        """Returns (query_type, entities, search_queries) with the pipeline's defaults applied."""
+        query_type = analysis.get("query_type", "generic")
+        entities = analysis.get("entities", {"original_query": query})
+        search_queries = analysis.get("required_searches", [])
+        if "error" in analysis:
+             logger.warning(f"LLM Analysis reported an error: {analysis['error']}")
+             # Optionally prepend this error to the final output or handle differently
+        return query_type, entities, search_queries
+
+    def _speculative_fallback_plan(self, analysis, search_queries, speculative):
+        """If the LLM analysis failed and planned nothing, the speculative searches become the plan."""
+        if not search_queries and "error" in analysis:
+            logger.info("LLM analysis produced no search plan; using the speculative searches instead.")
+            return [search for search, _ in speculative]
+        return search_queries
+
+    def _search_options(self, query, query_type, entities, speculative):
+        """Optional keyword arguments for _fetch_realtime_data: speculative searches and context-assembly input."""
+        options = {}
+        if speculative:
+            options["speculative_searches"] = speculative
+        if self.context_assembler is not None:
+            options["relevance"] = {"query": query, "query_type": query_type, "entities": entities}
+        return options
+
+    @staticmethod
+    def _report_progress(progress_callback, stage):
+        """Tells an optional observer which stage (analyzing, searching, generating) the pipeline entered."""
+        if progress_callback is None:
+            return
+        try:
+            progress_callback(stage)
+        except Exception as e:
+            logger.warning(f"Progress callback failed for stage '{stage}': {e}")
+
+    def _prepare_generation(self, query, progress_callback=None):
+        """
+        Runs the stages shared by the blocking and streaming pipelines:
+        Analyze -> Search -> Build prompt. Returns (analysis, query_type, prompt).
+        """
+        # Speculative mode: a locally guessed first wave of searches overlaps the analysis call
+        speculative = self._start_speculative_searches(query) if self.speculative_search else None
+
+        # 1. Analyze Query using LLM (Flash model)
+        self._report_progress(progress_callback, "analyzing")
+        analysis = self._analyze_query_with_llm(query)
+        query_type, entities, search_queries = self._unpack_analysis(query, analysis)
+
+        # 2. Fetch Real-time Data based on suggested searches
+        self._report_progress(progress_callback, "searching")
+        if speculative:
+            search_queries = self._speculative_fallback_plan(analysis, search_queries, speculative)
+        search_context = self._fetch_realtime_data(search_queries, **self._search_options(query, query_type, entities, speculative))
+
+        # 3. Generate the Main Prompt using updated templates
+        prompt = self._build_prompt(query, query_type, entities, search_context)
+        return analysis, query_type, prompt
+
+    def _draft_sections(self, prompt):
+        """Drafts every section of a SectionedPrompt concurrently; returns the texts in report order."""
+        # Each draft runs in a copy of the caller's context, so it keeps its quota priority class
+        futures = [
+            self._section_executor.submit(contextvars.copy_context().run, self.gemini_client.generate_response,
+                                          section_prompt, max_output_tokens=pe.SECTION_MAX_OUTPUT_TOKENS)
+            for section_prompt in prompt.section_prompts
+        ]
+        return [future.result() for future in futures]
+
+    async def _draft_sections_async(self, prompt):
+        return await asyncio.gather(*(
+            self.gemini_client.generate_response_async(section_prompt, max_output_tokens=pe.SECTION_MAX_OUTPUT_TOKENS)
+            for section_prompt in prompt.section_prompts
+        ))
+
+    @staticmethod
+    def _failed_section(drafts):
+        """The error of the first section that failed (the report fails with it), or None."""
+        for draft in drafts:
+            if not draft or draft.startswith("Error:"):
+                return draft or "Error: A report section came back empty."
+        return None
+
+    @staticmethod
+    def _summary_prompt(prompt, drafts):
+        return pe.get_section_summary_prompt(prompt.query_type, prompt.query, [draft.strip() for draft in drafts])
+
+    @staticmethod
+    def _join_sections(drafts, after_summary):
+        return ("\n\n" if after_summary else "") + "\n\n".join(draft.strip() for draft in drafts)
+
+    def _sectioned_report(self, drafts, summary):
+        """Executive summary followed by the sections; a failed summary is left out rather than failing the report."""
+        if not summary or summary.startswith("Error:"):
+            logger.warning(f"Executive summary pass failed; returning the sections without it: {summary}")
+            return self._join_sections(drafts, after_summary=False)
+        return summary.strip() + self._join_sections(drafts, after_summary=True)
+
+    def _generate(self, prompt):
+        """The raw report text for a prompt from _build_prompt: one Gemini call, or section drafts plus a summary pass."""
+        if not isinstance(prompt, SectionedPrompt):
+            return self.gemini_client.generate_response(prompt)
+        drafts = self._draft_sections(prompt)
+        error = self._failed_section(drafts)
+        if error:
+            return error
+        summary = self.gemini_client.generate_response(self._summary_prompt(prompt, drafts), max_output_tokens=pe.SUMMARY_MAX_OUTPUT_TOKENS)
+        return self._sectioned_report(drafts, summary)
+
+    async def _generate_async(self, prompt):
+        """Async counterpart of _generate."""
+        if not isinstance(prompt, SectionedPrompt):
+            return await self.gemini_client.generate_response_async(prompt)
+        drafts = await self._draft_sections_async(prompt)
+        error = self._failed_section(drafts)
+        if error:
+            return error
+        summary = await self.gemini_client.generate_response_async(self._summary_prompt(prompt, drafts), max_output_tokens=pe.SUMMARY_MAX_OUTPUT_TOKENS)
+        return self._sectioned_report(drafts, summary)
+
+    def _generate_stream(self, prompt):
+        """
+        Streaming counterpart of _generate. For a SectionedPrompt nothing is yielded until all
+        sections are drafted; then the summary streams, followed by the sections.
+        """
+        if not isinstance(prompt, SectionedPrompt):
+            yield from self.gemini_client.generate_response_stream(prompt)
+            return
+        drafts = self._draft_sections(prompt)
+        error = self._failed_section(drafts)
+        if error:
+            yield error
+            return
+        summary_started = False
+        for chunk in self.gemini_client.generate_response_stream(self._summary_prompt(prompt, drafts), max_output_tokens=pe.SUMMARY_MAX_OUTPUT_TOKENS):
+            if not summary_started and chunk.startswith("Error:"):
+                logger.warning(f"Executive summary pass failed; returning the sections without it: {chunk}")
+                break
+            summary_started = True
+            yield chunk
+        yield self._join_sections(drafts, after_summary=summary_started)
+
+    async def _generate_stream_async(self, prompt):
+        """Async counterpart of _generate_stream."""
+        if not isinstance(prompt, SectionedPrompt):
+            async for chunk in self.gemini_client.generate_response_stream_async(prompt):
+                yield chunk
+            return
+        drafts = await self._draft_sections_async(prompt)
+        error = self._failed_section(drafts)
+        if error:
+            yield error
+            return
+        summary_started = False
+        async for chunk in self.gemini_client.generate_response_stream_async(self._summary_prompt(prompt, drafts), max_output_tokens=pe.SUMMARY_MAX_OUTPUT_TOKENS):
+            if not summary_started and chunk.startswith("Error:"):
+                logger.warning(f"Executive summary pass failed; returning the sections without it: {chunk}")
+                break
+            summary_started = True
+            yield chunk
+        yield self._join_sections(drafts, after_summary=summary_started)
+
+    def process_query(self, query, progress_callback=None):
+        """
+        Orchestrates the query processing: Analyze -> Search -> Generate -> Format
+        progress_callback(stage), if given, is called as each stage starts.
+        """
+        logger.info(f"--- Starting processing for query: '{query}' ---")
+        analysis, query_type, prompt = self._prepare_generation(query, progress_callback)
+
         # 4. Generate the Final Response using Main LLM (Pro model)
         if not prompt:
              logger.error("Failed to generate a prompt for the main LLM.")
              return "Error: Could not determine how to process the query."
 
-        final_response = self.gemini_client.generate_response(prompt)
+        self._report_progress(progress_callback, "generating")
+        final_response = self._generate(prompt)
 
         # 5. Format the Response (optional refinement)
         formatted_response = self._format_response(final_response, query_type, analysis.get("error"))
         logger.info(f"--- Finished processing query: '{query}' ---")
         return formatted_response
 
+    async def process_query_async(self, query):
+        """
+        Async counterpart of process_query. Analysis and generation await the Gemini async
+        API and searches are awaited from the search pool, so one event loop can run many
+        reports concurrently without pinning a thread per report.
+        """
+        logger.info(f"--- Starting async processing for query: '{query}' ---")
+        analysis, query_type, prompt = await self._prepare_generation_async(query)
+
+        if not prompt:
+             logger.error("Failed to generate a prompt for the main LLM.")
+             return "Error: Could not determine how to process the query."
+
+        final_response = await self._generate_async(prompt)
+        formatted_response = self._format_response(final_response, query_type, analysis.get("error"))
+        logger.info(f"--- Finished async processing query: '{query}' ---")
+        return formatted_response
+
+    async def _prepare_generation_async(self, query):
+        """Async counterpart of _prepare_generation."""
+        speculative = self._start_speculative_searches(query) if self.speculative_search else None
+        analysis = await self._analyze_query_with_llm_async(query)
+        query_type, entities, search_queries = self._unpack_analysis(query, analysis)
+        if speculative:
+            search_queries = self._speculative_fallback_plan(analysis, search_queries, speculative)
+        search_context = await self._fetch_realtime_data_async(search_queries, **self._search_options(query, query_type, entities, speculative))
+        prompt = self._build_prompt(query, query_type, entities, search_context)
+        return analysis, query_type, prompt
+
+    def process_query_stream(self, query, progress_callback=None):
+        """
+        Streaming variant of process_query: yields the formatted report in pieces as the
+        generative model produces them. Joining all yielded pieces gives the same text
+        process_query would have returned.
+        """
+        logger.info(f"--- Starting streaming processing for query: '{query}' ---")
+        analysis, query_type, prompt = self._prepare_generation(query, progress_callback)
+
+        if not prompt:
+             logger.error("Failed to generate a prompt for the main LLM.")
+             yield "Error: Could not determine how to process the query."
+             return
+
+        self._report_progress(progress_callback, "generating")
+
+        started = False
+        for chunk in self._generate_stream(prompt):
+            if not started:
+                if chunk.startswith("Error:"):
+                    # Nothing has been sent yet, so report the failure the same way process_query does
+                    yield self._format_response(chunk, query_type)
+                    return
+                started = True
+                yield self._report_header(query_type, analysis.get("error"))
+            yield chunk
+
+        if not started:
+            yield self._format_response("", query_type)
+            return
+        yield REPORT_FOOTER
+        logger.info(f"--- Finished streaming query: '{query}' ---")
+
+    async def process_query_stream_async(self, query):
+        """Async counterpart of process_query_stream; an async generator of report pieces."""
+        logger.info(f"--- Starting async streaming processing for query: '{query}' ---")
+        analysis, query_type, prompt = await self._prepare_generation_async(query)
+
+        if not prompt:
+             logger.error("Failed to generate a prompt for the main LLM.")
+             yield "Error: Could not determine how to process the query."
+             return
+
+        started = False
+        async for chunk in self._generate_stream_async(prompt):
+            if not started:
+                if chunk.startswith("Error:"):
+                    yield self._format_response(chunk, query_type)
+                    return
+                started = True
+                yield self._report_header(query_type, analysis.get("error"))
+            yield chunk
+
+        if not started:
+            yield self._format_response("", query_type)
+            return
+        yield REPORT_FOOTER
+        logger.info(f"--- Finished async streaming query: '{query}' ---")
+
+    @staticmethod
+    def is_cacheable_report(report):
+        """True for complete reports; generation errors and reports built on a failed analysis are not reused."""
+        return bool(report) and report.startswith(REPORT_TITLE_PREFIX) and "**Warning:** There was an issue during the initial query analysis" not in report
+
+    @staticmethod
+    def is_stream_interruption(piece):
+        """True for the error piece a report stream carries when generation broke off mid-report."""
+        return piece.startswith("\n\nError:")
+
+    @staticmethod
+    def report_query_type(report):
+        """The query type a report was generated for, recovered from its title (None if it has none)."""
+        if not report or not report.startswith(REPORT_TITLE_PREFIX):
+            return None
+        title = report[len(REPORT_TITLE_PREFIX):].split("\n", 1)[0].strip()
+        return title.lower().replace(' ', '_') or None
+
+    def _report_header(self, query_type, analysis_error=None):
+        """ Report title, plus a warning when the initial query analysis failed. """
+        # Use Markdown for structure if not already present
+        title = query_type.replace('_', ' ').title()
+        header = f"{REPORT_TITLE_PREFIX} {title}\n\n"
+        # Prepend analysis error if it occurred
+        if analysis_error:
+             header += f"**Warning:** There was an issue during the initial query analysis ({analysis_error}). The following response is based on default assumptions or potentially incomplete context.\n\n---\n\n"
+        return header
+
     def _format_response(self, raw_response, query_type, analysis_error=None):
         """ Basic formatting, includes analysis errors if any. """
         if raw_response and raw_response.startswith("Error:"):
@@ -166,18 +739,4 @@ class QueryEngine:
         elif not raw_response:
              return "Error: Received no response from the AI generation model."
 
-        # Prepend analysis error if it occurred
-        error_prefix = ""
-        if analysis_error:
-             error_prefix = f"**Warning:** There was an issue during the initial query analysis ({analysis_error}). The following response is based on default assumptions or potentially incomplete context.\n\n---\n\n"
-
-        # Use Markdown for structure if not already present
-        title = query_type.replace('_', ' ').title()
-        formatted = f"# AI Business Insight Report: {title}\n\n"
-        formatted += error_prefix # Add warning if analysis failed
-        formatted += raw_response
-
-        # Add a footer?
-        formatted += "\n\n---\n*Disclaimer: This report is AI-generated based on provided context and publicly available data (as of the time of the search). Verify critical information before making decisions.*"
-
-        return formatted
\ No newline at end of file
+        return self._report_header(query_type, analysis_error) + raw_response + REPORT_FOOTER
@@ -0,0 +1,411 @@
+# src/assistant/quota_scheduler.py
+"""
+Admission control for Gemini calls, so batch runs cannot starve interactive users of the
+API quota. Every attempt asks the scheduler for one request and an estimated number of
+prompt tokens from requests-per-minute / tokens-per-minute token buckets before it is sent.
+
+Waiting calls are queued by priority class: a batch call is only admitted while no
+interactive call is waiting. Within a class, tenants (by default the active business
+profile) share the quota fairly: the tenant that has been granted the fewest tokens goes
+next. No call waits longer than `max_queue_wait`; it fails with QuotaWaitTimeout instead.
+
+The class of the calls made in a block is set with `request_priority(BATCH)` (a context
+variable, like the active profile). With `shared_state_path` the buckets live in a small
+JSON file locked with flock, so several processes on one host (web workers, batch jobs,
+the daemon) draw from one quota. Interactive demand is advertised in that file as well.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from . import metrics, profiles, utils
+
+try:
+    import fcntl
+except ImportError: # Windows: shared state is not available
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH) # Highest first
+CHARS_PER_TOKEN = 4
+INTERACTIVE_HEARTBEAT = 1.0 # Seconds another process keeps batch calls back after seeing interactive demand
+
+_request_priority = contextvars.ContextVar("gemini_request_priority", default=(INTERACTIVE, None))
+
+
+class QuotaWaitTimeout(TimeoutError):
+    """Raised when a call waited the maximum queue time without being admitted."""
+
+
+def current_priority():
+    """(priority class, tenant) of Gemini calls in the current thread or task; tenant may be None."""
+    return _request_priority.get()
+
+
+@contextmanager
+def request_priority(priority, tenant=None):
+    """Runs the enclosed block's Gemini calls in `priority` (INTERACTIVE or BATCH) for `tenant`."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority class: {priority}")
+    token = _request_priority.set((priority, tenant))
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+def estimate_tokens(contents):
+    """Rough prompt size in tokens (about four characters each) of a prompt string or a list of parts."""
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return len(contents) // CHARS_PER_TOKEN + 1
+    if isinstance(contents, dict):
+        return sum(estimate_tokens(value) for key, value in contents.items() if key in ("text", "parts"))
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(item) for item in contents)
+    return estimate_tokens(str(contents))
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute` units per minute up to `capacity` (default: one minute's worth).
+    A take larger than the capacity is allowed once the bucket is full and leaves it in debt.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity or per_minute)
+        self.tokens = self.capacity
+        self.updated = None
+
+    def refill(self, now):
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` can be taken (after refill(now))."""
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate) if self.rate > 0 else (0.0 if missing <= 0 else math.inf)
+
+    def take(self, amount):
+        self.tokens -= amount
+
+    def load(self, state):
+        if state:
+            self.tokens, self.updated = min(self.capacity, state[0]), state[1]
+
+    def dump(self):
+        return [self.tokens, self.updated]
+
+
+class _Waiter:
+    __slots__ = ("priority", "tenant", "tokens", "enqueued_at", "deadline", "granted")
+
+    def __init__(self, priority, tenant, tokens, enqueued_at, deadline):
+        self.priority = priority
+        self.tenant = tenant
+        self.tokens = tokens
+        self.enqueued_at = enqueued_at
+        self.deadline = deadline
+        self.granted = False
+
+
+class QuotaScheduler:
+    """
+    requests_per_minute / tokens_per_minute: the Gemini quota; None leaves that dimension
+        unlimited (with both None every call is admitted at once).
+    max_queue_wait: longest a call waits for admission, unless acquire() is given a shorter timeout.
+    shared_state_path: JSON file that makes the buckets shared with other processes (Unix only).
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_queue_wait=60.0,
+                 shared_state_path=None, poll_interval=0.05, history=1000):
+        self._buckets = {}
+        if requests_per_minute:
+            self._buckets["requests"] = TokenBucket(requests_per_minute)
+        if tokens_per_minute:
+            self._buckets["tokens"] = TokenBucket(tokens_per_minute)
+        self.max_queue_wait = max_queue_wait
+        self.poll_interval = poll_interval
+        self.shared_state_path = shared_state_path
+        if shared_state_path and fcntl is None:
+            logger.warning("Shared Gemini quota state needs fcntl; falling back to a per-process quota.")
+            self.shared_state_path = None
+        if self.shared_state_path:
+            directory = os.path.dirname(self.shared_state_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        # Buckets shared between processes need a clock that is comparable between them
+        self._clock = time.time if self.shared_state_path else time.monotonic
+        self._queues = {priority: {} for priority in PRIORITIES} # tenant -> deque of waiters, in arrival order
+        self._virtual = {priority: {} for priority in PRIORITIES} # tenant -> tokens granted (fair-share clock)
+        self._class_clock = {priority: 0.0 for priority in PRIORITIES}
+        self._cond = threading.Condition()
+        self._granted = {priority: 0 for priority in PRIORITIES}
+        self._timeouts = {priority: 0 for priority in PRIORITIES}
+        self._waits = {priority: deque(maxlen=history) for priority in PRIORITIES}
+
+    @property
+    def enabled(self):
+        return bool(self._buckets)
+
+    def _resolve(self, priority, tenant):
+        default_priority, default_tenant = current_priority()
+        priority = priority or default_priority
+        tenant = tenant or default_tenant or getattr(profiles.active_profile(), "name", None) or "default"
+        return priority, tenant
+
+    def _enqueue(self, tokens, priority, tenant, timeout):
+        now = self._clock()
+        wait = self.max_queue_wait if timeout is None else min(timeout, self.max_queue_wait)
+        waiter = _Waiter(priority, tenant, max(0, int(tokens)), now, now + max(0.0, wait))
+        queues = self._queues[priority]
+        if tenant not in queues:
+            # A tenant that was idle starts level with the class, so it cannot claim a backlog of unused share
+            queues[tenant] = deque()
+            self._virtual[priority][tenant] = self._class_clock[priority]
+        queues[tenant].append(waiter)
+        return waiter
+
+    def _remove(self, waiter):
+        queue = self._queues[waiter.priority].get(waiter.tenant)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.priority][waiter.tenant]
+                del self._virtual[waiter.priority][waiter.tenant]
+            self._cond.notify_all() # The head of the queue may have changed
+
+    def _next_waiter(self):
+        for priority in PRIORITIES:
+            queues = self._queues[priority]
+            if queues:
+                tenant = min(queues, key=lambda name: self._virtual[priority][name])
+                return queues[tenant][0]
+        return None
+
+    def _grant(self, waiter):
+        priority, tenant = waiter.priority, waiter.tenant
+        queue = self._queues[priority][tenant]
+        queue.popleft()
+        self._class_clock[priority] = self._virtual[priority][tenant]
+        self._virtual[priority][tenant] += max(1, waiter.tokens)
+        if not queue:
+            del self._queues[priority][tenant]
+            del self._virtual[priority][tenant]
+        waiter.granted = True
+
+    def _dispatch(self):
+        """
+        Admits queued calls in order while the buckets allow; returns the seconds until the
+        next call could be admitted (math.inf with an empty queue). Called with the lock held.
+        """
+        if self.shared_state_path:
+            with _locked_state(self.shared_state_path) as state:
+                return self._dispatch_buckets(state)
+        return self._dispatch_buckets(None)
+
+    def _dispatch_buckets(self, state):
+        now = self._clock()
+        if state is not None:
+            for name, bucket in self._buckets.items():
+                bucket.load(state.get(name))
+            if self._queues[INTERACTIVE]:
+                state["interactive_until"] = now + INTERACTIVE_HEARTBEAT
+        for bucket in self._buckets.values():
+            bucket.refill(now)
+        wait = math.inf
+        granted = False
+        while True:
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            if waiter.priority == BATCH and state is not None and state.get("interactive_until", 0) > now:
+                wait = self.poll_interval # Another process is serving interactive calls
+                break
+            costs = {"requests": 1, "tokens": waiter.tokens}
+            wait = max((bucket.wait_time(costs[name]) for name, bucket in self._buckets.items()), default=0.0)
+            if wait > 0:
+                break
+            for name, bucket in self._buckets.items():
+                bucket.take(costs[name])
+            self._grant(waiter)
+            granted = True
+        if state is not None:
+            for name, bucket in self._buckets.items():
+                state[name] = bucket.dump()
+        if granted:
+            self._cond.notify_all()
+        return wait
+
+    def _finish(self, waiter, started):
+        waited = self._clock() - started
+        with self._cond:
+            self._granted[waiter.priority] += 1
+            self._waits[waiter.priority].append(waited)
+        metrics.QUOTA_WAIT_SECONDS.labels(waiter.priority).observe(waited)
+        return waited
+
+    def _timed_out(self, waiter):
+        self._remove(waiter)
+        self._timeouts[waiter.priority] += 1
+        metrics.QUOTA_TIMEOUTS.labels(waiter.priority).inc()
+        return QuotaWaitTimeout(f"Gemini quota: {waiter.priority} call not admitted within "
+                                f"{waiter.deadline - waiter.enqueued_at:.1f}s")
+
+    def acquire(self, tokens=0, priority=None, tenant=None, timeout=None):
+        """
+        Blocks until one request of `tokens` estimated prompt tokens may be sent. Returns the
+        seconds waited; raises QuotaWaitTimeout. priority / tenant default to request_priority().
+        """
+        if not self.enabled:
+            return 0.0
+        priority, tenant = self._resolve(priority, tenant)
+        with self._cond:
+            waiter = self._enqueue(tokens, priority, tenant, timeout)
+            try:
+                while True:
+                    wait = self._dispatch()
+                    if waiter.granted:
+                        break
+                    remaining = waiter.deadline - self._clock()
+                    if remaining <= 0:
+                        raise self._timed_out(waiter)
+                    if self.shared_state_path:
+                        wait = min(wait, self.poll_interval) # Other processes do not notify us
+                    self._cond.wait(min(wait, remaining))
+            except BaseException:
+                self._remove(waiter)
+                raise
+        return self._finish(waiter, waiter.enqueued_at)
+
+    def try_acquire(self, tokens=0, priority=None, tenant=None):
+        """Admits a call only if it can be sent right now, without queueing; returns True if it was admitted."""
+        if not self.enabled:
+            return True
+        priority, tenant = self._resolve(priority, tenant)
+        with self._cond:
+            waiter = self._enqueue(tokens, priority, tenant, 0)
+            self._dispatch()
+            if not waiter.granted:
+                self._remove(waiter)
+                return False
+        self._finish(waiter, waiter.enqueued_at)
+        return True
+
+    async def acquire_async(self, tokens=0, priority=None, tenant=None, timeout=None):
+        """Async counterpart of acquire(); polls every `poll_interval` instead of blocking the loop."""
+        if not self.enabled:
+            return 0.0
+        priority, tenant = self._resolve(priority, tenant)
+        with self._cond:
+            waiter = self._enqueue(tokens, priority, tenant, timeout)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._dispatch()
+                    if waiter.granted:
+                        break
+                    remaining = waiter.deadline - self._clock()
+                    if remaining <= 0:
+                        raise self._timed_out(waiter)
+                await asyncio.sleep(min(wait, remaining, self.poll_interval))
+        except BaseException: # Includes cancellation of the waiting task
+            with self._cond:
+                self._remove(waiter)
+            raise
+        return self._finish(waiter, waiter.enqueued_at)
+
+    def throttle(self):
+        """Empties the request bucket after the API answered 429, so every caller backs off together."""
+        if "requests" not in self._buckets:
+            return
+        with self._cond:
+            if self.shared_state_path:
+                with _locked_state(self.shared_state_path) as state:
+                    self._throttle_requests(state)
+            else:
+                self._throttle_requests(None)
+
+    def _throttle_requests(self, state):
+        bucket = self._buckets["requests"]
+        if state is not None:
+            bucket.load(state.get("requests"))
+        bucket.refill(self._clock())
+        bucket.tokens = min(bucket.tokens, 0.0)
+        if state is not None:
+            state["requests"] = bucket.dump()
+
+    def snapshot(self):
+        with self._cond:
+            queued = {priority: sum(len(queue) for queue in self._queues[priority].values()) for priority in PRIORITIES}
+            return {
+                "enabled": self.enabled,
+                "shared": bool(self.shared_state_path),
+                "queued": queued,
+                "granted": dict(self._granted),
+                "timeouts": dict(self._timeouts),
+                "wait_p50_seconds": {p: round(utils.percentile(list(self._waits[p]), 50), 3) for p in PRIORITIES},
+                "wait_p95_seconds": {p: round(utils.percentile(list(self._waits[p]), 95), 3) for p in PRIORITIES},
+            }
+
+
+@contextmanager
+def _locked_state(path):
+    """Exclusive access to the shared JSON state; changes to the yielded dict are written back."""
+    with open(path, "a+", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            raw = f.read()
+            try:
+                state = json.loads(raw) if raw else {}
+            except json.JSONDecodeError:
+                logger.warning(f"Ignoring corrupt Gemini quota state in {path}.")
+                state = {}
+            yield state
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(state))
+            f.flush()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def from_env():
+    """
+    Scheduler configured by GEMINI_RPM, GEMINI_TPM, GEMINI_QUOTA_MAX_WAIT (seconds, default 60)
+    and GEMINI_QUOTA_STATE (shared state file). Without limits it admits everything at once.
+    """
+    def number(name):
+        value = os.getenv(name)
+        return float(value) if value else None
+
+    return QuotaScheduler(requests_per_minute=number("GEMINI_RPM"), tokens_per_minute=number("GEMINI_TPM"),
+                          max_queue_wait=number("GEMINI_QUOTA_MAX_WAIT") or 60.0,
+                          shared_state_path=os.getenv("GEMINI_QUOTA_STATE") or None)
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler():
+    """The process-wide scheduler shared by every GeminiClient, created from the environment on first use."""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = from_env()
+        return _default_scheduler
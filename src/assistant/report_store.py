@@ -0,0 +1,201 @@
+# src/assistant/report_store.py
+"""
+Persistent store for generated reports. Each report is written once as a gzip file and
+described by a row in a small SQLite index (query, query type, profile, timestamp, sizes).
+Report IDs are derived from the report text (and the profile's fingerprint), so the ID
+doubles as a strong ETag and saving the same report again (e.g. a report-cache hit) is a
+cheap index lookup. Reports saved with a profile fingerprint are only listed and returned
+for that fingerprint.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPORT_STORE_DIR = os.path.join(".cache", "reports")
+ID_LENGTH = 24
+READ_CHUNK_BYTES = 64 * 1024
+
+_METADATA_COLUMNS = ("id", "query", "query_type", "profile", "created_at", "size", "compressed_size")
+
+
+def report_id(report, profile_fingerprint=None):
+    """Content-derived ID of a report (hex); the same text saved for two profiles gets two IDs."""
+    data = report.encode("utf-8")
+    if profile_fingerprint:
+        data = f"{profile_fingerprint}\n".encode("utf-8") + data
+    return hashlib.sha256(data).hexdigest()[:ID_LENGTH]
+
+
+def is_report_id(value):
+    return isinstance(value, str) and len(value) == ID_LENGTH and all(c in "0123456789abcdef" for c in value)
+
+
+class ReportStore:
+    """
+    Reports are stored as `<directory>/<id>.md.gz` with their metadata in
+    `<directory>/index.sqlite3`. Once more than `max_reports` are stored, the oldest
+    ones are deleted. Safe to share between threads and processes.
+    """
+
+    def __init__(self, directory=None, max_reports=5000, compresslevel=6):
+        self.directory = directory if directory is not None else os.getenv("REPORT_STORE_DIR", DEFAULT_REPORT_STORE_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self.index_path = os.path.join(self.directory, "index.sqlite3")
+        self.max_reports = max(1, int(max_reports))
+        self.compresslevel = compresslevel
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self):
+        # Short-lived connections per operation, as in SQLiteTTLStore
+        conn = sqlite3.connect(self.index_path, timeout=5.0)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS reports ("
+                        " id TEXT PRIMARY KEY, query TEXT NOT NULL, query_type TEXT, profile TEXT,"
+                        " created_at REAL NOT NULL, size INTEGER NOT NULL, compressed_size INTEGER NOT NULL)"
+                    )
+                    columns = [row[1] for row in conn.execute("PRAGMA table_info(reports)")]
+                    if "profile_fingerprint" not in columns: # Indexes created before reports were kept per profile
+                        conn.execute("ALTER TABLE reports ADD COLUMN profile_fingerprint TEXT")
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_created_at ON reports(created_at)")
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_profile ON reports(profile_fingerprint, created_at)")
+                    conn.commit()
+                    self._initialized = True
+        return conn
+
+    def path_for(self, rid):
+        if not is_report_id(rid):
+            raise ValueError(f"Invalid report id: {rid!r}")
+        return os.path.join(self.directory, f"{rid}.md.gz")
+
+    def save(self, report, query, query_type=None, profile=None, profile_fingerprint=None):
+        """
+        Stores a report (unless the same text is already stored for the profile) and returns
+        its ID. `profile` is the display name; `profile_fingerprint` scopes who may read it.
+        """
+        rid = report_id(report, profile_fingerprint)
+        path = self.path_for(rid)
+        conn = self._connect()
+        try:
+            if conn.execute("SELECT 1 FROM reports WHERE id = ?", (rid,)).fetchone() and os.path.exists(path):
+                return rid
+
+            data = report.encode("utf-8")
+            # mtime=0 keeps the compressed bytes identical for identical reports
+            compressed = gzip.compress(data, compresslevel=self.compresslevel, mtime=0)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(compressed)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+            conn.execute(
+                "INSERT OR REPLACE INTO reports"
+                " (id, query, query_type, profile, profile_fingerprint, created_at, size, compressed_size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (rid, query, query_type, profile, profile_fingerprint, time.time(), len(data), len(compressed)),
+            )
+            conn.commit()
+            self._prune(conn)
+        finally:
+            conn.close()
+        logger.info(f"Stored report {rid} ({len(data)} bytes, {len(compressed)} compressed)")
+        return rid
+
+    def _prune(self, conn):
+        (count,) = conn.execute("SELECT COUNT(*) FROM reports").fetchone()
+        overflow = count - self.max_reports
+        if overflow <= 0:
+            return
+        oldest = [row[0] for row in conn.execute("SELECT id FROM reports ORDER BY created_at ASC LIMIT ?", (overflow,))]
+        conn.executemany("DELETE FROM reports WHERE id = ?", [(rid,) for rid in oldest])
+        conn.commit()
+        for rid in oldest:
+            try:
+                os.remove(self.path_for(rid))
+            except OSError:
+                pass
+
+    @staticmethod
+    def _profile_filter(profile_fingerprint):
+        """(SQL condition, parameters) limiting a query to one profile's reports; none for None."""
+        if profile_fingerprint is None:
+            return "", ()
+        return " AND profile_fingerprint = ?", (profile_fingerprint,)
+
+    def get_metadata(self, rid, profile_fingerprint=None):
+        """
+        Metadata dict of a stored report, or None if it is unknown, its file is gone or it
+        belongs to another profile than `profile_fingerprint` (if given).
+        """
+        if not is_report_id(rid):
+            return None
+        condition, params = self._profile_filter(profile_fingerprint)
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT {', '.join(_METADATA_COLUMNS)} FROM reports WHERE id = ?{condition}",
+                               (rid, *params)).fetchone()
+        finally:
+            conn.close()
+        if row is None or not os.path.exists(self.path_for(rid)):
+            return None
+        return dict(zip(_METADATA_COLUMNS, row))
+
+    def list(self, limit=50, offset=0, profile_fingerprint=None):
+        """Metadata of stored reports (of one profile, if `profile_fingerprint` is given), newest first."""
+        condition, params = self._profile_filter(profile_fingerprint)
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT {', '.join(_METADATA_COLUMNS)} FROM reports WHERE 1{condition}"
+                " ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (*params, int(limit), int(offset)),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(zip(_METADATA_COLUMNS, row)) for row in rows]
+
+    def count(self, profile_fingerprint=None):
+        condition, params = self._profile_filter(profile_fingerprint)
+        conn = self._connect()
+        try:
+            (count,) = conn.execute(f"SELECT COUNT(*) FROM reports WHERE 1{condition}", params).fetchone()
+        finally:
+            conn.close()
+        return count
+
+    def iter_compressed(self, rid, chunk_size=READ_CHUNK_BYTES):
+        """Yields the stored gzip bytes, for clients that accept Content-Encoding: gzip."""
+        with open(self.path_for(rid), "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def iter_text(self, rid, chunk_size=READ_CHUNK_BYTES):
+        """Yields the report as UTF-8 bytes, decompressing as it goes."""
+        with gzip.open(self.path_for(rid), "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def read(self, rid):
+        """The full report text."""
+        return b"".join(self.iter_text(rid)).decode("utf-8")
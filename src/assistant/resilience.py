@@ -0,0 +1,194 @@
+# src/assistant/resilience.py
+"""
+Building blocks for calling Gemini safely under load: error classification, exponential
+backoff with jitter, a process-wide retry budget and a circuit breaker.
+"""
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Errors that say "try again later": quota, overload, transient server or network trouble
+_RETRYABLE_GOOGLE_ERRORS = (
+    "TooManyRequests", "ResourceExhausted", "ServiceUnavailable", "InternalServerError",
+    "GatewayTimeout", "DeadlineExceeded", "Aborted", "Unknown",
+)
+# Errors that will fail the same way on every retry: bad request, auth, missing model
+_FATAL_GOOGLE_ERRORS = (
+    "BadRequest", "InvalidArgument", "Unauthenticated", "Unauthorized", "PermissionDenied",
+    "Forbidden", "NotFound", "FailedPrecondition", "MethodNotImplemented",
+)
+
+
+def _google_exceptions():
+    """google.api_core.exceptions, imported when the first error is classified (not at startup)."""
+    try:
+        from google.api_core import exceptions
+    except ImportError: # google-api-core ships with google-generativeai; keep this module usable without it
+        return None
+    return exceptions
+
+
+def is_retryable(error):
+    """Classifies an exception raised by a Gemini call as retryable (True) or fatal (False)."""
+    google_exceptions = _google_exceptions()
+    if google_exceptions is not None:
+        fatal = tuple(getattr(google_exceptions, name) for name in _FATAL_GOOGLE_ERRORS if hasattr(google_exceptions, name))
+        if isinstance(error, fatal):
+            return False
+        retryable = tuple(getattr(google_exceptions, name) for name in _RETRYABLE_GOOGLE_ERRORS if hasattr(google_exceptions, name))
+        if isinstance(error, retryable):
+            return True
+    if isinstance(error, (ValueError, TypeError)):
+        return False # Programming or request-construction errors
+    # Connection resets, timeouts and unknown transport errors are worth another try
+    return True
+
+
+class ExponentialBackoff:
+    """Full-jitter exponential backoff: the delay before retry n is uniform in [0, min(cap, base * 2**n)]."""
+
+    def __init__(self, base=0.5, cap=8.0, rng=None):
+        self.base = base
+        self.cap = cap
+        self._rng = rng or random.Random()
+
+    def delay(self, attempt):
+        return self._rng.uniform(0, min(self.cap, self.base * (2 ** attempt)))
+
+
+class RetryBudget:
+    """
+    Process-wide limit on retries, so a quota spike does not multiply traffic. Every
+    request deposits `ratio` tokens and every retry spends one; a small floor of
+    `min_retries_per_second` keeps retries possible when traffic is low.
+    """
+
+    def __init__(self, ratio=0.2, min_retries_per_second=0.5, max_tokens=20.0):
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self._retries = 0
+        self._rejected = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._last_refill) * self.min_retries_per_second)
+        self._last_refill = now
+
+    def record_request(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self):
+        """Takes one retry token; False means the budget is exhausted and the caller should give up."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self._retries += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def snapshot(self):
+        with self._lock:
+            self._refill()
+            return {"available_tokens": round(self._tokens, 2), "retries": self._retries, "rejected_retries": self._rejected}
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a dependency is unhealthy. After `failure_threshold` consecutive
+    failures the circuit opens and calls are refused for `recovery_timeout` seconds;
+    then a limited number of trial calls are let through (half-open). A success
+    closes the circuit again, a failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._half_open_calls = 0
+        self._times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def allow_request(self):
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            return False
+
+    def release(self):
+        """
+        Gives back the half-open trial slot of a call that ended without a verdict (a fatal
+        request error, an abandoned stream). No-op once the call recorded success or failure.
+        """
+        with self._lock:
+            if self._current_state() == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit breaker '{self.name}' closed after a successful call.")
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or (state == self.CLOSED and self._consecutive_failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._times_opened += 1
+                logger.warning(f"Circuit breaker '{self.name}' opened after {self._consecutive_failures} consecutive failures.")
+
+    def snapshot(self):
+        with self._lock:
+            state = self._current_state()
+            retry_in = None
+            if state == self.OPEN:
+                retry_in = round(max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at)), 1)
+            return {
+                "name": self.name,
+                "state": state,
+                "consecutive_failures": self._consecutive_failures,
+                "times_opened": self._times_opened,
+                "retry_in_seconds": retry_in,
+            }
+
+
+# Shared by every GeminiClient in the process, so all callers back off together
+gemini_retry_budget = RetryBudget()
+gemini_circuit_breaker = CircuitBreaker("gemini")
@@ -0,0 +1,303 @@
+# src/assistant/search_providers.py
+"""
+Search backends behind one interface. Every provider returns DuckDuckGo-shaped result
+dicts ({"title", "body", "href"}), so the rest of the pipeline does not care where a
+result came from:
+
+- DuckDuckGoProvider: web search (the original, and still default, backend).
+- LocalCorpusProvider: SQLite FTS5 index over our own Markdown/text documents
+  (market research, past reports), ingested incrementally and ranked with BM25.
+- MergedSearchProvider: queries several providers in parallel and interleaves results.
+"""
+import importlib.util
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Checked without importing: duckduckgo_search is only imported by the first web search
+DDG_AVAILABLE = importlib.util.find_spec("duckduckgo_search") is not None
+if not DDG_AVAILABLE:
+    logging.warning("duckduckgo_search library not found. Web search will be disabled. Install with: pip install -U duckduckgo-search")
+
+DEFAULT_LOCAL_INDEX_PATH = os.path.join(".cache", "local_corpus.sqlite3")
+
+
+class SearchProvider:
+    """
+    Base class for search backends. `cacheable` providers have their results stored in the
+    engine's SearchCache (under `cache_namespace`); fast or frequently changing ones opt out.
+    """
+
+    name = "base"
+    cacheable = False
+    cache_namespace = None
+
+    def available(self):
+        return True
+
+    def search(self, query, max_results):
+        """Returns a list of {"title", "body", "href"} dicts, best first."""
+        raise NotImplementedError
+
+
+class DuckDuckGoProvider(SearchProvider):
+    """Web search through duckduckgo_search, throttled by an optional shared RateLimiter."""
+
+    name = "duckduckgo"
+    cacheable = True
+    cache_namespace = "" # Same keys as before providers existed, so the on-disk cache stays valid
+
+    def __init__(self, rate_limiter=None, ddgs_factory=None):
+        self.rate_limiter = rate_limiter
+        self.ddgs_factory = ddgs_factory # None: duckduckgo_search.DDGS, imported on first search
+
+    def available(self):
+        return self.ddgs_factory is not None or DDG_AVAILABLE
+
+    def search(self, query, max_results):
+        if self.ddgs_factory is None:
+            from duckduckgo_search import DDGS
+            self.ddgs_factory = DDGS
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        logger.info(f"Searching DuckDuckGo: '{query}'")
+        with self.ddgs_factory() as ddgs:
+            return list(ddgs.text(query, max_results=max_results))
+
+
+# Very common words add nothing to an OR query except noise
+_STOPWORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it", "of",
+              "on", "or", "our", "that", "the", "this", "to", "vs", "we", "what", "with"}
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _split_sections(text):
+    """Splits Markdown into (heading, body) sections; text before the first heading has heading ''."""
+    sections, heading, lines = [], "", []
+    for line in text.splitlines():
+        match = _HEADING_RE.match(line)
+        if match:
+            if any(l.strip() for l in lines):
+                sections.append((heading, "\n".join(lines).strip()))
+            heading, lines = match.group(2).strip("# "), []
+        else:
+            lines.append(line)
+    if any(l.strip() for l in lines):
+        sections.append((heading, "\n".join(lines).strip()))
+    return sections
+
+
+def _chunk_section(body, chunk_chars):
+    """Packs paragraphs into chunks of at most ~chunk_chars characters (long paragraphs are cut)."""
+    chunks, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", body):
+        paragraph = paragraph.strip()
+        while len(paragraph) > chunk_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:chunk_chars])
+            paragraph = paragraph[chunk_chars:]
+        if current and len(current) + len(paragraph) + 2 > chunk_chars:
+            chunks.append(current)
+            current = ""
+        if paragraph:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class LocalCorpusProvider(SearchProvider):
+    """
+    Full-text search over local Markdown and text files using an SQLite FTS5 index.
+    Documents are split into heading-scoped chunks; ingest() only re-indexes files whose
+    size or modification time changed and drops files that disappeared. Queries are
+    matched as OR of their terms and ranked with FTS5's BM25 (headings and titles weigh more).
+    """
+
+    name = "local"
+    cacheable = False # Answers in milliseconds and changes on every ingest
+
+    def __init__(self, index_path=None, directories=(), extensions=(".md", ".markdown", ".txt"),
+                 chunk_chars=1200, ingest_on_start=True):
+        self.index_path = index_path if index_path is not None else os.getenv("LOCAL_SEARCH_INDEX", DEFAULT_LOCAL_INDEX_PATH)
+        if self.index_path != ":memory:":
+            directory = os.path.dirname(self.index_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.chunk_chars = chunk_chars
+        self._lock = threading.Lock()
+        # One shared connection (serialized by the lock) so ":memory:" indexes work too
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL,
+                title TEXT NOT NULL, indexed_at REAL NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+                path UNINDEXED, title, heading, body, tokenize = 'unicode61 remove_diacritics 2'
+            );
+        """)
+        if ingest_on_start and self.directories:
+            self.ingest()
+
+    def _iter_files(self, directories):
+        for directory in directories:
+            if os.path.isfile(directory):
+                yield os.path.abspath(directory)
+                continue
+            for root, dirs, files in os.walk(directory):
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+                for filename in files:
+                    if filename.lower().endswith(self.extensions):
+                        yield os.path.join(root, filename)
+
+    def _index_file(self, path, stat):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        sections = _split_sections(text)
+        title = next((heading for heading, _ in sections if heading), "") or os.path.splitext(os.path.basename(path))[0]
+        self._conn.execute("DELETE FROM chunks WHERE path = ?", (path,))
+        self._conn.executemany(
+            "INSERT INTO chunks (path, title, heading, body) VALUES (?, ?, ?, ?)",
+            [(path, title, heading, chunk) for heading, body in sections for chunk in _chunk_section(body, self.chunk_chars)]
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO documents (path, mtime, size, title, indexed_at) VALUES (?, ?, ?, ?, ?)",
+            (path, stat.st_mtime, stat.st_size, title, time.time())
+        )
+
+    def ingest(self, directories=None):
+        """
+        Indexes new and changed files under `directories` (default: the configured ones)
+        and removes documents whose files are gone. Returns counts per outcome.
+        """
+        directories = [os.path.abspath(d) for d in (directories or self.directories)]
+        counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        with self._lock:
+            known = {path: (mtime, size) for path, mtime, size in
+                     self._conn.execute("SELECT path, mtime, size FROM documents")}
+            seen = set()
+            for path in self._iter_files(directories):
+                seen.add(path)
+                try:
+                    stat = os.stat(path)
+                    if known.get(path) == (stat.st_mtime, stat.st_size):
+                        counts["unchanged"] += 1
+                        continue
+                    self._index_file(path, stat)
+                    counts["updated" if path in known else "added"] += 1
+                except OSError as e:
+                    logger.warning(f"Could not index '{path}': {e}")
+
+            for path in known:
+                in_scope = any(path == d or path.startswith(d.rstrip(os.sep) + os.sep) for d in directories)
+                if in_scope and path not in seen:
+                    self._conn.execute("DELETE FROM chunks WHERE path = ?", (path,))
+                    self._conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+                    counts["removed"] += 1
+            self._conn.commit()
+        logger.info(f"Local corpus ingest: {counts}")
+        return counts
+
+    @staticmethod
+    def _match_expression(query):
+        terms = []
+        for term in _TERM_RE.findall(query.casefold()):
+            if len(term) > 1 and term not in _STOPWORDS and term not in terms:
+                terms.append(term)
+        return " OR ".join(f'"{term}"' for term in terms)
+
+    def search(self, query, max_results):
+        expression = self._match_expression(query)
+        if not expression:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT path, title, heading, snippet(chunks, 3, '', '', ' … ', 48)
+                FROM chunks WHERE chunks MATCH ?
+                ORDER BY bm25(chunks, 0.0, 2.0, 2.0, 1.0) LIMIT ?
+                """,
+                (expression, max_results)
+            ).fetchall()
+        return [{"title": f"{title} › {heading}" if heading and heading != title else title,
+                 "body": snippet, "href": f"file://{path}"} for path, title, heading, snippet in rows]
+
+    def document_count(self):
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()
+        return count
+
+
+class MergedSearchProvider(SearchProvider):
+    """
+    Queries several providers in parallel and interleaves their results round-robin
+    (first result of each provider, then the second, ...), dropping repeated URLs. A
+    failing provider is logged and skipped; the search only fails if all of them fail.
+
+    `concurrency` is the number of searches callers run at once (the engine's
+    search_concurrency); the pool has a thread per provider for each of them, so
+    concurrent searches do not queue behind each other's provider calls.
+    """
+
+    name = "merged"
+
+    def __init__(self, providers, max_workers=None, concurrency=1):
+        self.providers = list(providers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(1, int(concurrency)) * max(1, len(self.providers)),
+            thread_name_prefix="search-merge")
+
+    def available(self):
+        return any(provider.available() for provider in self.providers)
+
+    def search(self, query, max_results, search_fn=None):
+        """`search_fn(provider, query, max_results)` lets the engine add caching per provider."""
+        search_fn = search_fn or (lambda provider, q, n: provider.search(q, n))
+        providers = [provider for provider in self.providers if provider.available()]
+        futures = [self._executor.submit(search_fn, provider, query, max_results) for provider in providers]
+
+        result_lists, errors = [], []
+        for provider, future in zip(providers, futures):
+            try:
+                result_lists.append(future.result())
+            except Exception as e:
+                logger.warning(f"Search provider '{provider.name}' failed for '{query}': {e}")
+                errors.append(e)
+        if errors and not result_lists:
+            raise errors[0]
+
+        merged, seen_urls = [], set()
+        for rank in range(max((len(results) for results in result_lists), default=0)):
+            for results in result_lists:
+                if rank < len(results):
+                    url = results[rank].get("href")
+                    if url and url in seen_urls:
+                        continue
+                    seen_urls.add(url)
+                    merged.append(results[rank])
+        return merged[:max_results]
+
+
+def default_search_provider(rate_limiter=None, concurrency=1):
+    """
+    DuckDuckGo, merged with a local corpus when LOCAL_SEARCH_DIRS lists directories
+    (separated by os.pathsep); the index lives at LOCAL_SEARCH_INDEX. `concurrency` is the
+    number of searches run at once, used to size the merged provider's pool.
+    """
+    web = DuckDuckGoProvider(rate_limiter=rate_limiter)
+    directories = [d for d in os.getenv("LOCAL_SEARCH_DIRS", "").split(os.pathsep) if d]
+    if not directories:
+        return web
+    return MergedSearchProvider([web, LocalCorpusProvider(directories=directories)], concurrency=concurrency)
@@ -0,0 +1,310 @@
+# src/assistant/semantic_cache.py
+"""
+Near-duplicate report cache: reuses a finished report when a new query is a rephrasing of
+one answered recently ("How do we stack up against Razorpay?" / "Compare Setu with
+Razorpay"), where the exact-match report cache only catches differences in case and
+punctuation.
+
+Queries are embedded locally as signed, hashed word and character n-gram vectors after
+folding common phrasings ("stack up against", "vs", "benchmark") and the profile's own
+company name onto shared tokens. Each profile has its own partition: a NumPy matrix of
+unit vectors searched with one matrix product, so a lookup costs the same single pass
+however many entries the partition holds. A match needs a cosine similarity of at least
+`threshold` and every meaningful word of either query (after folding) must appear in the
+other, give or take an inflection, so "... with Razorpay" never answers "... with
+Cashfree" and "north India" never answers "south India" however similar the rest of the
+wording is.
+"""
+import os
+import re
+import threading
+import time
+import zlib
+from collections import deque, namedtuple
+
+import numpy as np
+
+from . import metrics, utils
+from .cache import CacheStats
+
+DEFAULT_DIMENSIONS = 2048
+DEFAULT_THRESHOLD = 0.9
+
+SemanticMatch = namedtuple("SemanticMatch", ["report", "similarity", "query"])
+
+_STOPWORDS = frozenset("""
+    a an the and or of for in on at to with by from about into than as is are was were be been
+    do does did how what which who whom whose where when why can could should would will shall
+    i me my you your it its this that these those there please give tell show me get some any
+    analysis analyse analyze report overview""".split())
+_SELF_TOKEN = "self"
+_SELF_RE = re.compile(r"\b(?:we|us|our|ours|ourselves)\b")
+# Phrasings of the same request folded onto one token before hashing
+_PHRASES = (
+    (re.compile(r"\b(?:stacks? up|measures? up|fares?|compared?|compares|comparing|comparison|versus|vs|"
+                r"benchmark(?:s|ed|ing)?|against|head to head)\b"), "compare"),
+    (re.compile(r"\b(?:strengths?(?: and)? weaknesses?|swot)\b"), "swot"),
+    (re.compile(r"\b(?:trends?|trending|outlook)\b"), "trend"),
+    (re.compile(r"\b(?:competitors?|competition|rivals?|competitive landscape)\b"), "competitors"),
+)
+
+
+def _fold(text, aliases=()):
+    """Normalized query text with phrasings and self-references replaced by shared tokens."""
+    text = utils.normalize_query(text)
+    for alias in aliases:
+        alias = utils.normalize_query(alias)
+        if alias:
+            text = re.sub(rf"\b{re.escape(alias)}\b", _SELF_TOKEN, text)
+    text = _SELF_RE.sub(_SELF_TOKEN, text)
+    for pattern, token in _PHRASES:
+        text = pattern.sub(token, text)
+    return text
+
+
+def _singular(word):
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def _content_words(text, aliases=()):
+    """Distinct folded words that carry meaning (plurals folded too), in first-seen order."""
+    return list(dict.fromkeys(_singular(word) for word in _fold(text, aliases).split() if word not in _STOPWORDS))
+
+
+def _same_stem(a, b):
+    """True for the same word up to an inflection ("price"/"pricing", "india"/"indian")."""
+    if a == b:
+        return True
+    common = len(os.path.commonprefix([a, b]))
+    return common >= max(4, min(len(a), len(b)) - 1)
+
+
+def _covered(words, other):
+    """Whether every word in `words` appears in `other`."""
+    return all(any(_same_stem(word, candidate) for candidate in other) for word in words)
+
+
+class HashedNgramEmbedder:
+    """
+    Fixed-size vectors from the feature-hashing trick: every content word and every
+    character n-gram of it is hashed (crc32, so vectors are stable across processes) to
+    a signed bucket. Word and n-gram parts are normalized separately and mixed with
+    `word_weight`; n-grams let "pricing"/"price" or "trends"/"trend" still overlap.
+    """
+
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS, char_ngrams=(3, 4), word_weight=0.75):
+        self.dimensions = int(dimensions)
+        self.char_ngrams = tuple(char_ngrams)
+        self.word_weight = word_weight
+
+    def _add(self, vector, feature, weight=1.0):
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[(h >> 1) % self.dimensions] += weight if h & 1 else -weight
+
+    def embed(self, text, aliases=()):
+        """Unit-length float32 vector for `text`; all zeros if it has no content words."""
+        words = np.zeros(self.dimensions, dtype=np.float32)
+        grams = np.zeros(self.dimensions, dtype=np.float32)
+        for word in _content_words(text, aliases):
+            self._add(words, "w:" + word)
+            padded = f"<{word}>"
+            for n in self.char_ngrams:
+                for i in range(max(1, len(padded) - n + 1)):
+                    self._add(grams, "c:" + padded[i:i + n])
+        vector = self.word_weight * _unit(words) + (1.0 - self.word_weight) * _unit(grams)
+        return _unit(vector)
+
+    def embed_many(self, texts, aliases=()):
+        """Stacked embeddings, one row per text."""
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for i, text in enumerate(texts):
+            matrix[i] = self.embed(text, aliases)
+        return matrix
+
+
+def _unit(vector):
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class _Entry:
+    __slots__ = ("query", "report", "words", "expires_at", "last_used")
+
+    def __init__(self, query, report, words, expires_at):
+        self.query = query
+        self.report = report
+        self.words = words
+        self.expires_at = expires_at
+        self.last_used = time.monotonic()
+
+
+class _Partition:
+    """One profile's entries; row i of `vectors` is the embedding of `entries[i]`."""
+
+    def __init__(self, dimensions, capacity=16):
+        self.vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.entries = []
+
+    def append(self, vector, entry):
+        if len(self.entries) == len(self.vectors):
+            grown = np.zeros((2 * len(self.vectors), self.vectors.shape[1]), dtype=np.float32)
+            grown[:len(self.entries)] = self.vectors
+            self.vectors = grown
+        self.vectors[len(self.entries)] = vector
+        self.entries.append(entry)
+
+    def remove(self, index):
+        """Drops row `index` by moving the last row into its place."""
+        last = len(self.entries) - 1
+        if index != last:
+            self.vectors[index] = self.vectors[last]
+            self.entries[index] = self.entries[last]
+        self.vectors[last] = 0.0
+        self.entries.pop()
+
+    def purge_expired(self, now):
+        expired = [i for i, entry in enumerate(self.entries) if entry.expires_at <= now]
+        for index in reversed(expired): # Highest first: the row moved into each gap was already checked
+            self.remove(index)
+        return len(expired)
+
+
+class SemanticCache:
+    """
+    Reports keyed by query meaning, partitioned by profile (use its fingerprint as
+    `partition`). Entries expire after `ttl` seconds; past `max_entries` per partition
+    the least recently used entry is evicted.
+
+    Thread-safe. `snapshot()` is CacheStats-compatible for metrics.register_cache and adds
+    the mean/median/p90 of recent best-match similarities.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, ttl=3600, max_entries=512, embedder=None, stats=None, history=1000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max(1, int(max_entries))
+        self.embedder = embedder or HashedNgramEmbedder()
+        self.stats = stats or CacheStats()
+        self._partitions = {}
+        self._similarities = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def lookup(self, query, partition="", aliases=()):
+        """The SemanticMatch for the closest cached query, or None below the threshold."""
+        return self.lookup_many([query], partition, aliases)[0]
+
+    def lookup_many(self, queries, partition="", aliases=()):
+        """Batched lookup: one matrix product scores every query against every cached entry."""
+        if not queries:
+            return []
+        vectors = self.embedder.embed_many(queries, aliases)
+        results = []
+        now = time.time()
+        with self._lock:
+            part = self._partitions.get(partition)
+            if part is not None:
+                expired = part.purge_expired(now)
+                if expired:
+                    self.stats.record("evictions", expired)
+            if part is None or not part.entries:
+                scores = np.zeros((len(queries), 0), dtype=np.float32)
+            else:
+                scores = vectors @ part.vectors[:len(part.entries)].T
+            for i, query in enumerate(queries):
+                match, best = self._best_match(part, scores[i], query, aliases)
+                self._similarities.append(best)
+                metrics.SEMANTIC_SIMILARITY.labels("hit" if match else "miss").observe(best)
+                self.stats.record("hits" if match else "misses")
+                results.append(match)
+        return results
+
+    def _best_match(self, part, row, query, aliases):
+        """(SemanticMatch or None, best similarity seen) for one query's row of scores."""
+        if not len(row):
+            return None, 0.0
+        best = min(1.0, float(row.max())) # float32 rounding can put identical vectors just above 1
+        candidates = np.flatnonzero(row >= self.threshold)
+        if not len(candidates):
+            return None, best
+        words = frozenset(_content_words(query, aliases))
+        for index in candidates[np.argsort(-row[candidates])]:
+            entry = part.entries[index]
+            # A word only one query has (a competitor, a region, a year) means a different question
+            if _covered(words, entry.words) and _covered(entry.words, words):
+                entry.last_used = time.monotonic()
+                return SemanticMatch(entry.report, min(1.0, float(row[index])), entry.query), best
+        return None, best
+
+    def add(self, query, report, partition="", aliases=(), ttl=None):
+        """Caches `report` for `query`; replaces an entry for the same (normalized) query."""
+        vector = self.embedder.embed(query, aliases)
+        if not vector.any():
+            return
+        normalized = utils.normalize_query(query)
+        entry = _Entry(query, report, frozenset(_content_words(query, aliases)),
+                       time.time() + (self.ttl if ttl is None else ttl))
+        with self._lock:
+            part = self._partitions.get(partition)
+            if part is None:
+                part = self._partitions[partition] = _Partition(vector.shape[0])
+            for index, existing in enumerate(part.entries):
+                if utils.normalize_query(existing.query) == normalized:
+                    part.remove(index)
+                    break
+            part.append(vector, entry)
+            self.stats.record("sets")
+            if len(part.entries) > self.max_entries:
+                expired = part.purge_expired(time.time())
+                if len(part.entries) > self.max_entries:
+                    oldest = min(range(len(part.entries)), key=lambda i: part.entries[i].last_used)
+                    part.remove(oldest)
+                    expired += 1
+                self.stats.record("evictions", expired)
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+            self._similarities.clear()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(part.entries) for part in self._partitions.values())
+
+    def similarity_scores(self):
+        """Best-match similarities of recent lookups, oldest first (0.0 when nothing was cached)."""
+        with self._lock:
+            return list(self._similarities)
+
+    def snapshot(self):
+        counts = self.stats.snapshot()
+        scores = self.similarity_scores()
+        counts["entries"] = len(self)
+        counts["threshold"] = self.threshold
+        counts["similarity_mean"] = round(sum(scores) / len(scores), 4) if scores else 0.0
+        counts["similarity_p50"] = round(utils.percentile(scores, 50), 4)
+        counts["similarity_p90"] = round(utils.percentile(scores, 90), 4)
+        return counts
+
+    def lookup_report(self, query, business_profile):
+        """lookup() in the profile's partition, treating its company name as "we"."""
+        return self.lookup(query, utils.profile_fingerprint(business_profile), _aliases(business_profile))
+
+    def add_report(self, query, report, business_profile):
+        self.add(query, report, utils.profile_fingerprint(business_profile), _aliases(business_profile))
+
+
+def _aliases(business_profile):
+    name = business_profile.get("company_name")
+    return (name,) if name else ()
+
+
+def from_env(ttl):
+    """
+    The web apps' cache, off unless SEMANTIC_CACHE=1 (returns None otherwise);
+    SEMANTIC_CACHE_THRESHOLD and SEMANTIC_CACHE_SIZE (entries per profile) tune it. Entries
+    live as long as `ttl`.
+    """
+    if os.getenv("SEMANTIC_CACHE", "0") != "1":
+        return None
+    return SemanticCache(threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", str(DEFAULT_THRESHOLD))),
+                         ttl=ttl, max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "512")))
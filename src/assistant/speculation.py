@@ -0,0 +1,106 @@
+# src/assistant/speculation.py
+"""
+Cheap, local guesses at the searches a query will need, so a first wave of searches can
+run while the LLM query analysis is still in flight (see QueryEngine speculative mode).
+"""
+import datetime
+import re
+
+from . import utils
+
+# Words that start sentences or name generic concepts rather than companies
+_NON_ENTITY_WORDS = {
+    "a", "an", "the", "how", "what", "which", "who", "why", "when", "where", "is", "are", "do", "does",
+    "can", "should", "we", "our", "us", "i", "my", "compare", "comparison", "analyze", "analyse",
+    "analysis", "swot", "trend", "trends", "market", "give", "provide", "show", "tell", "vs", "versus",
+    "and", "or", "with", "against", "for", "in", "of", "on", "to", "next", "last", "this", "india",
+    "indian", "api", "apis", "upi", "kyc", "ai", "q1", "q2", "q3", "q4",
+}
+
+# Query keywords mapped to the kind of search they call for
+_INTENT_KEYWORDS = {
+    "competitive": ("compare", "comparison", "competitor", "competitors", "versus", "vs", "against", "stack up", "rival"),
+    "trend": ("trend", "trends", "forecast", "future", "outlook", "next year", "emerging"),
+    "financial": ("revenue", "profit", "funding", "valuation", "financial", "margin", "ebitda", "cash flow"),
+    "marketing": ("marketing", "campaign", "brand", "go-to-market", "gtm", "positioning", "channel"),
+}
+
+_CAPITALIZED_RUN_RE = re.compile(r"\b([A-Z][\w&.-]*(?:\s+[A-Z][\w&.-]*)*)")
+
+
+def extract_competitors(query, business_profile):
+    """
+    Competitor names mentioned in the query: known competitors from the business profile
+    first, then capitalized names that are not common words or our own company.
+    """
+    lowered = query.casefold()
+    company = business_profile.get("company_name", "")
+    found = [name for name in business_profile.get("known_competitors", []) if name.casefold() in lowered]
+
+    for match in _CAPITALIZED_RUN_RE.finditer(query):
+        words = [w for w in match.group(1).split() if w.casefold().strip(".") not in _NON_ENTITY_WORDS]
+        name = " ".join(words).strip(".")
+        if not name or name.casefold() == company.casefold():
+            continue
+        if any(name.casefold() in known.casefold() or known.casefold() in name.casefold() for known in found):
+            continue
+        found.append(name)
+    return found
+
+
+def detect_intents(query):
+    """Coarse intents (competitive, trend, financial, marketing) signalled by query keywords."""
+    lowered = f" {utils.normalize_query(query)} "
+    return [intent for intent, keywords in _INTENT_KEYWORDS.items()
+            if any(f" {keyword} " in lowered for keyword in keywords)]
+
+
+def extract_speculative_searches(query, business_profile, max_searches=4):
+    """
+    Builds a small first wave of search queries from the query text and the business
+    profile alone, without calling the LLM. Returns at most `max_searches` strings.
+    """
+    year = datetime.date.today().year
+    company = business_profile.get("company_name", "")
+    industry = business_profile.get("industry", "")
+    competitors = extract_competitors(query, business_profile)
+    intents = detect_intents(query)
+
+    searches = []
+    for competitor in competitors:
+        searches.append(f"{competitor} latest news {year}")
+        if "financial" in intents:
+            searches.append(f"{competitor} revenue funding {year}")
+        elif "marketing" in intents:
+            searches.append(f"{competitor} marketing strategy {year}")
+        else:
+            searches.append(f"{competitor} products pricing {year}")
+    if competitors and company:
+        searches.append(f"{company} vs {' vs '.join(competitors[:2])}")
+    if "trend" in intents or not competitors:
+        searches.append(f"{industry} market trends {year}")
+    if company:
+        searches.append(f"{company} latest news {year}")
+
+    unique = []
+    seen = set()
+    for search in searches:
+        key = utils.normalize_query(search)
+        if key not in seen:
+            seen.add(key)
+            unique.append(search)
+    return unique[:max_searches]
+
+
+def searches_match(first, second, threshold=0.75):
+    """
+    True when two search strings ask for the same thing: identical after normalization,
+    or with a token-set Jaccard similarity of at least `threshold` (word order ignored).
+    """
+    first_tokens = set(utils.normalize_query(first).split())
+    second_tokens = set(utils.normalize_query(second).split())
+    if not first_tokens or not second_tokens:
+        return False
+    if first_tokens == second_tokens:
+        return True
+    return len(first_tokens & second_tokens) / len(first_tokens | second_tokens) >= threshold
@@ -0,0 +1,38 @@
+# src/assistant/startup.py
+"""
+Startup profiling for the CLI (`--profile-startup`): wall time of each startup phase and
+the modules each phase imported, grouped by top-level package, so slow imports and eager
+client initialization are easy to spot. For per-module detail use `python -X importtime`.
+"""
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.phases = [] # (name, seconds, newly imported module names)
+
+    @contextmanager
+    def phase(self, name):
+        before = set(sys.modules)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started, sorted(set(sys.modules) - before)))
+
+    def record(self, name, seconds, modules=()):
+        """Adds a phase measured elsewhere (e.g. the Gemini SDK setup on first use)."""
+        self.phases.append((name, seconds, list(modules)))
+
+    def report(self, top_packages=4):
+        lines = ["--- Startup profile ---"]
+        for name, seconds, modules in self.phases:
+            packages = Counter(module.split(".")[0] for module in modules)
+            heaviest = ", ".join(f"{package} ({count})" for package, count in packages.most_common(top_packages))
+            lines.append(f"{name:34} {seconds * 1000:9.1f} ms  {len(modules):5} modules  {heaviest}")
+        lines.append(f"{'total since start':34} {(time.perf_counter() - self.started) * 1000:9.1f} ms")
+        return "\n".join(lines)
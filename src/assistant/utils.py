@@ -0,0 +1,82 @@
+# src/assistant/utils.py
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import unicodedata
+
+# Anything that is not a word character, whitespace or a symbol that changes meaning in queries
+_PUNCTUATION_RE = re.compile(r"[^\w\s&+%$#]")
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket that spaces out operations shared by several workers.
+    `rate` is the sustained number of operations per second, `burst` how many may
+    start back-to-back before callers have to wait. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until the caller may proceed. Returns the time spent waiting (seconds)."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            # Reserve a token even if it is not there yet; callers queue up in arrival order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def normalize_query(query):
+    """
+    Canonical form of a query for cache keys: case-folded, punctuation stripped
+    and whitespace collapsed, so trivially different spellings share an entry.
+    """
+    text = unicodedata.normalize("NFKC", str(query)).casefold()
+    text = _PUNCTUATION_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+def profile_fingerprint(business_profile):
+    """Short, stable hash of a business profile, used to keep cache entries per profile."""
+    precomputed = getattr(business_profile, "fingerprint", None) # profiles.BusinessProfile
+    if precomputed:
+        return precomputed
+    serialized = json.dumps(business_profile, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:16]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (pct in 0-100) of a list of numbers; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+_env_loaded = False
+
+
+def load_env():
+    """Loads `.env` into the environment, once per process, when configuration is first needed."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    from dotenv import load_dotenv
+    load_dotenv()
+    _env_loaded = True
@@ -1,8 +1,15 @@
 # src/backend/app.py
-from flask import Flask, request, render_template, jsonify, Response
+from flask import Flask, request, render_template, jsonify, Response, stream_with_context
 from ..assistant.query_engine import QueryEngine
+from ..assistant.cache import SingleFlight, TTLCache
+from ..assistant.report_store import ReportStore
+from ..assistant.profiles import UnknownProfileError
+from ..assistant.jobs import FAILED, SUCCEEDED, InProcessJobQueue, JobManager, JobQueueFull
+from ..assistant import metrics, utils, resilience, semantic_cache as semantic
+import json
 import logging
 import os
+import sqlite3
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,6 +28,106 @@ except Exception as e:
     logging.error(f"Failed to initialize Query Engine: {e}", exc_info=True)
     query_engine = None # Handle this case in routes
 
+# Completed reports are reused for identical queries; concurrent identical queries share one run
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", "900"))
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "256"))
+report_cache = TTLCache(max_entries=REPORT_CACHE_SIZE, default_ttl=REPORT_CACHE_TTL)
+inflight_reports = SingleFlight()
+metrics.register_cache("report", report_cache.stats.snapshot)
+# Rephrasings of recently answered queries are served from a similarity index over them
+semantic_cache = semantic.from_env(ttl=REPORT_CACHE_TTL)
+if semantic_cache is not None:
+    metrics.register_cache("semantic", semantic_cache.snapshot)
+
+# Finished reports are kept on disk so they can be downloaded by ID and listed later
+report_store = ReportStore(max_reports=int(os.getenv("REPORT_STORE_MAX", "5000")))
+
+
+def _report_cache_key(query):
+    return (utils.normalize_query(query), utils.profile_fingerprint(query_engine.business_profile))
+
+
+def _semantic_lookup(query):
+    """The cached report of a near-duplicate query for the active profile, or None."""
+    if semantic_cache is None:
+        return None
+    match = semantic_cache.lookup_report(query, query_engine.business_profile)
+    if match is not None:
+        logging.info(f"Semantic cache hit ({match.similarity:.3f}) for query '{query}' via '{match.query}'")
+        return match.report
+    return None
+
+
+def _cache_report(key, query, report):
+    if QueryEngine.is_cacheable_report(report):
+        report_cache.set(key, report)
+        if semantic_cache is not None:
+            semantic_cache.add_report(query, report, query_engine.business_profile)
+
+
+def _get_report(query, progress_callback=None):
+    """Returns `(report, cache_status)` where cache_status is HIT, SEMANTIC, MISS or COALESCED."""
+    key = _report_cache_key(query)
+    cached = report_cache.get(key)
+    if cached is not None:
+        report_cache.stats.record("hits")
+        return cached, "HIT"
+    report_cache.stats.record("misses")
+    similar = _semantic_lookup(query)
+    if similar is not None:
+        return similar, "SEMANTIC"
+
+    def compute():
+        options = {"progress_callback": progress_callback} if progress_callback else {}
+        with metrics.IN_FLIGHT.labels("report").track_inprogress():
+            report = query_engine.process_query(query, **options)
+        _cache_report(key, query, report)
+        return report
+
+    report, shared = inflight_reports.do(key, compute)
+    return report, "COALESCED" if shared else "MISS"
+
+
+def _requested_profile():
+    """The `profile` form field or query parameter (None selects the default profile); raises UnknownProfileError."""
+    name = request.values.get('profile') or None
+    if name:
+        query_engine.profile_registry.get(name)
+    return name
+
+
+def _requested_profile_fingerprint():
+    """Fingerprint of the requested profile, which scopes the stored reports a request can see."""
+    with query_engine.use_profile(_requested_profile()):
+        return utils.profile_fingerprint(query_engine.business_profile)
+
+
+def _store_report(query, report):
+    """Saves a complete report to the report store; returns its ID, or None if it was not stored."""
+    if not QueryEngine.is_cacheable_report(report):
+        return None
+    profile = query_engine.business_profile
+    try:
+        return report_store.save(report, query, query_type=QueryEngine.report_query_type(report),
+                                 profile=getattr(profile, "name", None) or profile.get("company_name"),
+                                 profile_fingerprint=utils.profile_fingerprint(profile))
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"Could not store report for query '{query}': {e}")
+        return None
+
+def _run_report_job(job, progress):
+    """Job handler: runs the same cached, coalesced pipeline as /ask."""
+    with query_engine.use_profile(job.profile):
+        report, cache_status = _get_report(job.query, progress)
+        return {"response": report, "report_id": _store_report(job.query, report), "cache": cache_status}
+
+
+# Long-running reports can also be submitted as background jobs (POST /jobs)
+job_manager = JobManager(_run_report_job, workers=int(os.getenv("JOB_WORKERS", "4")),
+                         job_queue=InProcessJobQueue(max_size=int(os.getenv("JOB_QUEUE_SIZE", "100"))))
+metrics.JOB_QUEUE_DEPTH.set_function(lambda: job_manager.queue.qsize())
+
+
 @app.route('/')
 def index():
     return render_template('index.html') # Simple HTML form
@@ -34,18 +141,218 @@ def ask_assistant():
     if not query:
         return jsonify({"error": "Query cannot be empty."}), 400
 
+    try:
+        profile = _requested_profile()
+    except UnknownProfileError as e:
+        return jsonify({"error": f"Unknown profile: {e.args[0]}"}), 400
+
     try:
         logging.info(f"Received query via web UI: {query}")
-        response_text = query_engine.process_query(query)
+        with query_engine.use_profile(profile):
+            response_text, cache_status = _get_report(query)
+            report_id = _store_report(query, response_text)
+        logging.info(f"Report cache status for query: {cache_status}")
         # Return as JSON, assuming the frontend will handle Markdown rendering
-        return jsonify({"response": response_text})
+        response = jsonify({"response": response_text, "report_id": report_id})
+        response.headers["X-Cache"] = cache_status
+        return response
     except Exception as e:
         logging.error(f"Error processing query via web UI: {e}", exc_info=True)
         return jsonify({"error": f"An internal error occurred: {e}"}), 500
 
+def _sse_event(event, payload):
+    """Formats one Server-Sent Event; payloads are JSON so Markdown newlines survive the framing."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@app.route('/ask/stream', methods=['POST'])
+def ask_assistant_stream():
+    """
+    Server-Sent-Events variant of /ask. Emits `chunk` events with report text as it is
+    generated, then a `done` event carrying the stored report's ID. Cached reports are
+    sent as a single chunk.
+    """
+    if not query_engine:
+        return jsonify({"error": "Assistant initialization failed. Please check server logs."}), 500
+
+    query = request.form.get('query')
+    if not query:
+        return jsonify({"error": "Query cannot be empty."}), 400
+
+    try:
+        profile = _requested_profile()
+    except UnknownProfileError as e:
+        return jsonify({"error": f"Unknown profile: {e.args[0]}"}), 400
+
+    logging.info(f"Received streaming query via web UI: {query}")
+    with query_engine.use_profile(profile):
+        key = _report_cache_key(query)
+        cached = report_cache.get(key)
+        report_cache.stats.record("hits" if cached is not None else "misses")
+        cache_status = "HIT" if cached is not None else "MISS"
+        if cached is None:
+            cached = _semantic_lookup(query)
+            cache_status = "SEMANTIC" if cached is not None else "MISS"
+
+    def generate():
+        with query_engine.use_profile(profile):
+            yield from _stream_report()
+
+    def _stream_report():
+        if cached is not None:
+            yield _sse_event("chunk", {"text": cached})
+            yield _sse_event("done", {"cache": cache_status, "report_id": _store_report(query, cached)})
+            return
+        pieces = []
+        interrupted = False
+        try:
+            with metrics.IN_FLIGHT.labels("report").track_inprogress():
+                for piece in query_engine.process_query_stream(query):
+                    pieces.append(piece)
+                    interrupted = interrupted or QueryEngine.is_stream_interruption(piece)
+                    yield _sse_event("chunk", {"text": piece})
+        except Exception as e:
+            logging.error(f"Error streaming query via web UI: {e}", exc_info=True)
+            yield _sse_event("error", {"error": f"An internal error occurred: {e}"})
+            return
+        if interrupted: # A truncated report still ends with the footer; never reuse or store it
+            yield _sse_event("done", {"cache": cache_status, "report_id": None})
+            return
+        report = "".join(pieces)
+        _cache_report(key, query, report)
+        yield _sse_event("done", {"cache": cache_status, "report_id": _store_report(query, report)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Cache": cache_status})
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queues a report and returns its job ID at once (202); poll /jobs/<id> or subscribe to /jobs/<id>/events."""
+    if not query_engine:
+        return jsonify({"error": "Assistant initialization failed. Please check server logs."}), 500
+
+    query = request.form.get('query')
+    if not query:
+        return jsonify({"error": "Query cannot be empty."}), 400
+
+    try:
+        job = job_manager.submit(query, _requested_profile())
+    except UnknownProfileError as e:
+        return jsonify({"error": f"Unknown profile: {e.args[0]}"}), 400
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    response = jsonify({"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"})
+    response.status_code = 202
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return response
+
+
+@app.route('/profiles')
+def list_profiles():
+    """Names of the business profiles that /ask, /ask/stream and /jobs accept in their `profile` field."""
+    return jsonify({"profiles": query_engine.profile_registry.names() if query_engine else [],
+                    "default": query_engine.profile_registry.default_name if query_engine else None})
+
+
+@app.route('/jobs')
+def job_stats():
+    """Queue depth, worker utilization and job counts."""
+    return jsonify(job_manager.stats())
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job.to_dict(include_result=job.finished))
+
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Server-Sent Events for one job: a `status` event on every change (status, stage), then
+    `done` with the result or `error` with the failure.
+    """
+    if job_manager.get(job_id) is None:
+        return jsonify({"error": "Job not found."}), 404
+
+    def generate():
+        version = None
+        while True:
+            data, version = job_manager.wait_for_change(job_id, version, timeout=15)
+            if data is None:
+                yield _sse_event("error", {"error": "Job not found."})
+                return
+            if data["status"] == SUCCEEDED:
+                yield _sse_event("done", data)
+                return
+            if data["status"] == FAILED:
+                yield _sse_event("error", data)
+                return
+            yield _sse_event("status", data) # Also sent every 15 s as a keep-alive
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route('/download/<report_id>')
+def download_stored_report(report_id):
+    """
+    Streams a stored report as a Markdown attachment. The ID is content-derived, so it is
+    also a strong ETag: conditional GETs get a 304, and clients accepting gzip get the
+    stored bytes as they are. Only reports of the requested `profile` are served.
+    """
+    if not query_engine:
+        return jsonify({"error": "Assistant initialization failed. Please check server logs."}), 500
+    try:
+        fingerprint = _requested_profile_fingerprint()
+    except UnknownProfileError as e:
+        return jsonify({"error": f"Unknown profile: {e.args[0]}"}), 400
+    meta = report_store.get_metadata(report_id, profile_fingerprint=fingerprint)
+    if meta is None:
+        return jsonify({"error": "Report not found."}), 404
+
+    headers = {
+        "Content-Disposition": f"attachment; filename=business_insights_report_{report_id[:8]}.md",
+        "Cache-Control": "private, max-age=86400",
+        "Vary": "Accept-Encoding",
+    }
+    if report_id in request.if_none_match:
+        response = Response(status=304, headers=headers)
+    elif "gzip" in request.accept_encodings:
+        headers.update({"Content-Encoding": "gzip", "Content-Length": str(meta["compressed_size"])})
+        response = Response(report_store.iter_compressed(report_id), mimetype="text/markdown", headers=headers)
+    else:
+        headers["Content-Length"] = str(meta["size"])
+        response = Response(report_store.iter_text(report_id), mimetype="text/markdown", headers=headers)
+    response.set_etag(report_id)
+    return response
+
+
+@app.route('/reports')
+def list_reports():
+    """Past reports of the requested `profile`, newest first (`limit` <= 200, `offset` for paging)."""
+    if not query_engine:
+        return jsonify({"error": "Assistant initialization failed. Please check server logs."}), 500
+    try:
+        fingerprint = _requested_profile_fingerprint()
+    except UnknownProfileError as e:
+        return jsonify({"error": f"Unknown profile: {e.args[0]}"}), 400
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 200)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    return jsonify({"reports": report_store.list(limit=limit, offset=offset, profile_fingerprint=fingerprint),
+                    "total": report_store.count(profile_fingerprint=fingerprint)})
+
+
 @app.route('/download', methods=['POST'])
 def download_report():
-    # Assumes the frontend sends the generated report content back
+    # Kept for older clients that post the report back; the web UI uses /download/<report_id>
     content = request.form.get('content')
     if not content:
         return jsonify({"error": "No content provided for download."}), 400
@@ -58,6 +365,25 @@ def download_report():
                  "attachment; filename=business_insights_report.md"})
 
 
+@app.route('/health')
+def health():
+    # Shared resilience state of the Gemini client; "degraded" while the circuit breaker is not closed
+    breaker = resilience.gemini_circuit_breaker.snapshot()
+    status = "ok" if query_engine and breaker["state"] == resilience.CircuitBreaker.CLOSED else "degraded"
+    return jsonify({
+        "status": status,
+        "query_engine": query_engine is not None,
+        "gemini_circuit_breaker": breaker,
+        "gemini_retry_budget": resilience.gemini_retry_budget.snapshot(),
+    })
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint: stage latencies, Gemini tokens/retries, cache hit rates, in-flight gauges."""
+    body, content_type = metrics.render()
+    return Response(body, headers={"Content-Type": content_type})
+
 
 # Run the Flask app (for development)
 if __name__ == '__main__':
@@ -0,0 +1,312 @@
+# src/backend/asgi.py
+"""
+ASGI entry point serving the async QueryEngine pipeline. Many reports run concurrently
+on one event loop instead of pinning a worker thread each, e.g.:
+
+    uvicorn src.backend.asgi:app --workers 2
+
+Routes mirror the Flask app: GET / (web UI), POST /ask (JSON), POST /ask/stream (SSE),
+GET /download/<report_id> and GET /reports.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from urllib.parse import parse_qs
+
+from ..assistant.query_engine import QueryEngine
+from ..assistant.cache import AsyncSingleFlight, TTLCache
+from ..assistant.report_store import ReportStore
+from ..assistant.profiles import UnknownProfileError
+from ..assistant import metrics, utils, semantic_cache as semantic
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), '..', 'frontend', 'templates', 'index.html')
+MAX_BODY_BYTES = 64 * 1024
+
+try:
+    query_engine = QueryEngine()
+    logger.info("Query Engine initialized successfully for ASGI app.")
+except Exception as e:
+    logger.error(f"Failed to initialize Query Engine: {e}", exc_info=True)
+    query_engine = None # Handle this case in routes
+
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", "900"))
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "256"))
+report_cache = TTLCache(max_entries=REPORT_CACHE_SIZE, default_ttl=REPORT_CACHE_TTL)
+inflight_reports = AsyncSingleFlight()
+semantic_cache = semantic.from_env(ttl=REPORT_CACHE_TTL)
+if semantic_cache is not None:
+    metrics.register_cache("semantic", semantic_cache.snapshot)
+report_store = ReportStore(max_reports=int(os.getenv("REPORT_STORE_MAX", "5000")))
+
+
+def _report_cache_key(query):
+    return (utils.normalize_query(query), utils.profile_fingerprint(query_engine.business_profile))
+
+
+def _semantic_lookup(query):
+    """The cached report of a near-duplicate query, or None (a lookup is one small matrix product)."""
+    if semantic_cache is None:
+        return None
+    match = semantic_cache.lookup_report(query, query_engine.business_profile)
+    if match is not None:
+        logger.info(f"Semantic cache hit ({match.similarity:.3f}) for query '{query}' via '{match.query}'")
+        return match.report
+    return None
+
+
+def _cache_report(key, query, report):
+    if QueryEngine.is_cacheable_report(report):
+        report_cache.set(key, report)
+        if semantic_cache is not None:
+            semantic_cache.add_report(query, report, query_engine.business_profile)
+
+
+async def _store_report(query, report):
+    """Saves a complete report off the event loop; returns its ID, or None if it was not stored."""
+    if not QueryEngine.is_cacheable_report(report):
+        return None
+    profile = query_engine.business_profile
+    try:
+        return await asyncio.to_thread(report_store.save, report, query, QueryEngine.report_query_type(report),
+                                       getattr(profile, "name", None) or profile.get("company_name"),
+                                       utils.profile_fingerprint(profile))
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Could not store report for query '{query}': {e}")
+        return None
+
+
+async def _send_json(send, status, payload, headers=None):
+    body = json.dumps(payload).encode("utf-8")
+    response_headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    response_headers += [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    await send({"type": "http.response.start", "status": status, "headers": response_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_form(receive):
+    """Reads an application/x-www-form-urlencoded request body into a dict of single values."""
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError("Request body too large.")
+    return {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+
+
+async def _index(send):
+    with open(TEMPLATE_PATH, "rb") as f:
+        body = f.read()
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"text/html; charset=utf-8"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _ask(query, send):
+    key = _report_cache_key(query)
+    cached = report_cache.get(key)
+    if cached is not None:
+        report_cache.stats.record("hits")
+        await _send_json(send, 200, {"response": cached, "report_id": await _store_report(query, cached)}, {"X-Cache": "HIT"})
+        return
+    report_cache.stats.record("misses")
+    similar = _semantic_lookup(query)
+    if similar is not None:
+        await _send_json(send, 200, {"response": similar, "report_id": await _store_report(query, similar)}, {"X-Cache": "SEMANTIC"})
+        return
+
+    async def compute():
+        report = await query_engine.process_query_async(query)
+        _cache_report(key, query, report)
+        return report
+
+    report, shared = await inflight_reports.do(key, compute)
+    await _send_json(send, 200, {"response": report, "report_id": await _store_report(query, report)},
+                     {"X-Cache": "COALESCED" if shared else "MISS"})
+
+
+def _sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+
+
+async def _ask_stream(query, send):
+    key = _report_cache_key(query)
+    cached = report_cache.get(key)
+    report_cache.stats.record("hits" if cached is not None else "misses")
+    cache_status = "HIT" if cached is not None else "MISS"
+    if cached is None:
+        cached = _semantic_lookup(query)
+        cache_status = "SEMANTIC" if cached is not None else "MISS"
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"),
+                            (b"x-cache", cache_status.encode())]})
+
+    async def event(name, payload):
+        await send({"type": "http.response.body", "body": _sse_event(name, payload), "more_body": True})
+
+    if cached is not None:
+        await event("chunk", {"text": cached})
+        report = cached
+    else:
+        pieces = []
+        interrupted = False
+        try:
+            async for piece in query_engine.process_query_stream_async(query):
+                pieces.append(piece)
+                interrupted = interrupted or QueryEngine.is_stream_interruption(piece)
+                await event("chunk", {"text": piece})
+        except Exception as e:
+            logger.error(f"Error streaming query via ASGI app: {e}", exc_info=True)
+            await event("error", {"error": f"An internal error occurred: {e}"})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if interrupted: # A truncated report still ends with the footer; never reuse or store it
+            await event("done", {"cache": cache_status, "report_id": None})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        report = "".join(pieces)
+        _cache_report(key, query, report)
+    await event("done", {"cache": cache_status, "report_id": await _store_report(query, report)})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def _header(scope, name):
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def _profile_fingerprint(scope):
+    """Fingerprint of the profile named by the `profile` query parameter; raises UnknownProfileError."""
+    name = parse_qs(scope.get("query_string", b"").decode("utf-8")).get("profile", [""])[0] or None
+    with query_engine.use_profile(name):
+        return utils.profile_fingerprint(query_engine.business_profile)
+
+
+async def _download(scope, report_id, send):
+    """Streams a stored report of the requested profile; see download_stored_report in the Flask app."""
+    try:
+        fingerprint = _profile_fingerprint(scope)
+    except UnknownProfileError as e:
+        await _send_json(send, 400, {"error": f"Unknown profile: {e.args[0]}"})
+        return
+    meta = await asyncio.to_thread(report_store.get_metadata, report_id, fingerprint)
+    if meta is None:
+        await _send_json(send, 404, {"error": "Report not found."})
+        return
+
+    headers = [(b"etag", f'"{report_id}"'.encode()), (b"vary", b"Accept-Encoding"),
+               (b"cache-control", b"private, max-age=86400"),
+               (b"content-disposition", f"attachment; filename=business_insights_report_{report_id[:8]}.md".encode())]
+    if_none_match = _header(scope, b"if-none-match")
+    if if_none_match.strip() == "*" or report_id in [tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")]:
+        await send({"type": "http.response.start", "status": 304, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    if "gzip" in _header(scope, b"accept-encoding"):
+        chunks, size = report_store.iter_compressed(report_id), meta["compressed_size"]
+        headers.append((b"content-encoding", b"gzip"))
+    else:
+        chunks, size = report_store.iter_text(report_id), meta["size"]
+    headers += [(b"content-type", b"text/markdown; charset=utf-8"), (b"content-length", str(size).encode())]
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _list_reports(scope, send):
+    try:
+        fingerprint = _profile_fingerprint(scope)
+    except UnknownProfileError as e:
+        await _send_json(send, 400, {"error": f"Unknown profile: {e.args[0]}"})
+        return
+    params = parse_qs(scope.get("query_string", b"").decode("utf-8"))
+    try:
+        limit = min(max(int(params.get("limit", ["50"])[0]), 1), 200)
+        offset = max(int(params.get("offset", ["0"])[0]), 0)
+    except ValueError:
+        limit, offset = 50, 0
+    reports = await asyncio.to_thread(report_store.list, limit, offset, fingerprint)
+    total = await asyncio.to_thread(report_store.count, fingerprint)
+    await _send_json(send, 200, {"reports": reports, "total": total})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """Minimal ASGI application; no framework dependency beyond an ASGI server."""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"]
+    if path == "/" and method == "GET":
+        await _index(send)
+        return
+    if method == "GET" and (path.startswith("/download/") or path == "/reports") and not query_engine:
+        await _send_json(send, 500, {"error": "Assistant initialization failed. Please check server logs."})
+        return
+    if method == "GET" and path.startswith("/download/"):
+        await _download(scope, path[len("/download/"):], send)
+        return
+    if method == "GET" and path == "/reports":
+        await _list_reports(scope, send)
+        return
+    if path not in ("/ask", "/ask/stream"):
+        await _send_json(send, 404, {"error": "Not found."})
+        return
+    if method != "POST":
+        await _send_json(send, 405, {"error": "Method not allowed."})
+        return
+    if not query_engine:
+        await _send_json(send, 500, {"error": "Assistant initialization failed. Please check server logs."})
+        return
+
+    try:
+        form = await _read_form(receive)
+    except (ValueError, UnicodeDecodeError) as e:
+        await _send_json(send, 400, {"error": str(e)})
+        return
+    query = form.get("query")
+    if not query:
+        await _send_json(send, 400, {"error": "Query cannot be empty."})
+        return
+    try:
+        profile_scope = query_engine.use_profile(form.get("profile") or None)
+    except UnknownProfileError as e:
+        await _send_json(send, 400, {"error": f"Unknown profile: {e.args[0]}"})
+        return
+
+    logger.info(f"Received query via ASGI app ({path}): {query}")
+    with profile_scope: # The profile is context-local, so it only applies to this request's awaits
+        if path == "/ask/stream":
+            await _ask_stream(query, send)
+            return
+        try:
+            await _ask(query, send)
+        except Exception as e:
+            logger.error(f"Error processing query via ASGI app: {e}", exc_info=True)
+            await _send_json(send, 500, {"error": f"An internal error occurred: {e}"})
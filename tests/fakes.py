@@ -0,0 +1,205 @@
+# tests/fakes.py
+"""
+Deterministic stand-ins for the Gemini client and DuckDuckGo, with configurable latency
+distributions, failure rates and response sizes. Used by the offline benchmarks
+(benchmarks/run.py) and by tests that need realistic, not just mocked, backends.
+"""
+import asyncio
+import hashlib
+import math
+import random
+import threading
+import time
+
+QUERY_TYPES = ["competitive_analysis", "trend_forecasting", "swot_analysis",
+               "marketing_strategy", "financial_analysis", "generic_business_question"]
+
+_FILLER_WORDS = ("market", "growth", "pricing", "customers", "platform", "payments", "api", "strategy",
+                 "revenue", "compliance", "partners", "onboarding", "adoption", "margin", "risk", "scale")
+
+
+def _stable_seed(*parts):
+    return int.from_bytes(hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).digest()[:8], "big")
+
+
+class Latency:
+    """
+    Log-normal latency around `median` seconds (`sigma` controls the tail), scaled by
+    `scale`. A median of 0 means no delay. Samples come from a seeded, locked RNG.
+    """
+
+    def __init__(self, median, sigma=0.3, scale=1.0, seed=0):
+        self.median = median
+        self.sigma = sigma
+        self.scale = scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        if self.median <= 0:
+            return 0.0
+        with self._lock:
+            return self.median * self.scale * math.exp(self._rng.gauss(0.0, self.sigma))
+
+
+def filler_text(seed, chars):
+    """Deterministic pseudo-prose of roughly `chars` characters."""
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < chars:
+        word = rng.choice(_FILLER_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:chars]
+
+
+# Response latency is modeled as decoding time: proportional to the requested output budget
+FULL_OUTPUT_TOKENS = 8192
+
+
+def _decode_share(max_output_tokens):
+    return min(1.0, max_output_tokens / FULL_OUTPUT_TOKENS)
+
+
+class FakeGeminiClient:
+    """
+    Drop-in replacement for GeminiClient. Analyses plan `searches_per_query` searches that
+    are unique per query, so caches behave as they would for distinct user questions.
+    Failures are returned the way GeminiClient reports them ({"error": ...} / "Error: ...").
+    """
+
+    generative_model_name = "fake-gemini"
+    analysis_model_name = "fake-gemini"
+
+    def __init__(self, analysis_latency=0.05, response_latency=0.3, first_chunk_fraction=0.2,
+                 failure_rate=0.0, response_chars=6000, chunk_chars=400, searches_per_query=10,
+                 sigma=0.3, latency_scale=1.0, seed=0):
+        self.analysis_latency = Latency(analysis_latency, sigma, latency_scale, seed)
+        self.response_latency = Latency(response_latency, sigma, latency_scale, seed + 1)
+        self.first_chunk_fraction = first_chunk_fraction
+        self.failure_rate = failure_rate
+        self.response_chars = response_chars
+        self.chunk_chars = chunk_chars
+        self.searches_per_query = searches_per_query
+        self._rng = random.Random(seed + 2)
+        self._lock = threading.Lock()
+        self.calls = {"analysis": 0, "response": 0, "stream": 0}
+
+    def _count(self, kind):
+        with self._lock:
+            self.calls[kind] += 1
+            return self._rng.random() < self.failure_rate
+
+    def _analysis(self, prompt, failed):
+        if failed:
+            return {"error": "Error: Fake Gemini analysis failure."}
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        return {
+            "query_type": QUERY_TYPES[int(digest, 16) % len(QUERY_TYPES)],
+            "entities": {"competitors": ["Razorpay", "Decentro"], "focus_areas": ["pricing", "growth"],
+                         "industry": "Financial Services", "original_query": f"query {digest}"},
+            "required_searches": [f"fintech {_FILLER_WORDS[i % len(_FILLER_WORDS)]} {digest} {i}"
+                                  for i in range(self.searches_per_query)],
+        }
+
+    def _response(self, prompt):
+        return "## Executive Summary\n\n" + filler_text(_stable_seed("response", prompt), self.response_chars)
+
+    def generate_analysis(self, prompt, **kwargs):
+        failed = self._count("analysis")
+        time.sleep(self.analysis_latency.sample())
+        return self._analysis(prompt, failed)
+
+    async def generate_analysis_async(self, prompt, **kwargs):
+        failed = self._count("analysis")
+        await asyncio.sleep(self.analysis_latency.sample())
+        return self._analysis(prompt, failed)
+
+    def generate_response(self, prompt, max_output_tokens=FULL_OUTPUT_TOKENS, **kwargs):
+        failed = self._count("response")
+        time.sleep(self.response_latency.sample() * _decode_share(max_output_tokens))
+        return "Error: Fake Gemini generation failure." if failed else self._response(prompt)
+
+    async def generate_response_async(self, prompt, max_output_tokens=FULL_OUTPUT_TOKENS, **kwargs):
+        failed = self._count("response")
+        await asyncio.sleep(self.response_latency.sample() * _decode_share(max_output_tokens))
+        return "Error: Fake Gemini generation failure." if failed else self._response(prompt)
+
+    def _stream_plan(self, prompt, failed, max_output_tokens=FULL_OUTPUT_TOKENS):
+        """[(delay_before_chunk, text)]: first chunk after a share of the total latency, the rest spread evenly."""
+        total = self.response_latency.sample() * _decode_share(max_output_tokens)
+        if failed:
+            return [(total, "Error: Fake Gemini generation failure.")]
+        text = self._response(prompt)
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+        first = total * self.first_chunk_fraction
+        rest = (total - first) / max(1, len(chunks) - 1)
+        return [(first if i == 0 else rest, chunk) for i, chunk in enumerate(chunks)]
+
+    def generate_response_stream(self, prompt, max_output_tokens=FULL_OUTPUT_TOKENS, **kwargs):
+        for delay, chunk in self._stream_plan(prompt, self._count("stream"), max_output_tokens):
+            time.sleep(delay)
+            yield chunk
+
+    async def generate_response_stream_async(self, prompt, max_output_tokens=FULL_OUTPUT_TOKENS, **kwargs):
+        for delay, chunk in self._stream_plan(prompt, self._count("stream"), max_output_tokens):
+            await asyncio.sleep(delay)
+            yield chunk
+
+
+class _FakeDDGSSession:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def text(self, query, max_results=3):
+        return self._backend.search(query, max_results)
+
+
+class FakeDDGS:
+    """
+    Stands in for the `DDGS` class: pass an instance as DuckDuckGoProvider(ddgs_factory=...).
+    Results are deterministic per query; `duplicate_rate` of them are syndicated copies from a
+    shared pool (same URL or same story), so deduplication has something to do.
+    """
+
+    def __init__(self, latency=0.1, failure_rate=0.0, snippet_chars=240, duplicate_rate=0.3,
+                 sigma=0.3, latency_scale=1.0, seed=0):
+        self.latency = Latency(latency, sigma, latency_scale, seed)
+        self.failure_rate = failure_rate
+        self.snippet_chars = snippet_chars
+        self.duplicate_rate = duplicate_rate
+        self.seed = seed
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        return _FakeDDGSSession(self)
+
+    def search(self, query, max_results):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency.sample())
+        rng = random.Random(_stable_seed(self.seed, query))
+        if rng.random() < self.failure_rate:
+            raise RuntimeError(f"Fake DDGS failure for '{query}'")
+
+        results = []
+        for i in range(max_results):
+            if rng.random() < self.duplicate_rate:
+                story = rng.randrange(8) # Syndicated stories shared across queries
+                results.append({"title": f"Fintech story {story}",
+                                "body": filler_text(_stable_seed("story", story), self.snippet_chars),
+                                "href": f"https://wire.example.com/story/{story}"})
+            else:
+                slug = hashlib.sha1(f"{query}|{i}".encode("utf-8")).hexdigest()[:10]
+                results.append({"title": f"{query} - result {i + 1}",
+                                "body": filler_text(_stable_seed(query, i), self.snippet_chars),
+                                "href": f"https://news.example.com/{slug}"})
+        return results
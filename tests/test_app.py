@@ -0,0 +1,228 @@
+# tests/test_app.py
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.assistant.gemini_integration import GeminiClient
+from src.assistant.query_engine import REPORT_FOOTER
+from src.assistant.report_store import ReportStore
+from src.assistant.resilience import CircuitBreaker, RetryBudget
+from src.assistant.semantic_cache import SemanticCache
+from src.backend import app as app_module
+
+REPORT = "# AI Business Insight Report: Competitive Analysis\n\nReport body"
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    """Flask test client with a mocked QueryEngine, empty report caches and a fresh report store."""
+    mock_engine = MagicMock()
+    mock_engine.business_profile = {"company_name": "Setu"}
+    monkeypatch.setattr(app_module, "query_engine", mock_engine)
+    monkeypatch.setattr(app_module, "report_store", ReportStore(directory=str(tmp_path / "reports")))
+    app_module.report_cache.clear()
+    monkeypatch.setattr(app_module, "semantic_cache", None) # Opt-in; tests that need it enable their own
+    app_module.app.config["TESTING"] = True
+    return app_module.app.test_client()
+
+
+def test_ask_serves_repeat_queries_from_report_cache(client):
+    """The second identical (normalized) query is a cache hit and skips the pipeline."""
+    app_module.query_engine.process_query.return_value = REPORT
+
+    first = client.post("/ask", data={"query": "Compare us to Razorpay"})
+    second = client.post("/ask", data={"query": "compare us to razorpay?"})
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.get_json()["response"] == REPORT
+    app_module.query_engine.process_query.assert_called_once_with("Compare us to Razorpay")
+
+
+def test_ask_serves_rephrased_queries_from_semantic_cache(client, monkeypatch):
+    """A rephrasing of an answered query reuses its report; a different competitor does not."""
+    monkeypatch.setattr(app_module, "semantic_cache", SemanticCache())
+    app_module.query_engine.process_query.return_value = REPORT
+
+    client.post("/ask", data={"query": "How do we stack up against Razorpay?"})
+    rephrased = client.post("/ask", data={"query": "Compare Setu with Razorpay"})
+    other = client.post("/ask", data={"query": "Compare Setu with Cashfree"})
+
+    assert rephrased.headers["X-Cache"] == "SEMANTIC"
+    assert rephrased.get_json()["response"] == REPORT
+    assert other.headers["X-Cache"] == "MISS"
+    assert app_module.query_engine.process_query.call_count == 2
+    assert app_module.semantic_cache.snapshot()["hits"] == 1
+
+
+def test_ask_does_not_cache_error_reports(client):
+    """Failed generations are returned but recomputed on the next request."""
+    app_module.query_engine.process_query.return_value = "An error occurred during response generation:\nError: quota"
+
+    client.post("/ask", data={"query": "Trends in UPI"})
+    response = client.post("/ask", data={"query": "Trends in UPI"})
+
+    assert response.headers["X-Cache"] == "MISS"
+    assert app_module.query_engine.process_query.call_count == 2
+
+
+def test_ask_coalesces_concurrent_identical_queries(client):
+    """Concurrent identical queries wait on a single process_query run."""
+    def slow_process_query(query):
+        time.sleep(0.3)
+        return REPORT
+
+    app_module.query_engine.process_query.side_effect = slow_process_query
+    statuses = []
+
+    def ask():
+        response = app_module.app.test_client().post("/ask", data={"query": "SWOT for Setu"})
+        statuses.append(response.headers["X-Cache"])
+
+    threads = [threading.Thread(target=ask) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert app_module.query_engine.process_query.call_count == 1
+    assert sorted(statuses) == ["COALESCED", "COALESCED", "COALESCED", "MISS"]
+
+
+def test_ask_stream_emits_chunks_and_caches_report(client):
+    """The SSE endpoint streams chunk events, then serves the cached report on repeat."""
+    app_module.query_engine.process_query_stream.return_value = iter(["# AI Business Insight Report: Generic\n\n", "Body"])
+
+    response = client.post("/ask/stream", data={"query": "What is UPI?"})
+    body = response.get_data(as_text=True)
+    assert response.mimetype == "text/event-stream"
+    assert body.count("event: chunk") == 2
+    done = body.rstrip().rsplit("event: done\ndata: ", 1)[1]
+    assert json.loads(done)["cache"] == "MISS" and json.loads(done)["report_id"]
+
+    repeat = client.post("/ask/stream", data={"query": "What is UPI?"})
+    assert repeat.headers["X-Cache"] == "HIT"
+    assert "Body" in repeat.get_data(as_text=True)
+    app_module.query_engine.process_query_stream.assert_called_once()
+
+
+def test_ask_stream_does_not_keep_reports_cut_off_mid_stream(client):
+    """A generation stream that breaks mid-report is shown but neither cached nor stored."""
+    def broken_stream():
+        chunk = MagicMock()
+        chunk.text = "Partial "
+        yield chunk
+        raise ConnectionResetError("connection reset")
+
+    gemini = GeminiClient(retry_budget=RetryBudget(), circuit_breaker=CircuitBreaker("test"))
+    gemini.generative_model = MagicMock()
+    gemini.generative_model.generate_content.return_value = broken_stream()
+
+    def process_query_stream(query):
+        yield "# AI Business Insight Report: Generic\n\n"
+        yield from gemini.generate_response_stream(query)
+        yield REPORT_FOOTER
+
+    app_module.query_engine.process_query_stream.side_effect = process_query_stream
+    body = client.post("/ask/stream", data={"query": "What is UPI?"}).get_data(as_text=True)
+    assert "Response stream interrupted" in body
+    done = body.rstrip().rsplit("event: done\ndata: ", 1)[1]
+    assert json.loads(done)["report_id"] is None
+    assert len(app_module.report_cache) == 0
+    assert client.get("/reports").get_json()["reports"] == []
+
+
+def test_download_stored_report_by_id(client):
+    """/ask returns a report ID; /download/<id> streams it with an ETag, gzip and 304 support."""
+    import gzip
+
+    app_module.query_engine.process_query.return_value = REPORT
+    report_id = client.post("/ask", data={"query": "Compare us to Razorpay"}).get_json()["report_id"]
+
+    plain = client.get(f"/download/{report_id}")
+    assert plain.status_code == 200 and plain.get_data(as_text=True) == REPORT
+    assert plain.headers["ETag"] == f'"{report_id}"'
+    assert "attachment" in plain.headers["Content-Disposition"]
+
+    compressed = client.get(f"/download/{report_id}", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.get_data()).decode() == REPORT
+
+    assert client.get(f"/download/{report_id}", headers={"If-None-Match": f'"{report_id}"'}).status_code == 304
+    assert client.get("/download/not-a-report").status_code == 404
+
+    listing = client.get("/reports").get_json()
+    assert listing["total"] == 1
+    assert listing["reports"][0]["query_type"] == "competitive_analysis"
+    assert listing["reports"][0]["profile"] == "Setu"
+
+
+def test_stored_reports_are_only_visible_to_their_profile(client):
+    """/download/<id> and /reports only show reports stored under the requested profile."""
+    import contextlib
+
+    engine = app_module.query_engine
+    profiles = {None: {"company_name": "Setu"}, "acme": {"company_name": "Acme"}}
+
+    @contextlib.contextmanager
+    def use_profile(name=None):
+        previous, engine.business_profile = engine.business_profile, profiles[name]
+        try:
+            yield
+        finally:
+            engine.business_profile = previous
+
+    engine.use_profile.side_effect = use_profile
+    engine.process_query.return_value = REPORT
+    report_id = client.post("/ask", data={"query": "Compare us to Razorpay"}).get_json()["report_id"]
+
+    assert client.get(f"/download/{report_id}").status_code == 200
+    assert client.get(f"/download/{report_id}?profile=acme").status_code == 404
+    assert client.get("/reports?profile=acme").get_json() == {"reports": [], "total": 0}
+    assert client.get("/reports").get_json()["total"] == 1
+
+
+def test_jobs_run_in_background_and_stream_status(client):
+    """POST /jobs answers 202 at once; the job's status, events and result follow."""
+    def process_query(query, progress_callback=None):
+        progress_callback("analyzing")
+        time.sleep(0.1)
+        progress_callback("generating")
+        return REPORT
+
+    app_module.query_engine.process_query.side_effect = process_query
+
+    submitted = client.post("/jobs", data={"query": "SWOT for Setu"})
+    assert submitted.status_code == 202
+    job_id = submitted.get_json()["job_id"]
+
+    events = client.get(f"/jobs/{job_id}/events").get_data(as_text=True)
+    assert "event: status" in events and '"stage": "analyzing"' in events
+    done = json.loads(events.rstrip().rsplit("event: done\ndata: ", 1)[1])
+    assert done["result"]["response"] == REPORT and done["result"]["report_id"]
+
+    status = client.get(f"/jobs/{job_id}").get_json()
+    assert status["status"] == "succeeded" and status["stage"] == "generating"
+    assert client.get("/jobs/unknown").status_code == 404
+    assert "queue_depth" in client.get("/jobs").get_json()
+
+
+def test_ask_rejects_unknown_profile(client):
+    from src.assistant.profiles import UnknownProfileError
+
+    app_module.query_engine.profile_registry.get.side_effect = UnknownProfileError("initech")
+    response = client.post("/ask", data={"query": "SWOT for Setu", "profile": "initech"})
+    assert response.status_code == 400
+    assert "initech" in response.get_json()["error"]
+    app_module.query_engine.process_query.assert_not_called()
+
+
+def test_health_reports_circuit_breaker_state(client):
+    response = client.get("/health")
+    payload = response.get_json()
+    assert response.status_code == 200
+    assert payload["gemini_circuit_breaker"]["state"] in ("closed", "open", "half_open")
+    assert "available_tokens" in payload["gemini_retry_budget"]
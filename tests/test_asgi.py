@@ -0,0 +1,94 @@
+# tests/test_asgi.py
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.assistant.report_store import ReportStore
+from src.backend import asgi
+
+REPORT = "# AI Business Insight Report: Trend Forecasting\n\nReport body"
+
+
+@pytest.fixture
+def mock_engine(monkeypatch, tmp_path):
+    """Replaces the ASGI app's engine with a mock, clears its report cache and uses a fresh report store."""
+    engine = MagicMock()
+    engine.business_profile = {"company_name": "Setu"}
+    monkeypatch.setattr(asgi, "query_engine", engine)
+    monkeypatch.setattr(asgi, "report_store", ReportStore(directory=str(tmp_path / "reports")))
+    asgi.report_cache.clear()
+    monkeypatch.setattr(asgi, "semantic_cache", None)
+    return engine
+
+
+async def _call(path, body=b"", method="POST", headers=()):
+    """Runs one HTTP request through the ASGI app and returns (status, headers, body)."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.app({"type": "http", "method": method, "path": path, "headers": list(headers)}, receive, send)
+    start = sent[0]
+    headers = {name.decode(): value.decode() for name, value in start["headers"]}
+    return start["status"], headers, b"".join(m.get("body", b"") for m in sent[1:]).decode()
+
+
+def test_asgi_ask_runs_concurrent_identical_queries_once(mock_engine):
+    """Identical queries awaiting on one event loop share a single async pipeline run."""
+    calls = []
+
+    async def process_query_async(query):
+        calls.append(query)
+        await asyncio.sleep(0.05)
+        return REPORT
+
+    mock_engine.process_query_async = process_query_async
+
+    async def scenario():
+        return await asyncio.gather(*(_call("/ask", b"query=UPI+trends") for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert calls == ["UPI trends"]
+    assert sorted(headers["x-cache"] for _, headers, _ in results) == ["COALESCED", "COALESCED", "MISS"]
+
+    status, headers, body = asyncio.run(_call("/ask", b"query=upi+trends"))
+    assert status == 200 and headers["x-cache"] == "HIT" and "Report body" in body
+
+
+def test_asgi_ask_stream_and_validation(mock_engine):
+    """The SSE route streams async chunks; empty queries and unknown routes are rejected."""
+    async def process_query_stream_async(query):
+        for piece in ["# AI Business Insight Report: Generic\n\n", "Body"]:
+            yield piece
+
+    mock_engine.process_query_stream_async = process_query_stream_async
+
+    status, headers, body = asyncio.run(_call("/ask/stream", b"query=What+is+UPI"))
+    assert status == 200 and headers["content-type"] == "text/event-stream"
+    assert body.count("event: chunk") == 2 and "event: done" in body
+
+    assert asyncio.run(_call("/ask", b"query="))[0] == 400
+    assert asyncio.run(_call("/missing", method="GET"))[0] == 404
+
+
+def test_asgi_download_stored_report(mock_engine):
+    """/ask returns a report ID; /download/<id> serves it with an ETag and answers conditional GETs."""
+    async def process_query_async(query):
+        return REPORT
+
+    mock_engine.process_query_async = process_query_async
+    _, _, body = asyncio.run(_call("/ask", b"query=UPI+trends"))
+    report_id = json.loads(body)["report_id"]
+
+    status, headers, body = asyncio.run(_call(f"/download/{report_id}", method="GET"))
+    assert status == 200 and body == REPORT and headers["etag"] == f'"{report_id}"'
+    status, _, _ = asyncio.run(_call(f"/download/{report_id}", method="GET", headers=[(b"if-none-match", f'"{report_id}"'.encode())]))
+    assert status == 304
+    assert asyncio.run(_call("/download/" + "0" * 24, method="GET"))[0] == 404
+    assert json.loads(asyncio.run(_call("/reports", method="GET"))[2])["total"] == 1
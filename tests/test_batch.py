@@ -0,0 +1,51 @@
+# tests/test_batch.py
+import json
+import os
+from unittest.mock import MagicMock
+
+from src.assistant.batch import BatchRunner, load_batch_queries
+from src.assistant.query_engine import QueryEngine
+
+
+def test_load_batch_queries_jsonl_and_csv(tmp_path):
+    """JSONL accepts objects or plain strings; CSV needs a query column; missing ids are derived."""
+    jsonl = tmp_path / "queries.jsonl"
+    jsonl.write_text('{"id": "q1", "query": "SWOT for Setu"}\n"Trends in UPI"\n\n{"query": ""}\n', encoding="utf-8")
+    items = load_batch_queries(str(jsonl))
+    assert [item["query"] for item in items] == ["SWOT for Setu", "Trends in UPI"]
+    assert items[0]["id"] == "q1" and items[1]["id"]
+
+    csv_file = tmp_path / "queries.csv"
+    csv_file.write_text("id,query\na,Compare us to Razorpay\n,Trends in UPI\n", encoding="utf-8")
+    items = load_batch_queries(str(csv_file))
+    assert [item["id"] for item in items][0] == "a"
+    assert items[1]["id"] == load_batch_queries(str(jsonl))[1]["id"] # Same query, same derived id
+
+    profiles = tmp_path / "profiles.jsonl"
+    profiles.write_text('{"query": "Trends in UPI", "profile": "setu"}\n{"query": "Trends in UPI", "profile": "acme"}\n',
+                        encoding="utf-8")
+    ids = {item["id"] for item in load_batch_queries(str(profiles))}
+    assert len(ids) == 2 and items[1]["id"] not in ids # Same query for another profile is another item
+
+
+def test_batch_runner_writes_reports_and_resumes(tmp_path):
+    """Reports are written per item, failures are not, and a rerun skips finished items."""
+    engine = MagicMock()
+    engine.is_cacheable_report.side_effect = QueryEngine.is_cacheable_report
+    engine.process_query.side_effect = lambda query: (
+        "Error: Failed to get response from Gemini after multiple attempts." if "fail" in query
+        else f"# AI Business Insight Report: Generic\n\n{query}"
+    )
+    items = [{"id": "a", "query": "first"}, {"id": "b", "query": "second"}, {"id": "c", "query": "please fail"}]
+    output_dir = str(tmp_path / "reports")
+
+    summary = BatchRunner(engine, output_dir, concurrency=2).run(items)
+    assert summary["succeeded"] == 2 and summary["failed"] == 1 and summary["skipped"] == 0
+    assert sorted(os.listdir(output_dir)) == ["a.md", "b.md", "manifest.jsonl"]
+    with open(os.path.join(output_dir, "manifest.jsonl"), encoding="utf-8") as f:
+        assert len([json.loads(line) for line in f]) == 3
+
+    engine.process_query.reset_mock()
+    summary = BatchRunner(engine, output_dir, concurrency=2).run(items)
+    assert summary["skipped"] == 2 and summary["processed"] == 1
+    engine.process_query.assert_called_once_with("please fail")
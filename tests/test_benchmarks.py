@@ -0,0 +1,26 @@
+# tests/test_benchmarks.py
+from benchmarks.run import compare_to_baseline, run_benchmarks
+
+
+def test_benchmark_suite_runs_offline():
+    """The smoke profile exercises every scenario against the fakes in a few hundred milliseconds."""
+    results = run_benchmarks("smoke")
+
+    assert set(results) == {"process_query_sequential", "process_query_concurrent", "process_query_sectioned", "prompt_build",
+                            "context_assembly", "ask_concurrent_clients"}
+    for summary in results.values():
+        assert summary["iterations"] > 0
+        assert summary["p50_ms"] <= summary["p95_ms"] <= summary["p99_ms"]
+        assert summary["throughput_per_s"] > 0
+
+
+def test_compare_to_baseline_flags_only_real_regressions():
+    baseline = {"pipeline": {"p50_ms": 100.0, "p95_ms": 200.0, "p99_ms": 250.0, "throughput_per_s": 10.0},
+                "micro": {"p50_ms": 0.01, "p95_ms": 0.02, "p99_ms": 0.05, "throughput_per_s": 50000.0}}
+    results = {"pipeline": {"p50_ms": 105.0, "p95_ms": 300.0, "p99_ms": 260.0, "throughput_per_s": 6.0},
+               "micro": {"p50_ms": 0.03, "p95_ms": 0.06, "p99_ms": 0.2, "throughput_per_s": 20000.0}}
+
+    regressions = compare_to_baseline(results, baseline, tolerance=0.25, min_delta_ms=2.0)
+
+    assert regressions == ["pipeline.p95_ms: 300.0 vs baseline 200.0",
+                           "pipeline.throughput_per_s: 6.0 vs baseline 10.0"]
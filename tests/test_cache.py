@@ -0,0 +1,61 @@
+# tests/test_cache.py
+import time
+from unittest.mock import patch
+
+from src.assistant.cache import SearchCache, TTLCache
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+    """Entries expire after their TTL and the least recently used entry is evicted first."""
+    cache = TTLCache(max_entries=2, default_ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1 # Touch "a" so "b" becomes least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    cache.set("short", "value", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+
+
+def test_search_cache_normalizes_keys_and_counts_hits(tmp_path):
+    """Differently spelled queries share an entry; stats report memory and disk hits."""
+    path = str(tmp_path / "search.sqlite3")
+    cache = SearchCache(path=path)
+    results = [{"title": "Razorpay pricing", "body": "...", "href": "https://example.com"}]
+
+    assert cache.get("Razorpay pricing 2025", 3) is None
+    cache.set("Razorpay pricing 2025", 3, results)
+    assert cache.get("  razorpay   PRICING 2025? ", 3) == results
+    assert cache.get("Razorpay pricing 2025", 5) is None # max_results is part of the key
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["memory_hits"] == 1
+
+    # A second cache on the same file (e.g. another Flask worker) is served from disk
+    other = SearchCache(path=path)
+    assert other.get("razorpay pricing 2025", 3) == results
+    assert other.get_stats()["disk_hits"] == 1
+
+
+def test_search_cache_disk_tier_is_size_bounded(tmp_path):
+    """The SQLite tier prunes least recently used rows beyond its capacity."""
+    cache = SearchCache(path=str(tmp_path / "search.sqlite3"), disk_entries=3)
+    cache.disk.prune_every = 1
+    for i in range(5):
+        cache.set(f"query {i}", 3, [{"title": str(i)}])
+
+    fresh = SearchCache(path=str(tmp_path / "search.sqlite3"))
+    remaining = [i for i in range(5) if fresh.get(f"query {i}", 3) is not None]
+    assert remaining == [2, 3, 4]
+
+
+def test_search_cache_disk_entries_expire(tmp_path):
+    """Expired rows are not served from disk."""
+    cache = SearchCache(path=str(tmp_path / "search.sqlite3"))
+    cache.set("stale query", 3, [{"title": "old"}], ttl=60)
+    fresh = SearchCache(path=str(tmp_path / "search.sqlite3"))
+    with patch("src.assistant.cache.time.time", return_value=time.time() + 120):
+        assert fresh.get("stale query", 3) is None
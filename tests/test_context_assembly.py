@@ -0,0 +1,37 @@
+# tests/test_context_assembly.py
+from src.assistant.context_assembly import ContextAssembler, canonical_url, estimate_tokens
+
+
+def _result(title, snippet, url, search_query="q"):
+    return {"search_query": search_query, "title": title, "snippet": snippet, "url": url}
+
+
+def test_deduplicate_collapses_urls_and_syndicated_snippets():
+    """Same page under a different URL form, and a lightly edited copy of a story, are dropped."""
+    story = "Razorpay raised new funding at a higher valuation as payments volumes in India kept growing this year"
+    results = [
+        _result("Razorpay raises funding", story, "https://www.example.com/news/razorpay/"),
+        _result("Razorpay raises funding", "Different text", "http://example.com/news/razorpay?utm_source=x"),
+        _result("Razorpay raises funding", story + " report", "https://other.example.org/a"),
+        _result("Decentro launches API", "Decentro launched a new KYC API for lenders", "https://example.net/decentro"),
+    ]
+    kept, stats = ContextAssembler().deduplicate(results)
+
+    assert [r["url"] for r in kept] == ["https://www.example.com/news/razorpay/", "https://example.net/decentro"]
+    assert stats == {"duplicate_urls": 1, "near_duplicates": 1}
+    assert canonical_url("https://www.Example.com/a/?utm_medium=y#top") == canonical_url("http://example.com/a")
+
+
+def test_assemble_ranks_by_relevance_and_respects_token_budget():
+    filler = "general business news about unrelated markets " * 10
+    results = [_result(f"Unrelated {i}", f"{filler} item {i}", f"https://example.com/{i}") for i in range(20)]
+    results.append(_result("Decentro pricing", "Decentro pricing for KYC APIs compared with Setu", "https://example.com/decentro"))
+    assembler = ContextAssembler(token_budgets={"competitive_analysis": 400})
+
+    context = assembler.assemble(results, "How does Setu pricing compare?", "competitive_analysis",
+                                 {"competitors": ["Decentro"], "focus_areas": ["pricing"]})
+
+    assert context.startswith("--- Search Results (most relevant first) ---\n\n1. Title: Decentro pricing")
+    assert estimate_tokens(context) <= 400
+    assert "Unrelated 19" not in context
+    assert assembler.assemble([], "q", "generic") == ""
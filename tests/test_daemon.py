@@ -0,0 +1,85 @@
+# tests/test_daemon.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pytest
+
+import main_cli
+from src.assistant import query_engine
+from src.assistant.daemon import DaemonClient, DaemonError, DaemonServer, is_running
+from src.assistant.profiles import UnknownProfileError
+
+
+class FakeEngine:
+    """Streams "<profile>:<query>"; `barrier` makes concurrent queries wait for each other."""
+
+    def __init__(self, barrier=None):
+        self.barrier = barrier
+        self._profile = threading.local()
+
+    @contextmanager
+    def use_profile(self, name=None):
+        if name == "missing":
+            raise UnknownProfileError(name)
+        self._profile.name = name or "default"
+        yield
+
+    def process_query_stream(self, query):
+        if self.barrier:
+            self.barrier.wait(timeout=5)
+        yield f"{self._profile.name}:"
+        yield query
+
+    def process_query(self, query):
+        return "".join(self.process_query_stream(query))
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    def start(engine):
+        server = DaemonServer(engine, str(tmp_path / "assistant.sock"))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_daemon_serves_concurrent_queries_and_reports_errors(daemon, tmp_path):
+    socket_path = str(tmp_path / "assistant.sock")
+    (tmp_path / "assistant.sock").write_text("stale") # Left over from a crashed daemon
+    assert not is_running(socket_path)
+
+    daemon(FakeEngine(barrier=threading.Barrier(2)))
+    assert is_running(socket_path)
+    client = DaemonClient(socket_path)
+
+    # Both queries must be in flight at once to get past the barrier
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(lambda args: "".join(client.query(*args)), [("q1", "acme"), ("q2", None)]))
+    assert results == ["acme:q1", "default:q2"]
+
+    with pytest.raises(DaemonError):
+        list(client.query("q", profile="missing"))
+    with pytest.raises(RuntimeError):
+        DaemonServer(FakeEngine(), socket_path) # Refuses to steal a live daemon's socket
+
+
+def test_cli_uses_daemon_when_running_and_falls_back_otherwise(daemon, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("ASSISTANT_SOCKET", str(tmp_path / "assistant.sock"))
+    monkeypatch.setattr(query_engine, "QueryEngine", lambda: FakeEngine())
+
+    main_cli.main(["Trends in UPI", "--no-daemon", "--no-stream"])
+    assert "default:Trends in UPI" in capsys.readouterr().out
+
+    in_daemon = FakeEngine()
+    in_daemon.process_query_stream = lambda query: iter(["daemon:", query])
+    daemon(in_daemon)
+    main_cli.main(["Trends in UPI", "-o", str(tmp_path / "report.md")])
+    assert "daemon:Trends in UPI" in capsys.readouterr().out
+    assert (tmp_path / "report.md").read_text(encoding="utf-8") == "daemon:Trends in UPI"
@@ -0,0 +1,114 @@
+# tests/test_gemini_integration.py
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.assistant.gemini_integration import GeminiClient
+from src.assistant.resilience import CircuitBreaker, ExponentialBackoff, RetryBudget
+
+
+@pytest.fixture
+def client():
+    """GeminiClient with mocked models and its own (not process-wide) resilience state."""
+    gemini = GeminiClient(
+        retry_budget=RetryBudget(),
+        circuit_breaker=CircuitBreaker("test", failure_threshold=3, recovery_timeout=60),
+        backoff=ExponentialBackoff(base=0) # No real sleeping in tests
+    )
+    gemini.generative_model = MagicMock()
+    gemini.analysis_model = MagicMock()
+    return gemini
+
+
+def _response(text):
+    response = MagicMock()
+    response.candidates[0].finish_reason.name = "STOP"
+    response.text = text
+    return response
+
+
+def _chunk(text):
+    chunk = MagicMock()
+    chunk.text = text
+    return chunk
+
+
+def test_generate_response_stream_yields_chunks(client):
+    """Text chunks are passed through in order, using the SDK's stream=True mode."""
+    client.generative_model.generate_content.return_value = [_chunk("Hello "), _chunk("world")]
+
+    assert list(client.generate_response_stream("prompt")) == ["Hello ", "world"]
+    assert client.generative_model.generate_content.call_args.kwargs["stream"] is True
+
+
+def test_generate_response_stream_retries_only_before_first_chunk(client):
+    """A failure before any output is retried; a failure mid-stream ends the stream with an error chunk."""
+    def interrupted():
+        yield _chunk("Partial ")
+        raise RuntimeError("connection reset")
+
+    client.generative_model.generate_content.side_effect = [RuntimeError("unavailable"), interrupted()]
+
+    chunks = list(client.generate_response_stream("prompt"))
+    assert chunks[0] == "Partial "
+    assert chunks[1].strip().startswith("Error: Response stream interrupted")
+    assert client.generative_model.generate_content.call_count == 2
+
+
+def test_generate_with_retry_does_not_retry_fatal_errors(client):
+    """Fatal errors (e.g. invalid argument) fail immediately and do not count against API health."""
+    from google.api_core import exceptions as google_exceptions
+    client.generative_model.generate_content.side_effect = google_exceptions.InvalidArgument("bad prompt")
+
+    result = client.generate_response("prompt")
+    assert result.startswith("Error: Gemini request failed")
+    assert client.generative_model.generate_content.call_count == 1
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_generate_with_retry_retries_then_trips_breaker(client):
+    """Retryable errors are retried; enough consecutive failures open the breaker, which then fails fast."""
+    from google.api_core import exceptions as google_exceptions
+    client.generative_model.generate_content.side_effect = [google_exceptions.ServiceUnavailable("overloaded"), _response("ok")]
+    assert client.generate_response("prompt") == "ok"
+    assert client.generative_model.generate_content.call_count == 2
+
+    client.generative_model.generate_content.reset_mock()
+    client.generative_model.generate_content.side_effect = google_exceptions.ResourceExhausted("quota")
+    assert client.generate_response("prompt").startswith("Error: Failed to get response")
+    assert client.generative_model.generate_content.call_count == 3
+    assert client.circuit_breaker.state == CircuitBreaker.OPEN
+
+    client.generative_model.generate_content.reset_mock()
+    assert "circuit breaker open" in client.generate_response("prompt")
+    client.generative_model.generate_content.assert_not_called()
+
+
+def test_generate_with_retry_respects_retry_budget(client):
+    """With the shared retry budget exhausted, a failing request is not retried."""
+    client.retry_budget = RetryBudget(ratio=0, min_retries_per_second=0, max_tokens=0)
+    client.generative_model.generate_content.side_effect = TimeoutError("timed out")
+
+    assert client.generate_response("prompt").startswith("Error:")
+    assert client.generative_model.generate_content.call_count == 1
+
+
+def test_half_open_trial_slot_is_released_without_a_verdict(client):
+    """A fatal error or an abandoned stream during the half-open trial does not wedge the breaker."""
+    from google.api_core import exceptions as google_exceptions
+    client.circuit_breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0)
+    client.circuit_breaker.record_failure() # Open, and half-open straight away
+
+    client.generative_model.generate_content.side_effect = google_exceptions.InvalidArgument("bad prompt")
+    assert client.generate_response("prompt").startswith("Error: Gemini request failed")
+
+    client.generative_model.generate_content.side_effect = None
+    client.generative_model.generate_content.return_value = iter([_chunk("Hello "), _chunk("world")])
+    stream = client.generate_response_stream("prompt")
+    assert next(stream) == "Hello "
+    stream.close() # The client went away mid-stream
+    assert client.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+
+    client.generative_model.generate_content.return_value = _response("ok")
+    assert client.generate_response("prompt") == "ok"
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,96 @@
+# tests/test_hedging.py
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+from src.assistant.gemini_integration import GeminiClient
+from src.assistant.hedging import Hedger
+from src.assistant.resilience import CircuitBreaker, RetryBudget
+
+
+def _response(text):
+    response = MagicMock()
+    response.candidates[0].finish_reason.name = "STOP"
+    response.text = text
+    return response
+
+
+def _warm(hedger, key, seconds=0.01, count=20):
+    for _ in range(count):
+        hedger.record(key, seconds)
+
+
+def test_slow_call_is_hedged_and_budget_caps_hedges():
+    hedger = Hedger(min_samples=5, min_delay=0.05, budget_ratio=0.0, max_burst=1.0)
+    calls = []
+    calls_lock = threading.Lock()
+
+    def flaky_latency(value):
+        with calls_lock:
+            calls.append(value)
+            first = len(calls) % 2 == 1
+        time.sleep(0.5 if first else 0.01) # Every odd call hangs
+        return f"{value}-{'slow' if first else 'fast'}"
+
+    assert hedger.call("k", flaky_latency, "cold") == "cold-slow" # No history yet: never hedged
+    _warm(hedger, "k")
+
+    calls.clear()
+    started = time.monotonic()
+    assert hedger.call("k", flaky_latency, "a") == "a-fast"
+    assert time.monotonic() - started < 0.3
+
+    # The only hedge token is spent; the next slow call just waits
+    calls.clear()
+    assert hedger.call("k", flaky_latency, "b") == "b-slow"
+    assert calls == ["b"]
+
+
+def test_cancelled_async_losers_keep_counting_towards_the_threshold():
+    hedger = Hedger(percentile=50, min_samples=5, min_delay=0.0, budget_ratio=1.0, max_burst=10.0)
+    _warm(hedger, "k", seconds=0.1, count=5)
+    calls = []
+
+    async def slow_then_fast():
+        calls.append(None)
+        await asyncio.sleep(1.0 if len(calls) % 2 == 1 else 0.01) # Every primary hangs, every hedge is quick
+        return "ok"
+
+    async def hedge_several():
+        for _ in range(6):
+            assert await hedger.call_async("k", slow_then_fast) == "ok"
+
+    initial = hedger.delay("k")
+    asyncio.run(hedge_several())
+    assert len(calls) == 12 # Every call was hedged
+    assert hedger.delay("k") >= initial
+
+
+def test_gemini_client_hedges_and_cancels_the_slow_async_request():
+    hedger = Hedger(min_samples=5, min_delay=0.05)
+    client = GeminiClient(retry_budget=RetryBudget(), circuit_breaker=CircuitBreaker("test"), hedger=hedger)
+    client.generative_model = MagicMock()
+    client.generative_model.model_name = "models/gemini-test"
+    cancelled = []
+    attempts = []
+
+    async def generate_content_async(contents, generation_config=None, request_options=None):
+        attempts.append(contents)
+        if len(attempts) == 1:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        return _response("report")
+
+    client.generative_model.generate_content_async = generate_content_async
+    config = client._response_config(0.7, 8192)
+    key, _ = client._hedge_options(client.generative_model, "prompt", config)
+    _warm(hedger, key)
+
+    started = time.monotonic()
+    assert asyncio.run(client.generate_response_async("prompt")) == "report"
+    assert time.monotonic() - started < 1.0
+    assert attempts == ["prompt", "prompt"] and cancelled == [True]
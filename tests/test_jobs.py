@@ -0,0 +1,60 @@
+# tests/test_jobs.py
+import threading
+
+import pytest
+
+from src.assistant.jobs import FAILED, QUEUED, SUCCEEDED, InProcessJobQueue, JobManager, JobQueueFull
+
+
+def _wait_finished(manager, job_id):
+    version = None
+    while True:
+        data, version = manager.wait_for_change(job_id, version, timeout=5)
+        if data["status"] in (SUCCEEDED, FAILED):
+            return data
+
+
+def test_jobs_report_stages_results_and_failures():
+    stages_seen = []
+
+    def handler(job, progress):
+        if job.query == "boom":
+            raise RuntimeError("pipeline exploded")
+        for stage in ("analyzing", "searching", "generating"):
+            progress(stage)
+            stages_seen.append(manager.get(job.id).stage)
+        return {"response": f"report for {job.query}"}
+
+    manager = JobManager(handler, workers=2, poll_interval=0.05)
+    try:
+        ok, broken = manager.submit("UPI trends"), manager.submit("boom")
+        done = _wait_finished(manager, ok.id)
+        failed = _wait_finished(manager, broken.id)
+    finally:
+        manager.shutdown()
+
+    assert done["result"] == {"response": "report for UPI trends"} and done["stage"] == "generating"
+    assert stages_seen == ["analyzing", "searching", "generating"]
+    assert failed["status"] == FAILED and failed["error"] == "pipeline exploded"
+    stats = manager.stats()
+    assert stats["jobs"][SUCCEEDED] == 1 and stats["jobs"][FAILED] == 1 and stats["queue_depth"] == 0
+    assert 0 < stats["utilization"] <= 1
+
+
+def test_full_queue_rejects_jobs_and_depth_is_visible():
+    release = threading.Event()
+    manager = JobManager(lambda job, progress: release.wait(5), workers=1,
+                         job_queue=InProcessJobQueue(max_size=1), poll_interval=0.05)
+    try:
+        running = manager.submit("first")
+        manager.wait_for_change(running.id, 0, timeout=5) # Wait until a worker has taken it
+        queued = manager.submit("second")
+        with pytest.raises(JobQueueFull):
+            manager.submit("third")
+
+        stats = manager.stats()
+        assert stats["queue_depth"] == 1 and stats["busy_workers"] == 1
+        assert manager.get(queued.id).status == QUEUED
+    finally:
+        release.set()
+        manager.shutdown()
@@ -0,0 +1,48 @@
+# tests/test_metrics.py
+from unittest.mock import MagicMock
+
+from src.assistant import metrics
+from src.assistant.gemini_integration import GeminiClient
+from src.assistant.resilience import CircuitBreaker, ExponentialBackoff, RetryBudget
+
+
+def _sample(name, **labels):
+    return metrics.registry.get_sample_value(name, labels) or 0.0
+
+
+def test_generate_records_latency_tokens_and_retries():
+    client = GeminiClient(retry_budget=RetryBudget(), circuit_breaker=CircuitBreaker("test"),
+                          backoff=ExponentialBackoff(base=0))
+    model = MagicMock()
+    model.model_name = "models/metrics-test"
+    ok = MagicMock()
+    ok.candidates[0].finish_reason.name = "STOP"
+    ok.text = "report"
+    ok.usage_metadata.prompt_token_count = 1200
+    ok.usage_metadata.candidates_token_count = 300
+    ok.usage_metadata.cached_content_token_count = 0
+    model.generate_content.side_effect = [TimeoutError("slow"), ok]
+    client.generative_model = model
+    generate_count = _sample("assistant_stage_seconds_count", stage="generate")
+
+    assert client.generate_response("prompt") == "report"
+
+    assert _sample("assistant_stage_seconds_count", stage="generate") == generate_count + 1
+    assert _sample("assistant_gemini_tokens_total", model="metrics-test", kind="prompt") == 1200
+    assert _sample("assistant_gemini_tokens_total", model="metrics-test", kind="response") == 300
+    assert _sample("assistant_gemini_retries_total", model="metrics-test") == 1
+    assert _sample("assistant_gemini_requests_total", model="metrics-test", outcome="ok") == 1
+    assert _sample("assistant_in_flight", kind="gemini") == 0
+    assert metrics.summary()["stages"]["generate"]["count"] >= 1
+
+
+def test_metrics_endpoint_exposes_cache_hit_rates():
+    from src.backend import app as app_module
+    app_module.report_cache.stats.record("hits")
+    response = app_module.app.test_client().get("/metrics")
+
+    body = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert 'assistant_cache_hit_ratio{cache="report"}' in body
+    assert "assistant_stage_seconds_bucket" in body
@@ -0,0 +1,107 @@
+# tests/test_page_fetcher.py
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.assistant.page_fetcher import PageCache, PageFetcher, extract_text
+
+ARTICLE = (
+    "<html><head><title>Pricing</title><style>body { color: red }</style>"
+    "<script>var tracking = 1;</script></head><body><nav>Home | Blog</nav>"
+    "<article><h1>Razorpay pricing</h1><p>Razorpay charges 2% per UPI payment link.</p>"
+    "<p>Enterprise plans are &amp; negotiated.</p></article><footer>Copyright</footer></body></html>"
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/article":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = ARTICLE.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/endless":
+            # Keeps producing text; the fetcher must stop reading on its own
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.end_headers()
+            try:
+                for i in range(10000):
+                    self.wfile.write(f"<p>Paragraph {i} about UPI market growth.</p>".encode("utf-8") * 20)
+            except (BrokenPipeError, ConnectionResetError):
+                server.endless_aborted = True
+        elif self.path.startswith("/slow"):
+            with server.lock:
+                server.active += 1
+                server.max_active = max(server.max_active, server.active)
+            time.sleep(0.2)
+            with server.lock:
+                server.active -= 1 # Before responding: the client may start its next request as soon as it has the body
+            body = b"<p>slow page</p>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/data.json":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+        else:
+            self.send_error(404)
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests, server.active, server.max_active, server.endless_aborted = [], 0, 0, False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_extract_text_keeps_visible_content_only():
+    text = extract_text(ARTICLE)
+    assert text.splitlines() == ["Razorpay pricing", "Razorpay charges 2% per UPI payment link.", "Enterprise plans are & negotiated."]
+
+
+def test_fetcher_extracts_caps_and_revalidates(http_server):
+    server, base = http_server
+    cache = PageCache(path="", fresh_ttl=0) # Every cached entry needs revalidation
+    fetcher = PageFetcher(max_workers=8, per_host_limit=2, max_chars=500, cache=cache)
+
+    page, endless, missing, data = fetcher.fetch_many([f"{base}/article", f"{base}/endless", f"{base}/missing", f"{base}/data.json"])
+    assert "Razorpay charges 2% per UPI payment link." in page["text"] and "tracking" not in page["text"]
+    assert 0 < len(endless["text"]) <= 500 and endless["error"] is None
+    assert missing["text"] == "" and "404" in missing["error"]
+    assert "unsupported content type" in data["error"]
+
+    # A stale entry is revalidated with its ETag and reused on 304
+    again = fetcher.fetch(f"{base}/article")
+    assert again["cached"] and again["text"] == page["text"]
+    assert server.requests[-1] == ("/article", '"v1"')
+
+    # At most two requests to the same host are in flight at once
+    server.max_active = 0
+    fetcher.fetch_many([f"{base}/slow/{i}" for i in range(6)])
+    assert server.max_active == 2
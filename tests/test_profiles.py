@@ -0,0 +1,72 @@
+# tests/test_profiles.py
+import json
+import os
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.assistant import utils
+from src.assistant.profiles import DEFAULT_BUSINESS_PROFILE, ProfileRegistry, UnknownProfileError
+from src.assistant.query_engine import QueryEngine
+
+
+def _write_profile(directory, name, **overrides):
+    path = directory / f"{name}.json"
+    path.write_text(json.dumps(dict(DEFAULT_BUSINESS_PROFILE, **overrides)), encoding="utf-8")
+    return path
+
+
+def test_registry_loads_and_hot_reloads_profiles(tmp_path):
+    acme = _write_profile(tmp_path, "acme", company_name="Acme", known_competitors=["Globex"])
+    registry = ProfileRegistry(directory=str(tmp_path), reload_interval=0)
+
+    assert registry.names() == ["acme", "default"]
+    profile = registry.get("acme")
+    assert profile["company_name"] == "Acme" and profile.known_competitors == ("Globex",)
+    assert profile.fingerprint == utils.profile_fingerprint(dict(profile))
+    assert "Acme" in profile.profile_json and "Acme" in profile.static_prompt_prefix
+    assert registry.get()["company_name"] == "Setu" # Built-in default
+    with pytest.raises(UnknownProfileError):
+        registry.get("initech")
+
+    _write_profile(tmp_path, "acme", company_name="Acme Corp")
+    os.utime(acme, ns=(1, 1)) # Changed even if the rewrite landed in the same mtime tick
+    assert registry.get("acme")["company_name"] == "Acme Corp"
+
+    acme.write_text("{not json", encoding="utf-8")
+    os.utime(acme, ns=(2, 2))
+    assert registry.get("acme")["company_name"] == "Acme Corp" # Broken edit keeps the last good version
+
+    acme.unlink()
+    assert registry.names() == ["default"]
+
+
+@patch('src.assistant.query_engine.pe.get_query_analysis_prompt', return_value="Mock Analysis Prompt")
+def test_profiles_are_isolated_per_request(mock_get_prompt, tmp_path):
+    """Concurrent requests for different tenants see their own profile and never share analyses."""
+    _write_profile(tmp_path, "acme", company_name="Acme")
+    engine = QueryEngine(profile_registry=ProfileRegistry(directory=str(tmp_path)))
+    engine.gemini_client = MagicMock()
+    engine.gemini_client.generate_analysis.side_effect = lambda prompt: {
+        "query_type": "generic", "entities": {}, "required_searches": []}
+    barrier = threading.Barrier(2)
+    seen = {}
+
+    def run(name):
+        with engine.use_profile(name):
+            barrier.wait() # Both profiles are active at the same time
+            seen[name] = engine.business_profile["company_name"]
+            engine._analyze_query_with_llm("Where should we expand next?")
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("acme", None)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert seen == {"acme": "Acme", None: "Setu"}
+    assert engine.gemini_client.generate_analysis.call_count == 2 # Same query, two tenants: no shared cache entry
+    assert engine.business_profile["company_name"] == "Setu"
+    with pytest.raises(UnknownProfileError):
+        engine.use_profile("initech")
@@ -0,0 +1,75 @@
+# tests/test_prompt_cache.py
+from unittest.mock import MagicMock
+
+from google.api_core import exceptions as google_exceptions
+
+from src.assistant import prompt_engineering as pe
+from src.assistant.gemini_integration import GeminiClient
+from src.assistant.prompt_cache import CachedPrefix, CachedPrompt, LocalPrefixCacheBackend, PromptCache
+from src.assistant.resilience import CircuitBreaker, ExponentialBackoff, RetryBudget
+
+PROFILE = {"company_name": "Setu", "industry": "Financial Services", "size": "201-500 employees",
+           "primary_products": ["KYC APIs", "UPI payment links"]}
+ENTITIES = {"competitors": ["Razorpay"], "focus_areas": ["pricing"]}
+
+
+def test_static_prefix_is_registered_once_and_reused():
+    backend = LocalPrefixCacheBackend()
+    cache = PromptCache(backend=backend)
+
+    first = cache.build_prompt("competitive_analysis", PROFILE, ENTITIES, "CTX 1", "Compare us to Razorpay")
+    second = cache.build_prompt("swot_analysis", PROFILE, {}, "CTX 2", "SWOT for Setu")
+
+    assert first.prefix is second.prefix
+    assert sum(backend.registrations.values()) == 1
+    assert cache.stats == {"registrations": 1, "reuses": 1, "fallbacks": 0}
+    assert pe.COMPETITIVE_ANALYSIS_INSTRUCTIONS in first.prefix.text
+    assert pe.SWOT_ANALYSIS_INSTRUCTIONS in first.prefix.text
+    assert "CURRENT DATE" not in first.prefix.text # The date lives in the suffix so the prefix stays stable
+    assert "Compare us to Razorpay" in first.suffix and "CTX 1" in first.suffix
+    assert "**Report Type:** SWOT Analysis" in second.suffix
+
+    other_profile = dict(PROFILE, company_name="Acme")
+    assert cache.build_prompt("generic", other_profile, {}, "", "q").prefix is not first.prefix
+
+
+def test_failed_registration_falls_back_to_inline_prefix():
+    backend = MagicMock()
+    backend.register.side_effect = RuntimeError("content too small to cache")
+    cache = PromptCache(backend=backend)
+
+    prompt = cache.build_prompt("generic", PROFILE, {}, "", "What is churn?")
+    assert prompt.prefix.model is None
+    assert cache.stats["fallbacks"] == 1
+
+
+def _client():
+    client = GeminiClient(retry_budget=RetryBudget(), circuit_breaker=CircuitBreaker("test"),
+                          backoff=ExponentialBackoff(base=0))
+    client.generative_model = MagicMock()
+    return client
+
+
+def _response(text):
+    response = MagicMock()
+    response.candidates[0].finish_reason.name = "STOP"
+    response.text = text
+    return response
+
+
+def test_client_sends_only_suffix_to_cached_model_and_falls_back():
+    client = _client()
+    cached_model = MagicMock()
+    cached_model.generate_content.return_value = _response("cached report")
+    prompt = CachedPrompt(CachedPrefix("key", "PREFIX\n", model=cached_model, expires_at=float("inf")), "SUFFIX")
+
+    assert client.generate_response(prompt) == "cached report"
+    assert cached_model.generate_content.call_args.args[0] == "SUFFIX"
+    client.generative_model.generate_content.assert_not_called()
+
+    # The cached content expired server-side: retry once with the full prompt
+    cached_model.generate_content.side_effect = google_exceptions.NotFound("cached content not found")
+    client.generative_model.generate_content.return_value = _response("full report")
+    assert client.generate_response(prompt) == "full report"
+    assert client.generative_model.generate_content.call_args.args[0] == "PREFIX\nSUFFIX"
+    assert prompt.prefix.model is None
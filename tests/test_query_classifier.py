@@ -0,0 +1,51 @@
+# tests/test_query_classifier.py
+import json
+from unittest.mock import MagicMock
+
+from src.assistant.profiles import DEFAULT_BUSINESS_PROFILE
+from src.assistant.query_classifier import QueryClassifier
+from src.assistant.query_engine import QueryEngine
+
+
+def test_classifier_routes_confident_queries_and_learns_from_the_log(tmp_path):
+    log_path = tmp_path / "routes.jsonl"
+    classifier = QueryClassifier(threshold=0.8, log_path=str(log_path), min_training_examples=3)
+
+    prediction, analysis = classifier.route("How do we stack up against Razorpay on pricing?", DEFAULT_BUSINESS_PROFILE)
+    assert analysis["query_type"] == "competitive_analysis" and prediction.confidence >= 0.8
+    assert analysis["entities"]["competitors"] == ["Razorpay"]
+    assert analysis["entities"]["focus_areas"] == ["pricing"]
+    assert any(search.startswith("Razorpay pricing") for search in analysis["required_searches"])
+
+    # Mixed signals go to the LLM; its answer is logged with the agreement outcome
+    prediction, analysis = classifier.route("Compare our revenue with Razorpay", DEFAULT_BUSINESS_PROFILE)
+    assert analysis is None
+    classifier.record("Compare our revenue with Razorpay", prediction, {"query_type": "financial_analysis"})
+    stats = classifier.stats()
+    assert stats["routes"] == {"local": 1, "llm": 1}
+    assert stats["agreement_rate"] == 0.0
+
+    # Queries no rule covers are learned from logged LLM analyses
+    prediction, analysis = classifier.route("Which cities should we expand into?", DEFAULT_BUSINESS_PROFILE)
+    assert analysis is None and prediction.query_type is None
+    with open(log_path, "a", encoding="utf-8") as f:
+        for query in ("Which states should we expand into?", "Should we expand into new cities?", "Where to expand next?"):
+            f.write(json.dumps({"query": query, "route": "llm", "llm_query_type": "market_research"}) + "\n")
+    assert classifier.retrain() == 4
+    assert classifier.predict("Which cities should we expand into?").query_type == "market_research"
+
+
+def test_engine_skips_llm_analysis_for_confident_local_predictions(tmp_path):
+    engine = QueryEngine(query_classifier=QueryClassifier(log_path=str(tmp_path / "routes.jsonl")))
+    engine.gemini_client = MagicMock()
+    engine.gemini_client.generate_analysis.return_value = {
+        "query_type": "generic_business_question", "entities": {}, "required_searches": []}
+
+    analysis = engine._analyze_query_with_llm("SWOT for Setu")
+    assert analysis["query_type"] == "swot_analysis" and analysis["required_searches"]
+    engine.gemini_client.generate_analysis.assert_not_called()
+
+    analysis = engine._analyze_query_with_llm("What is the capital of France?")
+    assert analysis["query_type"] == "generic_business_question"
+    engine.gemini_client.generate_analysis.assert_called_once()
+    assert engine.query_classifier.stats()["routes"] == {"local": 1, "llm": 1}
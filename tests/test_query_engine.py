@@ -2,6 +2,8 @@
 import pytest
 from unittest.mock import patch, MagicMock
 from src.assistant.query_engine import QueryEngine
+from src.assistant.cache import SearchCache
+from src.assistant.search_providers import DuckDuckGoProvider
 import datetime # Import datetime
 
 # Mock the datetime.now() to return a fixed date for consistent testing
@@ -168,4 +170,263 @@ def test_process_generic_query(mock_analyze, mock_fetch, mock_get_dynamic_header
     # Check the final formatted response structure and content
     assert "# AI Business Insight Report: Generic Business Question" in response # Adjust title if needed
     assert "Market share explained..." in response
-    assert "Disclaimer: This report is AI-generated" in response
\ No newline at end of file
+    assert "Disclaimer: This report is AI-generated" in response
+
+# Test that concurrent search fan-out keeps the original order and per-query blocks
+def test_fetch_realtime_data_preserves_order_and_blocks(engine):
+    """
+    Searches finish out of order on the worker pool; the combined context must
+    still list them in request order, with the no-results and error blocks intact.
+    """
+    import time
+
+    delays = {"slow query": 0.2, "empty query": 0.0, "broken query": 0.05}
+
+    class FakeDDGS:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def text(self, query, max_results=3):
+            time.sleep(delays.get(query, 0.0))
+            if query == "broken query":
+                raise RuntimeError("rate limited")
+            if query == "empty query":
+                return []
+            return [{"title": f"Title for {query}", "body": "Snippet", "href": "https://example.com"}]
+
+    engine.search_rate_limiter.rate = 0 # No throttling in tests
+    engine.search_cache = SearchCache(path="") # Memory-only, nothing leaks between test runs
+    queries = ["slow query", "empty query", "broken query", "fast query"]
+    engine.search_provider = DuckDuckGoProvider(ddgs_factory=FakeDDGS)
+    context = engine._fetch_realtime_data(queries)
+
+    positions = [
+        context.index("--- Search Results for 'slow query' ---"),
+        context.index("--- No significant results found online for query: 'empty query' ---"),
+        context.index("--- Error searching for query: 'broken query' ---"),
+        context.index("--- Search Results for 'fast query' ---"),
+    ]
+    assert positions == sorted(positions)
+    assert "1. Title: Title for slow query\n   Snippet: Snippet\n   Source: https://example.com" in context
+
+
+# Test that successful analyses are memoized and the generic fallback is not
+@patch('src.assistant.query_engine.pe.get_query_analysis_prompt', return_value="Mock Analysis Prompt")
+def test_analysis_cache_reuses_successful_analysis_only(mock_get_prompt, engine):
+    """
+    A re-worded repeat of an analyzed query skips the Gemini call, while a failed
+    analysis (generic fallback) is retried on the next request.
+    """
+    mock_gemini = MagicMock()
+    engine.gemini_client = mock_gemini
+    mock_gemini.generate_analysis.return_value = {
+        "query_type": "competitive_analysis",
+        "entities": {"competitors": ["Acme Corp"], "original_query": "Compare us to Acme Corp"},
+        "required_searches": ["search for Acme Corp"]
+    }
+
+    first = engine._analyze_query_with_llm("Compare us to Acme Corp")
+    second = engine._analyze_query_with_llm("compare us to  acme corp?")
+    assert mock_gemini.generate_analysis.call_count == 1
+    assert second["query_type"] == first["query_type"]
+    assert second["entities"]["original_query"] == "compare us to  acme corp?"
+
+    # A different business profile must not share the cached analysis
+    engine.business_profile = dict(engine.business_profile, company_name="Other Co")
+    engine._analyze_query_with_llm("Compare us to Acme Corp")
+    assert mock_gemini.generate_analysis.call_count == 2
+
+    mock_gemini.generate_analysis.return_value = {"error": "quota exceeded"}
+    assert engine._analyze_query_with_llm("Trends in payments")["query_type"] == "generic"
+    engine._analyze_query_with_llm("Trends in payments")
+    assert mock_gemini.generate_analysis.call_count == 4
+
+
+# Test that the streaming pipeline yields the same report as process_query
+@patch('src.assistant.query_engine.pe.get_detailed_swot_analysis_prompt', return_value="PROMPT_FOR_SWOT")
+@patch.object(QueryEngine, '_fetch_realtime_data', return_value="Mocked search results")
+@patch.object(QueryEngine, '_analyze_query_with_llm')
+def test_process_query_stream_matches_blocking_report(mock_analyze, mock_fetch, mock_get_swot_prompt, engine):
+    """
+    Streamed pieces joined together must equal the blocking report, and a generation
+    error before the first chunk is reported like process_query does.
+    """
+    mock_analyze.return_value = {
+        "query_type": "swot_analysis",
+        "entities": {"original_query": "SWOT for Setu"},
+        "required_searches": ["Setu news"]
+    }
+    mock_gemini = MagicMock()
+    engine.gemini_client = mock_gemini
+    mock_gemini.generate_response.return_value = "Strengths... Weaknesses..."
+    mock_gemini.generate_response_stream.return_value = iter(["Strengths... ", "Weaknesses..."])
+
+    pieces = list(engine.process_query_stream("SWOT for Setu"))
+    assert len(pieces) > 2
+    assert pieces[0].startswith("# AI Business Insight Report: Swot Analysis")
+    assert "".join(pieces) == engine.process_query("SWOT for Setu")
+    mock_gemini.generate_response_stream.assert_called_once_with("PROMPT_FOR_SWOT")
+
+    mock_gemini.generate_response_stream.return_value = iter(["Error: Prompt blocked - SAFETY"])
+    assert list(engine.process_query_stream("SWOT for Setu")) == [
+        "An error occurred during response generation:\nError: Prompt blocked - SAFETY"
+    ]
+
+
+# Test that process_query reports its stages to a progress callback
+@patch('src.assistant.query_engine.pe.get_detailed_swot_analysis_prompt', return_value="PROMPT_FOR_SWOT")
+@patch.object(QueryEngine, '_fetch_realtime_data', return_value="Mocked search results")
+@patch.object(QueryEngine, '_analyze_query_with_llm')
+def test_process_query_reports_progress(mock_analyze, mock_fetch, mock_get_swot_prompt, engine):
+    mock_analyze.return_value = {"query_type": "swot_analysis", "entities": {}, "required_searches": []}
+    engine.gemini_client = MagicMock()
+    engine.gemini_client.generate_response.return_value = "Strengths..."
+    stages = []
+
+    def broken_callback(stage):
+        stages.append(stage)
+        raise RuntimeError("observer bug") # Must not break the pipeline
+
+    assert engine.process_query("SWOT for Setu", progress_callback=broken_callback).startswith("# AI Business Insight Report")
+    assert stages == ["analyzing", "searching", "generating"]
+
+
+# Test for the async pipeline
+@patch('src.assistant.query_engine.pe.get_detailed_trend_forecasting_prompt', return_value="PROMPT_FOR_TRENDS")
+@patch('src.assistant.query_engine.pe.get_query_analysis_prompt', return_value="Mock Analysis Prompt")
+def test_process_query_async(mock_get_analysis_prompt, mock_get_trend_prompt, engine):
+    """
+    process_query_async awaits the async Gemini API for analysis and generation and
+    produces the same report format as the sync pipeline.
+    """
+    import asyncio
+    from unittest.mock import AsyncMock
+
+    mock_gemini = MagicMock()
+    engine.gemini_client = mock_gemini
+    mock_gemini.generate_analysis_async = AsyncMock(return_value={
+        "query_type": "trend_forecasting",
+        "entities": {"original_query": "UPI trends"},
+        "required_searches": []
+    })
+    mock_gemini.generate_response_async = AsyncMock(return_value="Trends body")
+
+    response = asyncio.run(engine.process_query_async("UPI trends"))
+
+    mock_gemini.generate_analysis_async.assert_awaited_once_with("Mock Analysis Prompt")
+    mock_gemini.generate_response_async.assert_awaited_once_with("PROMPT_FOR_TRENDS")
+    assert response.startswith("# AI Business Insight Report: Trend Forecasting")
+    assert "Trends body" in response
+
+
+# Test that speculative searches are reconciled with the LLM search plan
+@patch('src.assistant.query_engine.pe.get_detailed_competitive_analysis_prompt', return_value="PROMPT")
+@patch.object(QueryEngine, '_analyze_query_with_llm')
+def test_speculative_search_reuses_matching_searches(mock_analyze, mock_get_prompt, engine):
+    """
+    A speculative search that matches the plan is executed once and reused; the
+    context lists the plan's searches in plan order.
+    """
+    import threading
+    import time
+
+    calls = []
+    calls_lock = threading.Lock()
+
+    class FakeDDGS:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def text(self, query, max_results=3):
+            with calls_lock:
+                calls.append(query)
+            return [{"title": f"Title for {query}", "body": "Snippet", "href": "https://example.com"}]
+
+    def slow_analysis(query):
+        time.sleep(0.1) # Speculative searches run meanwhile
+        return {
+            "query_type": "competitive_analysis",
+            "entities": {"competitors": ["Razorpay"], "original_query": query},
+            "required_searches": ["razorpay latest news 2099", "Setu vs Razorpay"]
+        }
+
+    mock_analyze.side_effect = slow_analysis
+    engine.gemini_client = MagicMock()
+    engine.gemini_client.generate_response.return_value = "Analysis"
+    engine.search_rate_limiter.rate = 0
+    engine.search_cache = SearchCache(path="")
+    engine.speculative_search = True
+
+    engine.search_provider = DuckDuckGoProvider(ddgs_factory=FakeDDGS)
+
+    with patch('src.assistant.speculation.datetime') as mock_datetime:
+        mock_datetime.date.today.return_value.year = 2099
+        engine.process_query("How do we stack up against Razorpay?")
+
+    search_context = mock_get_prompt.call_args.kwargs["search_context"]
+    assert calls.count("Setu vs Razorpay") == 1
+    assert calls.count("Razorpay latest news 2099") == 1
+    assert "razorpay latest news 2099" not in calls # Reused the speculative search instead
+    assert search_context.index("Razorpay latest news 2099") < search_context.index("Setu vs Razorpay")
+    assert "Razorpay products pricing 2099" not in search_context
+
+
+# Test sectioned generation: concurrent section drafts, then a summary pass stitched in front
+@patch.object(QueryEngine, '_fetch_realtime_data', return_value="Mocked search results")
+@patch.object(QueryEngine, '_analyze_query_with_llm')
+def test_sectioned_generation_drafts_sections_concurrently(mock_analyze, mock_fetch):
+    import threading
+    from src.assistant import prompt_engineering as pe
+
+    engine = QueryEngine(sectioned_generation=True, section_concurrency=5)
+    mock_analyze.return_value = {"query_type": "swot_analysis", "entities": {}, "required_searches": []}
+    sections = [title for title, _ in pe.REPORT_SECTIONS["swot_analysis"]]
+    all_drafting = threading.Barrier(len(sections)) # Fails unless every section is in flight at once
+    failing = set()
+
+    def generate_response(prompt, max_output_tokens=8192):
+        if "Drafted Sections" in prompt:
+            return "## Executive Summary\nAll good."
+        title = next(t for t in sections if f"Write ONLY the '{t}' section" in prompt)
+        all_drafting.wait(timeout=5)
+        assert max_output_tokens == pe.SECTION_MAX_OUTPUT_TOKENS
+        return "Error: Prompt blocked - SAFETY" if title in failing else f"## {title}\n{title} text"
+
+    engine.gemini_client = MagicMock()
+    engine.gemini_client.generate_response.side_effect = generate_response
+
+    report = engine.process_query("SWOT for Setu")
+    assert report.startswith("# AI Business Insight Report: Swot Analysis")
+    positions = [report.index(f"## {heading}") for heading in ["Executive Summary"] + sections]
+    assert positions == sorted(positions)
+    summary_prompt = engine.gemini_client.generate_response.call_args_list[-1].args[0]
+    assert "## Threats\nThreats text" in summary_prompt
+
+    failing.add("Threats")
+    all_drafting.reset()
+    assert engine.process_query("SWOT for Setu") == "An error occurred during response generation:\nError: Prompt blocked - SAFETY"
+
+    # Report types without declared sections keep the single generation call
+    assert isinstance(engine._build_prompt("q", "generic", {}, "ctx"), str)
+
+
+# Test that deep fetch picks the top result of every search first and never mutates cached results
+def test_deep_fetch_attaches_page_text_without_touching_cached_results():
+    fetcher = MagicMock()
+    fetcher.fetch_many.side_effect = lambda urls: [{"url": url, "text": f"text of {url}"} for url in urls]
+    engine = QueryEngine(search_cache=SearchCache(path=""), deep_fetch=fetcher, deep_fetch_pages=3)
+    first = [{"title": "A1", "body": "", "href": "https://a/1"}, {"title": "A2", "body": "", "href": "https://a/2"}]
+    second = [{"title": "B1", "body": "", "href": "file:///local.md"}, {"title": "B2", "body": "", "href": "https://b/2"}]
+
+    outcomes = engine._attach_page_text([first, RuntimeError("search failed"), second])
+
+    fetcher.fetch_many.assert_called_once_with(["https://a/1", "https://a/2", "https://b/2"])
+    assert outcomes[0][0]["page_text"] == "text of https://a/1"
+    assert "page_text" not in outcomes[2][0] and "page_text" not in first[0]
+    assert "Page extract: text of https://b/2" in engine._format_search_results("q", outcomes[2])[2]
@@ -0,0 +1,66 @@
+# tests/test_quota_scheduler.py
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.assistant.gemini_integration import GeminiClient
+from src.assistant.quota_scheduler import BATCH, INTERACTIVE, QuotaScheduler, QuotaWaitTimeout, request_priority
+from src.assistant.resilience import CircuitBreaker, RetryBudget
+
+
+def _wait_until_queued(scheduler, count):
+    deadline = time.monotonic() + 5
+    while sum(scheduler.snapshot()["queued"].values()) < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_interactive_calls_go_first_and_tenants_share_fairly():
+    scheduler = QuotaScheduler(requests_per_minute=1200) # One request every 50ms
+    scheduler.throttle() # Start with an empty bucket so every call queues
+    order = []
+
+    def call(priority, tenant):
+        with request_priority(priority, tenant):
+            scheduler.acquire()
+        order.append(tenant)
+
+    threads = []
+    for index, (priority, tenant) in enumerate([(BATCH, "nightly"), (BATCH, "nightly"), (INTERACTIVE, "acme"),
+                                                (INTERACTIVE, "acme"), (INTERACTIVE, "acme"), (INTERACTIVE, "setu")]):
+        threads.append(threading.Thread(target=call, args=(priority, tenant)))
+        threads[-1].start()
+        _wait_until_queued(scheduler, index + 1)
+    for thread in threads:
+        thread.join()
+
+    # Batch calls queued first still wait for every interactive one; setu is not stuck behind acme's backlog
+    assert order == ["acme", "setu", "acme", "acme", "nightly", "nightly"]
+    snapshot = scheduler.snapshot()
+    assert snapshot["granted"] == {"interactive": 4, "batch": 2}
+    assert snapshot["wait_p95_seconds"]["batch"] > snapshot["wait_p50_seconds"]["interactive"]
+
+
+def test_token_estimates_and_max_queue_wait_bound_admission(tmp_path):
+    state = str(tmp_path / "quota.json")
+    # Two schedulers on one state file behave like two processes sharing the quota
+    first = QuotaScheduler(tokens_per_minute=600, max_queue_wait=0.1, shared_state_path=state)
+    second = QuotaScheduler(tokens_per_minute=600, max_queue_wait=0.1, shared_state_path=state)
+
+    client = GeminiClient(retry_budget=RetryBudget(), circuit_breaker=CircuitBreaker("test"), quota_scheduler=first)
+    client.generative_model = MagicMock()
+    client.generative_model.generate_content.return_value.candidates[0].finish_reason.name = "STOP"
+    client.generative_model.generate_content.return_value.text = "report"
+
+    prompt = "x" * 2000 # About 500 tokens of the 600 per minute
+    assert client.generate_response(prompt) == "report"
+    assert client.generate_response(prompt).startswith("Error: Gemini quota exhausted")
+    assert client.generative_model.generate_content.call_count == 1
+
+    with pytest.raises(QuotaWaitTimeout):
+        asyncio.run(second.acquire_async(500))
+    assert second.snapshot()["timeouts"] == {"interactive": 1, "batch": 0}
+    assert asyncio.run(second.acquire_async(50)) >= 0.0 # Small calls still fit in what is left
@@ -0,0 +1,43 @@
+# tests/test_report_store.py
+import os
+
+from src.assistant.report_store import ReportStore, report_id
+
+REPORT = "# AI Business Insight Report: Swot Analysis\n\n" + "Strengths and weaknesses. " * 200
+
+
+def test_save_is_idempotent_and_compressed(tmp_path):
+    store = ReportStore(directory=str(tmp_path))
+    rid = store.save(REPORT, "SWOT for Setu", query_type="swot_analysis", profile="Setu")
+
+    assert rid == report_id(REPORT)
+    assert store.save(REPORT, "swot for setu?") == rid # Same text, same entry
+    assert store.count() == 1
+    assert store.read(rid) == REPORT
+
+    meta = store.get_metadata(rid)
+    assert meta["query"] == "SWOT for Setu" and meta["query_type"] == "swot_analysis"
+    assert meta["compressed_size"] < meta["size"] == len(REPORT.encode())
+    assert os.path.getsize(store.path_for(rid)) == meta["compressed_size"]
+    assert store.get_metadata("../../etc/passwd") is None
+
+
+def test_oldest_reports_are_pruned(tmp_path):
+    store = ReportStore(directory=str(tmp_path), max_reports=2)
+    ids = [store.save(f"Report {i}", f"query {i}") for i in range(3)]
+
+    assert [meta["id"] for meta in store.list()] == [ids[2], ids[1]]
+    assert store.get_metadata(ids[0]) is None
+    assert not os.path.exists(store.path_for(ids[0]))
+
+
+def test_reports_are_scoped_to_their_profile(tmp_path):
+    store = ReportStore(directory=str(tmp_path))
+    setu = store.save(REPORT, "SWOT", profile="Setu", profile_fingerprint="setu-fp")
+    acme = store.save(REPORT, "SWOT", profile="Acme", profile_fingerprint="acme-fp")
+
+    assert setu != acme # Same text, separate entries per profile
+    assert store.get_metadata(setu, profile_fingerprint="acme-fp") is None
+    assert store.get_metadata(setu, profile_fingerprint="setu-fp")["profile"] == "Setu"
+    assert [meta["id"] for meta in store.list(profile_fingerprint="acme-fp")] == [acme]
+    assert store.count(profile_fingerprint="setu-fp") == 1 and store.count() == 2
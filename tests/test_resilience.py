@@ -0,0 +1,46 @@
+# tests/test_resilience.py
+from unittest.mock import patch
+
+from google.api_core import exceptions as google_exceptions
+
+from src.assistant.resilience import CircuitBreaker, ExponentialBackoff, RetryBudget, is_retryable
+
+
+def test_is_retryable_classifies_errors():
+    assert is_retryable(google_exceptions.ResourceExhausted("quota"))
+    assert is_retryable(google_exceptions.ServiceUnavailable("overloaded"))
+    assert is_retryable(ConnectionResetError())
+    assert not is_retryable(google_exceptions.PermissionDenied("bad key"))
+    assert not is_retryable(google_exceptions.InvalidArgument("bad prompt"))
+    assert not is_retryable(ValueError("bad config"))
+
+
+def test_exponential_backoff_is_capped():
+    backoff = ExponentialBackoff(base=1.0, cap=4.0)
+    assert all(0 <= backoff.delay(attempt) <= min(4.0, 2 ** attempt) for attempt in range(8))
+
+
+def test_retry_budget_limits_retries_to_a_share_of_requests():
+    budget = RetryBudget(ratio=0.5, min_retries_per_second=0, max_tokens=1)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_spend()
+    assert budget.snapshot()["rejected_retries"] == 1
+
+
+def test_circuit_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=10)
+    with patch("src.assistant.resilience.time.monotonic", return_value=100.0):
+        breaker.record_failure()
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+
+    with patch("src.assistant.resilience.time.monotonic", return_value=111.0):
+        assert breaker.allow_request() # One trial call in half-open state
+        assert not breaker.allow_request()
+        breaker.record_success()
+        assert breaker.snapshot()["state"] == CircuitBreaker.CLOSED
@@ -0,0 +1,64 @@
+# tests/test_search_providers.py
+import os
+
+import pytest
+
+from src.assistant.search_providers import LocalCorpusProvider, MergedSearchProvider, SearchProvider
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+class StaticProvider(SearchProvider):
+    def __init__(self, name, results=None, error=None):
+        self.name = name
+        self.results = results or []
+        self.error = error
+
+    def search(self, query, max_results):
+        if self.error:
+            raise self.error
+        return self.results[:max_results]
+
+
+def test_local_corpus_ranks_and_updates_incrementally(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    _write(docs / "pricing.md", "# Razorpay pricing\n\nRazorpay charges 2% per UPI payment link.\n\n## Notes\n\nUnrelated onboarding text.")
+    _write(docs / "kyc.md", "# KYC market\n\nSignzy and Perfios lead video KYC. Razorpay is mentioned once.")
+    _write(docs / "image.png", "not indexed")
+
+    corpus = LocalCorpusProvider(index_path=str(tmp_path / "index.sqlite3"), directories=[str(docs)])
+    assert corpus.document_count() == 2
+
+    results = corpus.search("What is Razorpay pricing for payment links?", 5)
+    assert results[0]["title"] == "Razorpay pricing"
+    assert results[0]["href"] == f"file://{docs / 'pricing.md'}"
+    assert "2% per UPI" in results[0]["body"]
+    assert corpus.search("the and of", 5) == [] # Only stopwords
+
+    assert corpus.ingest() == {"added": 0, "updated": 0, "unchanged": 2, "removed": 0}
+
+    _write(docs / "kyc.md", "# KYC market\n\nDigiLocker adoption doubled.")
+    os.utime(docs / "kyc.md", (1, 1)) # Make the change visible even within the mtime resolution
+    os.remove(docs / "pricing.md")
+    assert corpus.ingest() == {"added": 0, "updated": 1, "unchanged": 0, "removed": 1}
+    assert corpus.search("Razorpay", 5) == []
+    assert corpus.search("DigiLocker", 5)[0]["title"] == "KYC market"
+
+
+def test_merged_provider_interleaves_dedupes_and_tolerates_failures():
+    web = StaticProvider("web", [{"title": "W1", "body": "", "href": "https://a"},
+                                 {"title": "W2", "body": "", "href": "https://shared"}])
+    local = StaticProvider("local", [{"title": "L1", "body": "", "href": "https://shared"},
+                                     {"title": "L2", "body": "", "href": "file:///b"}])
+    broken = StaticProvider("broken", error=RuntimeError("down"))
+
+    merged = MergedSearchProvider([web, local, broken])
+    assert [r["title"] for r in merged.search("q", 3)] == ["W1", "L1", "L2"]
+    assert [r["title"] for r in merged.search("q", 2)] == ["W1", "L1"] # Never more than asked for
+
+    with pytest.raises(RuntimeError):
+        MergedSearchProvider([broken]).search("q", 3)
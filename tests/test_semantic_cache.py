@@ -0,0 +1,55 @@
+# tests/test_semantic_cache.py
+import time
+
+from src.assistant import utils
+from src.assistant.semantic_cache import SemanticCache
+
+SETU = {"company_name": "Setu"}
+ACME = {"company_name": "Acme"}
+
+
+def test_lookup_matches_rephrasings_per_profile_and_guards_names():
+    cache = SemanticCache(threshold=0.9)
+    cache.add_report("How do we stack up against Razorpay?", "razorpay report", SETU)
+    cache.add_report("What are the latest trends in UPI payments?", "trends report", SETU)
+    cache.add_report("SWOT for Setu in 2024", "swot report", SETU)
+
+    queries = ["Compare Setu with Razorpay", "latest UPI payment trends", "Strengths and weaknesses of Setu in 2024",
+               "SWOT for Setu in 2025", "Compare Setu with Cashfree", "What is the capital of France?"]
+    matches = cache.lookup_many(queries, partition=utils.profile_fingerprint(SETU), aliases=("Setu",))
+    assert [match and match.report for match in matches] == ["razorpay report", "trends report", "swot report", None, None, None]
+    assert matches[0].query == "How do we stack up against Razorpay?" and matches[0].similarity >= 0.9
+
+    # Another profile has its own partition, so its "we" is a different company
+    assert cache.lookup_report("Compare Acme with Razorpay", ACME) is None
+
+    stats = cache.snapshot()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (3, 4, 3)
+    assert stats["hit_rate"] == round(3 / 7, 4) and 0.0 < stats["similarity_p50"] <= stats["similarity_p90"] <= 1.0
+    assert len(cache.similarity_scores()) == 7
+
+
+def test_entries_expire_and_least_recently_used_is_evicted():
+    cache = SemanticCache(ttl=60, max_entries=2)
+    cache.add_report("Razorpay pricing", "razorpay", SETU)
+    cache.add_report("Cashfree pricing", "cashfree", SETU)
+    assert cache.lookup_report("pricing of Razorpay", SETU).report == "razorpay" # Cashfree is now least recently used
+    cache.add_report("Juspay pricing", "juspay", SETU)
+    assert cache.lookup_report("Cashfree pricing", SETU) is None
+    assert cache.lookup_report("Juspay pricing", SETU).report == "juspay"
+
+    cache.add("Decentro pricing", "decentro", partition="p", ttl=0.05)
+    time.sleep(0.1)
+    assert cache.lookup("Decentro pricing", partition="p") is None
+    assert cache.snapshot()["evictions"] == 2
+
+
+def test_lowercase_names_and_places_are_guarded_too():
+    cache = SemanticCache(threshold=0.7) # Low enough that only the word guard tells these apart
+    cache.add_report("how do we compare with razorpay on pricing", "razorpay pricing", SETU)
+    cache.add_report("payments trends in south india", "south india", SETU)
+
+    assert cache.lookup_report("how do we compare with cashfree on pricing", SETU) is None
+    assert cache.lookup_report("payments trends in north india", SETU) is None
+    assert cache.lookup_report("how does setu stack up against razorpay on price", SETU).report == "razorpay pricing"
+    assert cache.lookup_report("payment trends in south indian", SETU).report == "south india"
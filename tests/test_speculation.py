@@ -0,0 +1,27 @@
+# tests/test_speculation.py
+from src.assistant.speculation import extract_competitors, extract_speculative_searches, searches_match
+
+PROFILE = {
+    "company_name": "Setu",
+    "industry": "Financial Services",
+    "known_competitors": ["Razorpay", "Decentro"],
+}
+
+
+def test_extract_competitors_uses_profile_and_capitalized_names():
+    """Known competitors are matched case-insensitively; other names come from capitalization."""
+    assert extract_competitors("how do we stack up against razorpay?", PROFILE) == ["Razorpay"]
+    assert extract_competitors("Compare Setu with Acme Corp and Decentro", PROFILE) == ["Decentro", "Acme Corp"]
+
+
+def test_extract_speculative_searches_is_bounded_and_unique():
+    """The first wave covers the named competitors and never exceeds the limit."""
+    searches = extract_speculative_searches("Compare us to Razorpay on pricing", PROFILE, max_searches=3)
+    assert len(searches) == 3
+    assert all("Razorpay" in search for search in searches)
+    assert len(set(searches)) == len(searches)
+
+
+def test_searches_match_ignores_case_punctuation_and_order():
+    assert searches_match("Razorpay pricing 2025", "2025 razorpay PRICING?")
+    assert not searches_match("Razorpay pricing 2025", "Decentro funding 2025")
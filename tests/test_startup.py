@@ -0,0 +1,45 @@
+# tests/test_startup.py
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _python(code):
+    # GeminiClient refuses to start without a key; set one so the test does not depend on a local .env
+    env = dict(os.environ, GOOGLE_API_KEY="test-key")
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=60, env=env)
+
+
+def test_cli_import_and_engine_init_defer_heavy_sdks():
+    code = (
+        "import sys, time\n"
+        "started = time.perf_counter()\n"
+        "import main_cli\n"
+        "from src.assistant.query_engine import QueryEngine\n"
+        "QueryEngine()\n"
+        "print(time.perf_counter() - started)\n"
+        "print(sorted(m for m in ('google.generativeai', 'duckduckgo_search') if m in sys.modules))\n"
+    )
+    result = _python(code)
+    assert result.returncode == 0, result.stderr
+    startup_seconds, loaded = result.stdout.strip().splitlines()[-2:]
+    assert float(startup_seconds) < 1.0 # Generous bound; import plus engine init is ~0.1s without the SDKs
+    assert loaded == "[]"
+
+
+def test_cli_help_does_not_import_the_pipeline():
+    code = (
+        "import sys, runpy\n"
+        "sys.argv = ['main_cli.py', '--help']\n"
+        "try:\n"
+        "    runpy.run_path('main_cli.py', run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print('src.assistant.query_engine' in sys.modules)\n"
+    )
+    result = _python(code)
+    assert result.returncode == 0, result.stderr
+    assert "--profile-startup" in result.stdout
+    assert result.stdout.strip().splitlines()[-1] == "False"